@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
@@ -7,7 +7,15 @@ from backend.schemas.seller import (
     SellerResponse,
     SellerVerificationUpdate,
 )
+from backend.schemas.product import ProductVariantRead
 from backend.service.seller_service import admin_approve_account
+from backend.utils.hashed import password_pool_stats
+from backend.service.stock_shard_service import (
+    STOCK_SHARDS_DEFAULT,
+    STOCK_SHARDS_MAX,
+    enable_stock_sharding,
+    disable_stock_sharding,
+)
 
 router = APIRouter(prefix="/admin", tags=["Admin Authentication"])
 
@@ -20,3 +28,27 @@ def review_seller(
     current_admin=Depends(get_current_admin),
 ):
     return admin_approve_account(db, seller_id, seller_approved)
+
+
+@router.post("/variants/{variant_id}/stock-shards", response_model=ProductVariantRead)
+def shard_variant_stock(
+    variant_id: int,
+    shards: int = Query(STOCK_SHARDS_DEFAULT, ge=2, le=STOCK_SHARDS_MAX),
+    db: Session = Depends(get_db),
+    current_admin=Depends(get_current_admin),
+):
+    return enable_stock_sharding(db, variant_id, shards)
+
+
+@router.delete("/variants/{variant_id}/stock-shards", response_model=ProductVariantRead)
+def unshard_variant_stock(
+    variant_id: int,
+    db: Session = Depends(get_db),
+    current_admin=Depends(get_current_admin),
+):
+    return disable_stock_sharding(db, variant_id)
+
+
+@router.get("/metrics/password-hashing")
+def password_hashing_metrics(current_admin=Depends(get_current_admin)):
+    return password_pool_stats()
@@ -1,44 +1,38 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
-from backend.schemas.cart import CartOut, CartItemAdd, DecreaseQty,CartItemOut
+from backend.schemas.cart import CartOut, CartItemAdd, DecreaseQty,CartItemOut, CartBulkAdd, CartBulkResult, GuestCartOut
 from backend.utils.jwt import get_current_customer
 from backend.models.customer import Customer
-from backend.models.cart import Cart
-from backend.models.cart_items import CartItem
 from backend.service.cart_service import (
     add_to_cart_by_customer,
-    get_or_create_active_cart,
+    add_many_to_cart,
+    get_active_cart_summary,
     uncart_the_product,
     decrease__item_quantity,
     clear_cart,
-    cart_subtotal,
     get_item_by_variant_id
 )
+from backend.service.guest_cart_service import (
+    read_guest_lines,
+    write_guest_lines,
+    guest_cart_summary,
+    add_guest_item,
+    decrease_guest_item,
+    remove_guest_item,
+    merge_guest_cart,
+)
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
-def to_cart_out(cart: Cart) -> dict:
-    return {
-        "id": cart.id,
-        "buyer_id": cart.buyer_id,
-        "status": cart.status,
-        "created_at": cart.created_at,
-        "updated_at": cart.updated_at,
-        "items": cart.items,
-        "subtotal": cart_subtotal(cart),
-    }
-
-
 @router.get("/me", response_model=CartOut)
 def get_my_cart(
     db: Session = Depends(get_db),
     current_customer: Customer = Depends(get_current_customer),
 ):
-    cart = get_or_create_active_cart(db, buyer_id=current_customer.id)
-    return to_cart_out(cart)
+    return get_active_cart_summary(db, buyer_id=current_customer.id)
 
 @router.get("/items/by-variant/{variant_id}", response_model=CartItemOut)
 def get_the_item(
@@ -57,13 +51,21 @@ def add_to_cart(
     db: Session = Depends(get_db),
     current_customer: Customer = Depends(get_current_customer),
 ):
-    cart = add_to_cart_by_customer(
+    return add_to_cart_by_customer(
         db=db,
         buyer_id=current_customer.id,
         variant_id=payload.variant_id,
         quantity=payload.quantity,
     )
-    return to_cart_out(cart)
+
+
+@router.post("/items/bulk", response_model=CartBulkResult)
+def add_many_to_cart_api(
+    payload: CartBulkAdd,
+    db: Session = Depends(get_db),
+    current_customer: Customer = Depends(get_current_customer),
+):
+    return add_many_to_cart(db, buyer_id=current_customer.id, lines=payload.items)
 
 
 @router.patch("/items/{item_id}/decrease", response_model=CartOut)
@@ -73,8 +75,7 @@ def item_quantity_delete(
     db: Session = Depends(get_db),
     current_customer: Customer = Depends(get_current_customer),
 ):
-    cart = decrease__item_quantity(item_id, payload, db, current_customer.id)
-    return to_cart_out(cart)
+    return decrease__item_quantity(item_id, payload, db, current_customer.id)
 
 
 
@@ -84,8 +85,7 @@ def remove_cart_item(
     db: Session = Depends(get_db),
     current_customer: Customer = Depends(get_current_customer),
 ):
-    cart = uncart_the_product(db=db, buyer_id=current_customer.id, item_id=item_id)
-    return to_cart_out(cart)
+    return uncart_the_product(db=db, buyer_id=current_customer.id, item_id=item_id)
 
 
 @router.delete("/all-item/delete", response_model=CartOut)
@@ -93,5 +93,64 @@ def delete_all_item(
     db: Session = Depends(get_db),
     current_user: Customer = Depends(get_current_customer),
 ):
-    cart = clear_cart(db, current_user.id)
-    return to_cart_out(cart)
+    return clear_cart(db, current_user.id)
+
+
+@router.get("/guest", response_model=GuestCartOut)
+def get_guest_cart(request: Request, db: Session = Depends(get_db)):
+    return guest_cart_summary(db, read_guest_lines(request))
+
+
+@router.post("/guest/items", response_model=GuestCartOut)
+def add_to_guest_cart(
+    payload: CartItemAdd,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    lines = add_guest_item(db, read_guest_lines(request), payload.variant_id, payload.quantity)
+    write_guest_lines(response, lines)
+    return guest_cart_summary(db, lines)
+
+
+@router.patch("/guest/items/{variant_id}/decrease", response_model=GuestCartOut)
+def decrease_guest_cart_item(
+    variant_id: int,
+    payload: DecreaseQty,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    lines = decrease_guest_item(read_guest_lines(request), variant_id, payload.amount)
+    write_guest_lines(response, lines)
+    return guest_cart_summary(db, lines)
+
+
+@router.delete("/guest/items/{variant_id}", response_model=GuestCartOut)
+def remove_guest_cart_item(
+    variant_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    lines = remove_guest_item(read_guest_lines(request), variant_id)
+    write_guest_lines(response, lines)
+    return guest_cart_summary(db, lines)
+
+
+@router.delete("/guest", response_model=GuestCartOut)
+def clear_guest_cart(response: Response):
+    write_guest_lines(response, {})
+    return {"subtotal": 0, "items": []}
+
+
+@router.post("/guest/merge", response_model=CartBulkResult)
+def merge_guest_cart_api(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_customer: Customer = Depends(get_current_customer),
+):
+    result = merge_guest_cart(db, current_customer.id, read_guest_lines(request))
+    write_guest_lines(response, {})
+    return result
@@ -16,6 +16,14 @@ from backend.core.error_handler import error_handler
 from backend.database import get_db
 from backend.models.order import Order, OrderStatus
 from backend.models.payment import Payment, PaymentStatus, PaymentProvider
+from backend.service.inventory_service import (
+    PAYMENT_HOLD_SECONDS,
+    commit_reservations,
+    extend_reservations,
+    release_reservations,
+)
+from backend.service.product_cache import invalidate_product_options
+from backend.service.product_summary_service import mark_sold_out_products
 from backend.config.esewa_utils import canonical_message, hmac_sha256_base64, decode_esewa_data
 from backend.core.settings_esewa import (
     ESEWA_SECRET_KEY,
@@ -87,32 +95,51 @@ async def status_check(*, product_code: str, total_amount: str, transaction_uuid
         return data
 
 
-def _apply_esewa_status(payment: Payment, status: str, ref_id: Optional[str]) -> None:
-
+def _apply_esewa_status(db: Session, payment: Payment, status: str, ref_id: Optional[str]) -> set[int]:
+    """
+    Moves the payment and its order along and settles the order's stock
+    holds. A COMPLETE payment is always recorded; if the stock is no longer
+    there the order becomes BACKORDERED instead of the payment being lost.
+    Returns the product ids whose stock changed.
+    """
     s = (status or "").upper().strip()
+    order = payment.order
 
     if s == "COMPLETE":
+        if payment.status == PaymentStatus.COMPLETE:
+            return set()  # a replayed success callback; the first one settled the stock
         payment.status = PaymentStatus.COMPLETE
         payment.ref_id = ref_id
         payment.verified_at = datetime.now(timezone.utc)
-        payment.order.status = OrderStatus.COMPLETED
-        return
+        remaining, short = commit_reservations(db, order.id)
+        if short or order.status == OrderStatus.BACKORDERED:
+            order.status = OrderStatus.BACKORDERED
+        else:
+            order.status = OrderStatus.COMPLETED
+        if not remaining:
+            return set()
+        sold_out = {vid for vid, left in remaining.items() if left <= 0}
+        mark_sold_out_products(db, {oi.product_id for oi in order.items if oi.variant_id in sold_out})
+        return {oi.product_id for oi in order.items if oi.variant_id in remaining}
 
     if s in {"PENDING", "AMBIGUOUS"}:
         payment.status = PaymentStatus.AMBIGUOUS if s == "AMBIGUOUS" else PaymentStatus.PENDING
-        return
+        return set()
 
     if s == "CANCELED":
         payment.status = PaymentStatus.NOT_FOUND
-        payment.order.status = OrderStatus.CANCELLED
-        return
+        order.status = OrderStatus.CANCELLED
+        release_reservations(db, order.id)
+        return set()
 
     if s in {"FULL_REFUND", "PARTIAL_REFUND"}:
         payment.status = PaymentStatus.FULL_REFUND if s == "FULL_REFUND" else PaymentStatus.PARTIAL_REFUND
-        return
+        return set()
 
     payment.status = PaymentStatus.FAILED
-    payment.order.status = OrderStatus.CANCELLED
+    order.status = OrderStatus.CANCELLED
+    release_reservations(db, order.id)
+    return set()
 
 @router.get("/initiate", response_class=HTMLResponse)
 def initiate(order_id: int, request: Request, db: Session = Depends(get_db)):
@@ -120,6 +147,8 @@ def initiate(order_id: int, request: Request, db: Session = Depends(get_db)):
     if not order:
         raise error_handler(404, "Order not found")
 
+    # the buyer is about to pay: keep the stock held until eSewa reports back
+    extend_reservations(db, order.id, PAYMENT_HOLD_SECONDS)
     payment = _create_payment_attempt(db, order)
 
     amount = Decimal(str(order.total_price)).quantize(Decimal("0.01"))
@@ -203,8 +232,9 @@ async def success(request: Request, db: Session = Depends(get_db)):
     st_status = str(st.get("status") or "AMBIGUOUS")
     st_ref_id = st.get("ref_id")
 
-    _apply_esewa_status(payment, st_status, st_ref_id)
+    touched_products = _apply_esewa_status(db, payment, st_status, st_ref_id)
     db.commit()
+    invalidate_product_options(*touched_products)
 
     return {
         "ok": True,
@@ -3,23 +3,48 @@ from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 
+import os
+
+from backend.core.rate_limit import build_bucket, client_ip, retry_after
 from backend.database import get_db
-from backend.utils.jwt import create_access_token, create_refresh_token, verify_refresh_token
-from backend.utils.hashed import verify_password
+from backend.utils.jwt import (
+    create_access_token, create_refresh_token, revoke_refresh_token, rotate_refresh_token
+)
+from backend.utils.hashed import verify_and_update_password
 
-from backend.models.admin import Admin
-from backend.models.seller import Seller
-from backend.models.customer import Customer
-from backend.models.refresh_token import RefreshToken
+from backend.service.credential_service import find_credential
+from backend.utils.principal import ROLE_MODELS
 
 router = APIRouter(prefix="/login", tags=["Login"])
 
+# per client IP on /login/login and /login/refresh, enforced by RateLimitMiddleware
+AUTH_IP_RATE_PER_MINUTE = float(os.getenv("AUTH_IP_RATE_PER_MINUTE", "20"))
+AUTH_IP_BURST = float(os.getenv("AUTH_IP_BURST", "10"))
+# failed logins per (account email, client IP) on /login/login. Only failures
+# use it up, and each IP has its own allowance, so nobody can lock another
+# person out of their account by guessing at it
+LOGIN_ACCOUNT_RATE_PER_MINUTE = float(os.getenv("LOGIN_ACCOUNT_RATE_PER_MINUTE", "5"))
+LOGIN_ACCOUNT_BURST = float(os.getenv("LOGIN_ACCOUNT_BURST", "5"))
+
+auth_ip_bucket = build_bucket("rl_auth_ip", AUTH_IP_RATE_PER_MINUTE / 60, AUTH_IP_BURST)
+login_account_bucket = build_bucket("rl_login_account", LOGIN_ACCOUNT_RATE_PER_MINUTE / 60, LOGIN_ACCOUNT_BURST)
+
+# a rate of 0 turns the limit off; build_bucket then returns None
+RATE_LIMITED_ROUTES = (
+    {"/login/login": auth_ip_bucket, "/login/refresh": auth_ip_bucket} if auth_ip_bucket is not None else {}
+)
+
 
 class LoginResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
 
+def _count_failed_login(attempt_key: str) -> None:
+    if login_account_bucket is not None:
+        login_account_bucket.hit(attempt_key)
+
+
 COOKIE_NAME = "refresh_token"
 COOKIE_MAX_AGE = 7 * 24 * 60 * 60
 
@@ -43,6 +68,7 @@ def delete_refresh_cookie(response: Response):
 
 @router.post("/login", response_model=LoginResponse)
 def login(
+    request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
@@ -50,24 +76,36 @@ def login(
     email = form_data.username
     password = form_data.password
 
-    user = db.query(Admin).filter(Admin.email == email).first()
-    role = "Admin"
-
-    if not user:
-        user = db.query(Seller).filter(Seller.email == email).first()
-        role = "Seller"
+    # checked before any DB or bcrypt work, spent only when the login fails
+    attempt_key = f"{email.strip().lower()}|{client_ip(request.scope)}"
+    wait = login_account_bucket.peek(attempt_key) if login_account_bucket is not None else 0.0
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts, please retry shortly",
+            headers={"Retry-After": retry_after(wait)},
+        )
+
+    credential = find_credential(db, email)
+    if not credential:
+        _count_failed_login(attempt_key)
+        raise HTTPException(status_code=404, detail="User not found")
 
-    if not user:
-        user = db.query(Customer).filter(Customer.email == email).first()
-        role = "Customer"
+    valid, new_hash = verify_and_update_password(password, credential.hashed_password)
+    if not valid:
+        _count_failed_login(attempt_key)
+        raise HTTPException(status_code=401, detail="Invalid password")
 
+    # the account row is only read once the password checked out, for the token claims
+    role = credential.role
+    user = db.get(ROLE_MODELS[role], credential.owner_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; committed with the refresh token
+        user.hashed_password = new_hash
 
-    if not verify_password(password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Invalid password")
-
-    access = create_access_token(email=user.email, role=role)
+    access = create_access_token(user, role=role)
     refresh_token = create_refresh_token(db, user_id=user.id, role=role)
 
     set_refresh_cookie(response, refresh_token)
@@ -85,26 +123,15 @@ def refresh_access_token(
     if not rt_raw:
         raise HTTPException(status_code=401, detail="Missing refresh token")
 
-    rt: RefreshToken = verify_refresh_token(db, rt_raw)
-
-    if rt.role == "Admin":
-        user = db.query(Admin).filter(Admin.id == rt.owner_id).first()
-    elif rt.role == "Seller":
-        user = db.query(Seller).filter(Seller.id == rt.owner_id).first()
-    else:
-        user = db.query(Customer).filter(Customer.id == rt.owner_id).first()
+    rt, new_refresh = rotate_refresh_token(db, rt_raw)
 
+    user = db.get(ROLE_MODELS[rt.role], rt.owner_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-
-  
-    rt.revoked = True
+    new_access = create_access_token(user, role=rt.role)
     db.commit()
 
-    new_refresh = create_refresh_token(db, user_id=rt.owner_id, role=rt.role)
     set_refresh_cookie(response, new_refresh)
-
-    new_access = create_access_token(email=user.email, role=rt.role)
     return LoginResponse(access_token=new_access)
 
 
@@ -116,12 +143,7 @@ def logout(
 ):
     rt_raw = request.cookies.get(COOKIE_NAME)
     if rt_raw:
-        try:
-            rt = verify_refresh_token(db, rt_raw)
-            rt.revoked = True
-            db.commit()
-        except HTTPException:
-            pass
+        revoke_refresh_token(db, rt_raw)
 
     delete_refresh_cookie(response)
     return {"message": "logged out"}
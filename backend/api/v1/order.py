@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Response
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
@@ -11,66 +13,123 @@ from backend.schemas.order import (
     PlaceOrderResponse,
     BuyNowRequest,
     BuyNowResponse,
+    CheckoutTicketRead,
 )
-from backend.service.order_service import place_order_service, buy_now_service
+from backend.service.order_service import place_order_response, buy_now_service
+from backend.service.checkout_queue import CHECKOUT_MODE, enqueue_checkout, get_checkout_ticket
+from backend.service.idempotency_service import run_idempotent
 from backend.utils.jwt import get_current_customer
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
-@router.post("/order", response_model=PlaceOrderResponse, status_code=201)
+@router.post(
+    "/order",
+    response_model=PlaceOrderResponse,
+    status_code=201,
+    responses={
+        202: {
+            "model": CheckoutTicketRead,
+            "description": "CHECKOUT_MODE=queued: the checkout was queued; poll the ticket at Location",
+        },
+    },
+)
 def place_order_api(
     payload: PlaceOrderRequest,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Customer = Depends(get_current_customer),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=128),
 ):
-   
-    order, total_price, seller_count = place_order_service(
-        db,
-        user_id=current_user.id,
-        address_id=payload.address_id,
-        paymentmethod=str(payload.payment_method),
-    )
+    if CHECKOUT_MODE == "queued":
+        return enqueue_checkout(
+            db,
+            user_id=current_user.id,
+            address_id=payload.address_id,
+            payment_method=str(payload.payment_method),
+            idempotency_key=idempotency_key,
+        )
 
-    payment_redirect_url = None
-    if payload.payment_method == PaymentMethod.ESEWA:
-       
-        payment_redirect_url = f"/payments/esewa/initiate?order_id={order.id}"
-
-    return PlaceOrderResponse(
-        order_id=order.id,
-        status=str(order.status),
-        total_price=total_price,
-        seller_count=seller_count,
-        payment_method=str(order.payment_Method),
-        payment_redirect_url=payment_redirect_url,
+    def place(record) -> PlaceOrderResponse:
+        return place_order_response(
+            db,
+            user_id=current_user.id,
+            address_id=payload.address_id,
+            payment_method=str(payload.payment_method),
+            record=record,
+        )
+
+    return run_idempotent(
+        db,
+        owner_id=current_user.id,
+        scope="orders.place",
+        key=idempotency_key,
+        payload=payload.model_dump(mode="json"),
+        response=response,
+        response_model=PlaceOrderResponse,
+        status_code=201,
+        handler=place,
     )
 
 
 @router.post("/buy-now", response_model=BuyNowResponse, status_code=200)
 def buy_now_api(
     payload: BuyNowRequest,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Customer = Depends(get_current_customer),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=128),
 ):
-    order, total_price, seller_count = buy_now_service(
+    def buy_now(record) -> BuyNowResponse:
+        recorded: list[BuyNowResponse] = []
+
+        def before_commit(order, total_price, seller_count) -> None:
+            payment_redirect_url = None
+            if payload.payment_method == PaymentMethod.ESEWA:
+                payment_redirect_url = f"/payments/esewa/initiate?order_id={order.id}"
+
+            recorded.append(BuyNowResponse(
+                order_id=order.id,
+                status=str(order.status),
+                total_price=total_price,
+                seller_count=seller_count,
+                paymentmethod=str(payload.payment_method),
+                payment_redirect_url=payment_redirect_url,
+            ))
+            record(recorded[0])
+
+        buy_now_service(
+            db,
+            user_id=current_user.id,
+            address_id=payload.address_id,
+            variant_id=payload.variant_id,
+            quantity=payload.quantity,
+            paymentmethod=str(payload.payment_method),
+            before_commit=before_commit,
+        )
+        return recorded[0]
+
+    return run_idempotent(
         db,
-        user_id=current_user.id,
-        address_id=payload.address_id,
-        variant_id=payload.variant_id,
-        quantity=payload.quantity,
-        paymentmethod=str(payload.payment_method),
+        owner_id=current_user.id,
+        scope="orders.buy_now",
+        key=idempotency_key,
+        payload=payload.model_dump(mode="json"),
+        response=response,
+        response_model=BuyNowResponse,
+        status_code=200,
+        handler=buy_now,
     )
 
-    payment_redirect_url = None
-    if payload.payment_method == PaymentMethod.ESEWA:
-        payment_redirect_url = f"/payments/esewa/initiate?order_id={order.id}"
-
-    return BuyNowResponse(
-        order_id=order.id,
-        status=str(order.status),
-        total_price=total_price,
-        seller_count=seller_count,
-        paymentmethod=str(payload.payment_method),
-        payment_redirect_url=payment_redirect_url,  
-    )
\ No newline at end of file
+
+@router.get("/checkout/{ticket}", response_model=CheckoutTicketRead)
+def checkout_ticket_api(
+    ticket: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: Customer = Depends(get_current_customer),
+):
+    out = get_checkout_ticket(db, ticket, current_user.id)
+    if out.status == "QUEUED":
+        response.headers["Retry-After"] = "1"
+    return out
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status, File, UploadFile, Form,Query
+from fastapi import APIRouter, Depends, status, File, UploadFile, Form,Query,Response,Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal
+from decimal import Decimal
 from backend.core.settings import UPLOAD_DIR
 from backend.models.product import ProductCategory,ProductStatus,TargetAudience
 from typing import Optional
 from backend.database import get_db
-from backend.schemas.product import ProductListRead,ProductRead,ProductCreate,ProductUpdate,ProductVariantCreate,ProductVariantRead,ProductImageRead,AllProduct
+from backend.schemas.product import ProductBatchRequest,ProductFacets,ProductListRead,ProductRead,ProductCreate,ProductUpdate,ProductVariantCreate,ProductVariantRead,ProductImageRead,AllProduct
 from backend.models.seller import Seller
 from backend.utils.jwt import get_current_seller,get_current_admin
 from backend.utils.verifyied import verify_seller_or_not
@@ -14,9 +16,12 @@ from backend.service.product_service import (
     add_product_variant,edit_product_by_seller,delete_product_by_admin,
     delete_product_by_seller,view_product,view_all_product_seller,
     view_all_product,search_products,view_product_by_slug,
-    upload_single_product_image,upload_multiple_product_images,get_product_options
+    upload_single_product_image,upload_multiple_product_images,get_product_options_document,
+    view_products_batch
 
 )
+from backend.service.product_cache import etag_matches
+from backend.service.facet_service import get_product_facets
 from backend.models.product import Product
 from typing import Optional
 from backend.models.admin import Admin
@@ -26,21 +31,73 @@ router=APIRouter(prefix="/product",tags=["Product"])
 
 @router.get("/", response_model=List[ProductListRead])
 def get_all_product(
+    response: Response,
     category: Optional[ProductCategory] = Query(None),
+    target_audience: Optional[TargetAudience] = Query(None),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = Query(False, description="Only products with an active variant in stock"),
+    seller_id: Optional[int] = Query(None),
+    sort: Literal["newest", "price_asc", "price_desc"] = Query("newest"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     db: Session = Depends(get_db),
 ):
-    return view_all_product(
+    products, next_cursor = view_all_product(
         db=db,
         category=category,
         skip=skip,
         limit=limit,
         only_active=True,
+        cursor=cursor,
+        target_audience=target_audience,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock,
+        seller_id=seller_id,
+        sort=sort,
     )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return products
+
+@router.get("/facets", response_model=ProductFacets)
+def product_facets(
+    category: Optional[ProductCategory] = Query(None),
+    target_audience: Optional[TargetAudience] = Query(None),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = Query(False),
+    seller_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+):
+    return get_product_facets(
+        db,
+        category=category,
+        target_audience=target_audience,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock,
+        seller_id=seller_id,
+    )
+
 @router.get("/products/{product_id}/options")
-def product_options(product_id: int, db: Session = Depends(get_db)):
-    return get_product_options(db, product_id)
+def product_options(product_id: int, request: Request, db: Session = Depends(get_db)):
+    document = get_product_options_document(db, product_id)
+    headers = {"ETag": f'"{document["etag"]}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), document["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(document["body"], headers=headers)
+
+@router.post("/batch")
+def get_products_batch(
+    payload: ProductBatchRequest,
+    fields: Optional[str] = Query(None, description="Comma-separated AllProduct fields to return"),
+    db: Session = Depends(get_db),
+):
+    selected = {f.strip() for f in fields.split(",") if f.strip()} if fields else None
+    return view_products_batch(db, payload.ids, payload.slugs, selected)
 
 @router.get("/slug/{slug}", response_model=AllProduct)
 def get_product_by_slug(
@@ -55,9 +112,10 @@ def product_search(
     category: Optional[ProductCategory] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    sort: Literal["newest", "relevance"] = Query("newest"),
     db: Session = Depends(get_db),
 ):
-    return search_products(q=q, category=category, skip=skip, limit=limit, db=db)
+    return search_products(q=q, category=category, skip=skip, limit=limit, db=db, sort=sort)
 
 @router.get("/{product_id}",response_model=AllProduct)
 def get_product(product_id:int,db:Session=Depends(get_db),
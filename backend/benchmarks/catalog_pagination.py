@@ -0,0 +1,72 @@
+"""
+Page 1 vs a deep page of GET /product/, paged with skip/limit and with the
+keyset cursor, on a catalog of --products active products.
+
+    python -m backend.benchmarks.catalog_pagination [--products 1000000] [--page 500]
+
+Only the shortfall is seeded, so a second run on the same database starts
+measuring right away. With offsets a deep page reads and throws away
+every row before it; with the cursor each page should cost about the
+same as the first.
+"""
+import argparse
+
+from sqlalchemy import func, select, text
+
+from backend.benchmarks.harness import app_client, make_seller, measure, print_table, seed_products
+
+PAGE_SIZE = 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=500, help="the deep page to compare with page 1")
+    parser.add_argument("--repeat", type=int, default=50, help="requests per scenario")
+    args = parser.parse_args()
+
+    from backend.database import SessionLocal
+    from backend.models.product import Product, ProductStatus
+
+    with app_client() as client:
+        db = SessionLocal()
+        try:
+            have = db.scalar(select(func.count()).select_from(Product).where(Product.status == ProductStatus.active))
+            if have < args.products:
+                print(f"seeding {args.products - have} products")
+                seed_products(db, make_seller(db), args.products - have, progress=True)
+                db.execute(text("ANALYZE products"))
+                db.commit()
+        finally:
+            db.close()
+
+        rows = []
+        for label, filters in (("newest", {}), ("category", {"category": "Clothes"})):
+            # walk to the deep page once to get its cursor
+            cursor = None
+            for _ in range(args.page - 1):
+                params = {**filters, "limit": PAGE_SIZE}
+                if cursor:
+                    params["cursor"] = cursor
+                cursor = client.get("/product/", params=params).headers.get("X-Next-Cursor")
+                if not cursor:
+                    raise SystemExit(f"the catalog has fewer than {args.page} pages for {label}")
+
+            def page(params: dict):
+                def call(i: int) -> bool:
+                    return client.get("/product/", params={**filters, "limit": PAGE_SIZE, **params}).status_code == 200
+                return call
+
+            rows += [
+                measure(f"{label} page 1", page({}), requests=args.repeat).row(),
+                measure(
+                    f"{label} page {args.page} skip", page({"skip": (args.page - 1) * PAGE_SIZE}), requests=args.repeat,
+                ).row(),
+                measure(f"{label} page {args.page} cursor", page({"cursor": cursor}), requests=args.repeat).row(),
+            ]
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
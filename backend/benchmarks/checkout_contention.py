@@ -0,0 +1,145 @@
+"""
+Concurrent checkouts whose carts overlap on a few hot SKUs, with the
+set-based stock decrement and with the per-variant UPDATE loop it
+replaced.
+
+    python -m backend.benchmarks.checkout_contention [--buyers 200] [--concurrency 16] [--lines 30] [--hot 5]
+
+Every buyer's cart holds --lines variants: --hot-lines of the --hot shared
+SKUs and the rest its own. Each scenario checks all carts out (cash on
+delivery) through place_order_service on --concurrency threads and
+reports checkout latency plus lock wait: the time spent in statements
+that lock or update product_variants rows, which is where a checkout
+queues behind the others holding the hot SKUs.
+
+Run it against Postgres: SQLite serializes every writer, so there is no
+row-lock contention to measure and the set-based path falls back to
+per-row updates anyway.
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy import event, select, update
+
+from backend.benchmarks.harness import (
+    Run, default_address_ids, fill_carts, make_customers, make_seller, measure, print_table, seed_products,
+)
+
+_waits = threading.local()
+
+
+def _per_row_decrement(db, variant_qty):
+    """The pre-batching decrement: lock the rows, then one guarded UPDATE per variant."""
+    from backend.models.ProductVariant import ProductVariant
+    from backend.service.inventory_service import _insufficient
+
+    items = sorted(variant_qty.items())
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            select(ProductVariant.id)
+            .where(ProductVariant.id.in_([vid for vid, _ in items]))
+            .order_by(ProductVariant.id)
+            .with_for_update()
+        )
+    remaining = {}
+    for vid, qty in items:
+        row = db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == vid, ProductVariant.stock_quantity >= qty)
+            .values(stock_quantity=ProductVariant.stock_quantity - qty)
+            .returning(ProductVariant.stock_quantity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is not None:
+            remaining[vid] = row[0]
+    _insufficient(variant_qty, remaining)
+    return remaining
+
+
+def _watch_stock_statements(engine) -> None:
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._bench_started = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        sql = statement.lstrip().upper()
+        if "PRODUCT_VARIANTS" in sql and ("FOR UPDATE" in sql or sql.startswith("UPDATE")):
+            _waits.total = getattr(_waits, "total", 0.0) + time.perf_counter() - context._bench_started
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--lines", type=int, default=30, help="variants per cart")
+    parser.add_argument("--hot", type=int, default=5, help="SKUs every cart draws from")
+    parser.add_argument("--hot-lines", type=int, default=3, help="hot SKUs per cart")
+    args = parser.parse_args()
+
+    import backend.main  # noqa: F401  creates the schema
+    from backend.database import SessionLocal, engine
+    from backend.models.order import PaymentMethod
+    from backend.service import order_service
+    from backend.service.order_service import place_order_service
+
+    cold_lines = args.lines - args.hot_lines
+    db = SessionLocal()
+    try:
+        variants = seed_products(db, make_seller(db), args.hot + args.buyers * cold_lines, stock=10_000_000)
+        buyers = [cid for cid, _ in make_customers(db, args.buyers)]
+        addresses = default_address_ids(db, buyers)
+    finally:
+        db.close()
+    hot, cold = variants[:args.hot], variants[args.hot:]
+    rng = random.Random(0)
+    cart_lines = {
+        buyer: rng.sample(hot, args.hot_lines) + cold[n * cold_lines:(n + 1) * cold_lines]
+        for n, buyer in enumerate(buyers)
+    }
+
+    _watch_stock_statements(engine)
+    rows = []
+    for label, decrement in (("per-row UPDATE loop", _per_row_decrement), ("set-based UPDATE", None)):
+        db = SessionLocal()
+        try:
+            fill_carts(db, cart_lines)
+        finally:
+            db.close()
+
+        waits = Run(f"  lock wait ({label})")
+
+        def checkout(i: int) -> bool:
+            buyer = buyers[i]
+            _waits.total = 0.0
+            session = SessionLocal()
+            try:
+                place_order_service(
+                    session, user_id=buyer, address_id=addresses[buyer],
+                    paymentmethod=PaymentMethod.CASH_ON_DELIVERY.value,
+                )
+            finally:
+                session.close()
+            waits.latencies.append(_waits.total)
+            return True
+
+        original = order_service.decrement_stock
+        if decrement is not None:
+            order_service.decrement_stock = decrement
+        try:
+            run = measure(label, checkout, requests=len(buyers), concurrency=args.concurrency)
+        finally:
+            order_service.decrement_stock = original
+        waits.elapsed = run.elapsed
+        rows += [run.row(), {**waits.row(), "per_sec": "-"}]
+
+    print(f"{args.buyers} checkouts of {args.lines} lines, {args.hot} hot SKUs, {args.concurrency} threads, "
+          f"{engine.dialect.name}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
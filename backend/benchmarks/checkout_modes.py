@@ -0,0 +1,98 @@
+"""
+Load generator for POST /orders/order: throughput and tail latency of the
+default sync checkout against CHECKOUT_MODE=queued.
+
+    python -m backend.benchmarks.checkout_modes [--buyers 300] [--clients 40] [--lines 5] [--hot 3]
+
+--clients concurrent shoppers each check out one cart (cash on delivery)
+over HTTP. A sync checkout is done when the 201 arrives. A queued one is
+done when its ticket, polled every --poll seconds, turns DONE or FAILED;
+its latency includes the time spent in the queue. Carts share --hot SKUs
+so the queue's variant grouping has overlapping orders to separate.
+
+Only run this against Postgres with its real pool settings: with more
+clients than pool_size + max_overflow (30) connections the sync mode
+shows the pool exhaustion the queued mode exists to avoid.
+"""
+import argparse
+import random
+import time
+
+from backend.benchmarks.harness import (
+    app_client, default_address_ids, fill_carts, make_customers, make_seller, measure, print_table, seed_products,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--buyers", type=int, default=300, help="checkouts per mode")
+    parser.add_argument("--clients", type=int, default=40, help="concurrent shoppers")
+    parser.add_argument("--lines", type=int, default=5, help="variants per cart")
+    parser.add_argument("--hot", type=int, default=3, help="SKUs shared by every cart")
+    parser.add_argument("--poll", type=float, default=0.05, help="seconds between ticket polls")
+    args = parser.parse_args()
+
+    from backend.api.v1 import order as order_api
+    from backend.database import SessionLocal
+    from backend.models.customer import Customer
+    from backend.models.order import PaymentMethod
+    from backend.service import checkout_queue
+    from backend.utils.jwt import create_access_token
+
+    with app_client() as client:
+        db = SessionLocal()
+        try:
+            variants = seed_products(db, make_seller(db), args.hot + args.buyers * args.lines, stock=10_000_000)
+            buyers = [cid for cid, _ in make_customers(db, args.buyers)]
+            addresses = default_address_ids(db, buyers)
+            tokens = {
+                c.id: create_access_token(c, role="Customer")
+                for c in db.query(Customer).filter(Customer.id.in_(buyers))
+            }
+        finally:
+            db.close()
+        hot, own = variants[:args.hot], variants[args.hot:]
+        rng = random.Random(0)
+        cart_lines = {
+            buyer: [rng.choice(hot)] + own[n * args.lines:(n + 1) * args.lines - 1]
+            for n, buyer in enumerate(buyers)
+        }
+
+        def checkout(i: int) -> bool:
+            buyer = buyers[i]
+            headers = {"Authorization": f"Bearer {tokens[buyer]}"}
+            response = client.post(
+                "/orders/order",
+                json={"address_id": addresses[buyer], "payment_method": PaymentMethod.CASH_ON_DELIVERY.value},
+                headers=headers,
+            )
+            if response.status_code == 201:
+                return True
+            if response.status_code != 202:
+                return False
+            ticket = response.json()["ticket"]
+            while True:
+                time.sleep(args.poll)
+                status = client.get(f"/orders/checkout/{ticket}", headers=headers).json()["status"]
+                if status != "QUEUED":
+                    return status == "DONE"
+
+        rows = []
+        for mode in ("sync", "queued"):
+            db = SessionLocal()
+            try:
+                fill_carts(db, cart_lines)
+            finally:
+                db.close()
+            order_api.CHECKOUT_MODE = checkout_queue.CHECKOUT_MODE = mode
+            rows.append(measure(mode, checkout, requests=len(buyers), concurrency=args.clients).row())
+
+    print(
+        f"{args.buyers} checkouts per mode, {args.clients} clients, {args.lines} lines, {args.hot} hot SKUs; "
+        f"queue: {checkout_queue.CHECKOUT_WORKERS} workers, batches of up to {checkout_queue.CHECKOUT_BATCH_MAX}"
+    )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Orders/sec when every order is for the same variant, with its stock in
+the variant row and split across --shards counter rows.
+
+    python -m backend.benchmarks.hot_sku [--orders 400] [--concurrency 16] [--shards 8]
+
+Each scenario gets its own fresh hot variant and --orders buyers whose
+carts hold one unit of it, then checks them all out (cash on delivery)
+through place_order_service on --concurrency threads. Unsharded, every
+checkout queues on the variant's row lock; sharded, concurrent checkouts
+land on different shard rows.
+
+Run it against Postgres: SQLite serializes every writer, so both
+scenarios are bound by the same database-wide lock.
+"""
+import argparse
+
+from backend.benchmarks.harness import (
+    default_address_ids, fill_carts, make_customers, make_seller, measure, print_table, seed_products,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orders", type=int, default=400, help="checkouts per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+
+    import backend.main  # noqa: F401  creates the schema
+    from backend.database import SessionLocal, engine
+    from backend.models.order import PaymentMethod
+    from backend.service.order_service import place_order_service
+    from backend.service.stock_shard_service import enable_stock_sharding
+
+    db = SessionLocal()
+    try:
+        plain, sharded = seed_products(db, make_seller(db), 2, stock=10_000_000)
+        enable_stock_sharding(db, sharded, args.shards)
+        buyers = [cid for cid, _ in make_customers(db, args.orders)]
+        addresses = default_address_ids(db, buyers)
+    finally:
+        db.close()
+
+    def checkout(i: int) -> bool:
+        session = SessionLocal()
+        try:
+            place_order_service(
+                session, user_id=buyers[i], address_id=addresses[buyers[i]],
+                paymentmethod=PaymentMethod.CASH_ON_DELIVERY.value,
+            )
+        finally:
+            session.close()
+        return True
+
+    rows = []
+    for label, variant_id in (("one variant row", plain), (f"{args.shards} stock shards", sharded)):
+        db = SessionLocal()
+        try:
+            fill_carts(db, {buyer: [variant_id] for buyer in buyers})
+        finally:
+            db.close()
+        rows.append(measure(label, checkout, requests=len(buyers), concurrency=args.concurrency).row())
+
+    print(f"{args.orders} orders of one hot SKU per scenario, {args.concurrency} threads, {engine.dialect.name}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
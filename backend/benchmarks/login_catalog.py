@@ -0,0 +1,80 @@
+"""
+Catalog latency while logins hammer bcrypt, with the password process pool
+and with hashing inline on the request thread (how it ran before the pool).
+
+    python -m backend.benchmarks.login_catalog [--logins 8] [--reads 400] [--readers 4]
+
+Scenarios, each reporting GET /product/ latency:
+
+- catalog only: no logins, the baseline
+- + logins, pool: `--logins` threads log in back to back; bcrypt runs in
+  PASSWORD_WORKERS processes
+- + logins, inline: the same, with bcrypt on the anyio threadpool thread
+
+Login throughput for both login scenarios is printed as well. Use the
+production BCRYPT_ROUNDS (12 by default); low rounds hide the effect.
+"""
+import argparse
+import os
+
+# the benchmark logs the same accounts in thousands of times from one IP
+os.environ.setdefault("AUTH_IP_RATE_PER_MINUTE", "0")
+os.environ.setdefault("LOGIN_ACCOUNT_RATE_PER_MINUTE", "0")
+
+from backend.benchmarks.harness import (  # noqa: E402
+    app_client, background, make_customers, make_seller, measure, print_table, seed_products,
+)
+
+PASSWORD = "bench-password"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=8, help="concurrent login threads")
+    parser.add_argument("--reads", type=int, default=400, help="catalog requests per scenario")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent catalog threads")
+    parser.add_argument("--accounts", type=int, default=20)
+    args = parser.parse_args()
+
+    from backend.database import SessionLocal
+    from backend.utils import hashed
+
+    with app_client() as client:
+        db = SessionLocal()
+        try:
+            seed_products(db, make_seller(db), 200)
+            accounts = make_customers(db, args.accounts, hashed.hashed_password(PASSWORD))
+        finally:
+            db.close()
+
+        def read_catalog(i: int) -> bool:
+            return client.get("/product/", params={"limit": 20}).status_code == 200
+
+        def log_in(i: int) -> bool:
+            email = accounts[i % len(accounts)][1]
+            return client.post("/login/login", data={"username": email, "password": PASSWORD}).status_code == 200
+
+        read_catalog(0)  # warm up connections and caches
+        rows = [measure("catalog only", read_catalog, requests=args.reads, concurrency=args.readers).row()]
+
+        with background(log_in, concurrency=args.logins) as logins:
+            catalog = measure("catalog + logins, pool", read_catalog, requests=args.reads, concurrency=args.readers)
+        rows += [catalog.row(), {**logins.row(), "scenario": "  logins (pool)"}]
+
+        pooled_run = hashed._run
+        hashed._run = lambda fn, *a, retry=True: fn(*a)
+        try:
+            with background(log_in, concurrency=args.logins) as logins:
+                catalog = measure(
+                    "catalog + logins, inline", read_catalog, requests=args.reads, concurrency=args.readers,
+                )
+        finally:
+            hashed._run = pooled_run
+        rows += [catalog.row(), {**logins.row(), "scenario": "  logins (inline)"}]
+
+    print(f"bcrypt rounds {hashed.BCRYPT_ROUNDS}, password workers {hashed.PASSWORD_WORKERS}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
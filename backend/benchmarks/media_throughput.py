@@ -0,0 +1,126 @@
+"""
+Requests/sec for one catalog page's worth of product images, served by
+MediaFiles (/uploads) and by the plain StaticFiles it replaced.
+
+    python -m backend.benchmarks.media_throughput [--images 24] [--pages 50] [--concurrency 8]
+
+A page is --images content-addressed card images (random bytes, so they
+do not compress) plus one SVG. Scenarios, per mount:
+
+- first visit: every file fetched in full
+- repeat visit: what the browser sends again. StaticFiles answers nothing
+  with a max-age, so each file is revalidated with If-None-Match (a 304
+  round trip). MediaFiles marks hashed URLs immutable, so the browser
+  sends no request at all; that row measures nothing because there is
+  nothing to measure.
+- range: the first 16 KiB of each image, as a resumed download asks for
+
+The SVG byte counts show the .gz sibling. Files go to a temporary
+directory and no rows are written. This runs in-process, without
+uvicorn's sendfile path, so absolute numbers are lower than behind a
+real server; the ratios are what matter.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from backend.benchmarks.harness import measure, print_table
+
+SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="400" height="400">'
+    + "".join(f'<rect x="{i}" y="{i}" width="10" height="10" fill="#a0a0a0"/>' for i in range(300))
+    + "</svg>"
+)
+
+
+def _write_page(root: Path, images: int, size: int) -> list[str]:
+    from backend.service.media_store import _precompress, blob_relpath
+
+    paths = []
+    for i in range(images):
+        data = os.urandom(size)
+        relpath = blob_relpath(hashlib.sha256(data).hexdigest(), ".webp")
+        (root / relpath).parent.mkdir(parents=True, exist_ok=True)
+        (root / relpath).write_bytes(data)
+        paths.append(relpath)
+    data = SVG.encode()
+    relpath = blob_relpath(hashlib.sha256(data).hexdigest(), ".svg")
+    (root / relpath).parent.mkdir(parents=True, exist_ok=True)
+    (root / relpath).write_bytes(data)
+    _precompress(root / relpath)
+    paths.append(relpath)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", type=int, default=24, help="card images per catalog page")
+    parser.add_argument("--size", type=int, default=40_000, help="bytes per image")
+    parser.add_argument("--pages", type=int, default=50, help="page loads per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from starlette.staticfiles import StaticFiles
+
+    from backend.core.media_files import MediaFiles
+
+    with tempfile.TemporaryDirectory(prefix="media_bench_") as tmp:
+        root = Path(tmp)
+        paths = _write_page(root, args.images, args.size)
+        app = Starlette(routes=[
+            Mount("/uploads", MediaFiles(directory=str(root))),
+            Mount("/static", StaticFiles(directory=str(root))),
+        ])
+        requests = args.pages * len(paths)
+        browser = {"accept-encoding": "gzip, deflate, br"}
+
+        with TestClient(app) as client:
+            def fetch(mount: str, headers_for=lambda path: {}, expect: int = 200, files: list[str] = paths):
+                def call(i: int) -> bool:
+                    path = files[i % len(files)]
+                    response = client.get(f"/{mount}/{path}", headers={**browser, **headers_for(path)})
+                    return response.status_code == expect
+                return call
+
+            etags = {
+                mount: {path: client.get(f"/{mount}/{path}", headers=browser).headers["etag"] for path in paths}
+                for mount in ("uploads", "static")
+            }
+            rows = []
+            for mount, label in (("static", "StaticFiles"), ("uploads", "MediaFiles")):
+                rows.append(measure(f"{label} first visit", fetch(mount), requests=requests,
+                                    concurrency=args.concurrency).row())
+                if mount == "static":
+                    rows.append(measure(
+                        f"{label} repeat visit (304s)",
+                        fetch(mount, lambda path, m=mount: {"if-none-match": etags[m][path]}, expect=304),
+                        requests=requests, concurrency=args.concurrency,
+                    ).row())
+                else:
+                    rows.append({"scenario": f"{label} repeat visit (immutable)", "n": 0})
+                rows.append(measure(
+                    f"{label} range",
+                    fetch(mount, lambda path: {"range": "bytes=0-16383"}, expect=206, files=paths[:-1]),
+                    requests=args.pages * (len(paths) - 1), concurrency=args.concurrency,
+                ).row())
+
+            svg = paths[-1]
+            for mount in ("static", "uploads"):
+                response = client.get(f"/{mount}/{svg}", headers=browser)
+                print(
+                    f"/{mount} svg: {response.headers['content-length']} bytes on the wire, "
+                    f"content-encoding={response.headers.get('content-encoding', '-')}, "
+                    f"cache-control={response.headers.get('cache-control', '-')}"
+                )
+
+    print(f"{len(paths)} files per page, {args.pages} page loads per scenario")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
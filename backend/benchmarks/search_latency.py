@@ -0,0 +1,109 @@
+"""
+Product search latency on a seeded catalog: the full-text backend
+(tsvector + GIN on Postgres, the in-memory index elsewhere) against the
+triple LIKE scan /product/search used to run.
+
+    python -m backend.benchmarks.search_latency [--products 100000] [--repeat 30]
+
+Product names are drawn from a small vocabulary, so some terms match
+thousands of products and others a handful. The typo query exercises the
+trigram (Postgres) or difflib (in-memory) fallback.
+"""
+import argparse
+import random
+
+from sqlalchemy import func, or_, select, text
+
+from backend.benchmarks.harness import make_seller, measure, print_table, seed_products
+
+ADJECTIVES = ["classic", "slim", "vintage", "organic", "handmade", "summer", "winter", "silk", "denim", "leather"]
+COLORS = ["red", "black", "white", "navy", "olive", "mustard", "teal", "maroon", "beige", "grey"]
+ITEMS = [
+    "shirt", "kurta", "sneakers", "sandals", "necklace", "earrings", "scarf", "jacket", "saree", "backpack",
+    "wallet", "bracelet", "boots", "hoodie", "cap", "belt", "ring", "dhaka", "topi", "shawl",
+]
+
+QUERIES = {
+    "common term": "shirt",
+    "two terms": "leather boots",
+    "three terms": "vintage navy jacket",
+    "prefix": "sneak",
+    "rare term": "mustard topi",
+    "typo": "neckalce",
+    "no match": "submarine",
+}
+
+
+def _name(i: int) -> str:
+    rng = random.Random(i)
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(COLORS)} {rng.choice(ITEMS)}"
+
+
+def _like_search(db, term: str, limit: int = 20):
+    """The pre-full-text query: every active product's three columns through LIKE."""
+    from backend.models.product import Product, ProductStatus
+
+    pattern = f"%{term.strip().lower()}%"
+    return db.scalars(
+        select(Product)
+        .where(
+            Product.status == ProductStatus.active,
+            or_(
+                func.lower(func.trim(Product.product_name)).like(pattern),
+                func.lower(func.trim(Product.url_slug)).like(pattern),
+                func.lower(func.trim(Product.description)).like(pattern),
+            ),
+        )
+        .order_by(Product.created_at.desc())
+        .limit(limit)
+    ).all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=30, help="searches per scenario")
+    args = parser.parse_args()
+
+    import backend.main  # noqa: F401  creates the schema and search extensions
+    from backend.database import SessionLocal
+    from backend.models.product import Product
+    from backend.service.search_service import reindex_all_products, search_product_rows
+
+    db = SessionLocal()
+    try:
+        have = db.scalar(select(func.count()).select_from(Product).where(Product.url_slug.like("bench-%")))
+        if have < args.products:
+            print(f"seeding {args.products - have} products")
+            seed_products(db, make_seller(db), args.products - have, name=_name, progress=True)
+        reindex_all_products(db)
+        db.execute(text("ANALYZE products"))
+        db.commit()
+
+        rows = []
+        for label, term in QUERIES.items():
+            for sort in ("newest", "relevance"):
+                def fts(i: int, term=term, sort=sort) -> bool:
+                    search_product_rows(db, term=term, category=None, skip=0, limit=20, sort=sort)
+                    return True
+
+                hits = len(search_product_rows(db, term=term, category=None, skip=0, limit=20, sort=sort))
+                rows.append({**measure(f"{label} ({sort})", fts, requests=args.repeat).row(), "hits": hits})
+
+            def like(i: int, term=term) -> bool:
+                _like_search(db, term)
+                return True
+
+            hits = len(_like_search(db, term))
+            rows.append({**measure(f"{label} (LIKE scan)", like, requests=args.repeat).row(), "hits": hits})
+            db.rollback()
+        dialect = db.get_bind().dialect.name
+    finally:
+        db.close()
+
+    print(f"{args.products} products, {dialect}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import math
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(
+        _BASE83[(value // (83 ** (length - i))) % 83] for i in range(1, length + 1)
+    )
+
+
+def _srgb_to_linear(channel: int) -> float:
+    v = channel / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def encode(image, x_components: int = 4, y_components: int = 3) -> str:
+    """
+    BlurHash of a Pillow image. The image is shrunk to 32x32 first, which
+    is plenty for a placeholder and keeps the DCT cheap.
+    """
+    small = image.convert("RGB").resize((32, 32))
+    width, height = small.size
+    pixels = [tuple(_srgb_to_linear(c) for c in px) for px in small.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                cos_y = math.cos(math.pi * j * y / height)
+                row = y * width
+                for x in range(width):
+                    basis = norm * math.cos(math.pi * i * x / width) * cos_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(v) for f in ac for v in f)
+        quant_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quant_max + 1) / 166
+        result += _encode83(quant_max, 1)
+    else:
+        max_value = 1.0
+        result += _encode83(0, 1)
+
+    dc_value = (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2])
+    result += _encode83(dc_value, 4)
+
+    for f in ac:
+        qr, qg, qb = (
+            max(0, min(18, int(_sign_pow(v / max_value, 0.5) * 9 + 9.5))) for v in f
+        )
+        result += _encode83(qr * 19 * 19 + qg * 19 + qb, 2)
+
+    return result
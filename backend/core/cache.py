@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with an optional per-entry TTL.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Same interface as LRUCache on top of any Redis-compatible client
+    (get/set/delete/scan_iter). Values must be JSON serialisable.
+    """
+
+    def __init__(self, client, namespace: str, ttl: Optional[float] = None) -> None:
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any | None:
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*[self._key(k) for k in keys])
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{self._key(prefix)}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self) -> None:
+        self.delete_prefix("")
+
+
+def build_cache(namespace: str, maxsize: int = 1024, ttl: Optional[float] = None):
+    """
+    Redis when CACHE_REDIS_URL is set and the client library is installed,
+    otherwise an in-process LRU.
+    """
+    if CACHE_REDIS_URL:
+        try:
+            import redis
+        except ImportError:
+            redis = None
+        if redis is not None:
+            return RedisCache(redis.Redis.from_url(CACHE_REDIS_URL), namespace, ttl)
+    return LRUCache(maxsize=maxsize, ttl=ttl)
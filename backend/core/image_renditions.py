@@ -0,0 +1,48 @@
+# Runs inside the image pipeline's worker processes: keep database and
+# FastAPI imports out of this module so workers start fast.
+from pathlib import Path
+
+from backend.core import blurhash
+
+# longest side in pixels
+RENDITIONS = {"thumb": 160, "card": 480, "zoom": 1600}
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+
+
+def rendition_path(source: Path, name: str, ext: str) -> Path:
+    return source.with_name(f"{source.stem}_{name}.{ext}")
+
+
+def render_image(source_path: str) -> dict:
+    """
+    Writes <stem>_<name>.webp (and .avif when Pillow supports it) next to
+    the source and returns {"renditions": {name: path}, "blurhash": str}.
+    """
+    from PIL import Image, ImageOps
+
+    source = Path(source_path)
+    out: dict = {"renditions": {}, "blurhash": None}
+
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        for name, size in RENDITIONS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+
+            webp = rendition_path(source, name, "webp")
+            resized.save(webp, "WEBP", quality=WEBP_QUALITY, method=4)
+            out["renditions"][name] = str(webp)
+
+            try:
+                resized.save(rendition_path(source, name, "avif"), "AVIF", quality=AVIF_QUALITY)
+            except (KeyError, OSError, ValueError):
+                # Pillow built without an AVIF encoder; WebP is enough
+                pass
+
+        out["blurhash"] = blurhash.encode(image)
+
+    return out
@@ -0,0 +1,74 @@
+import os
+import re
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# content-addressed blobs and their renditions: <sha256>[_<rendition>].<ext>
+_FINGERPRINTED = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?(\.[a-z0-9]+)?$")
+
+
+def is_fingerprinted(path: str) -> bool:
+    return bool(_FINGERPRINTED.match(os.path.basename(path)))
+
+
+class MediaFiles(StaticFiles):
+    """
+    StaticFiles for /uploads. Hashed URLs never change content, so they are
+    cached for a year without revalidation; anything else (files stored
+    before content addressing) is revalidated against its ETag. A .gz
+    sibling is served to clients that accept gzip. Range requests and the
+    pathsend extension come from Starlette's FileResponse.
+    """
+
+    def get_response(self, path: str, scope: Scope) -> Response:
+        # hides .incoming/ partial uploads and any other dot entries
+        if any(part.startswith(".") for part in path.split(os.sep) if part):
+            raise HTTPException(status_code=404)
+        return super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = guess_type(full_path)[0] or "application/octet-stream"
+
+        serve_path, encoding = full_path, None
+        if "range" not in request_headers and "gzip" in request_headers.get("accept-encoding", ""):
+            gz_path = full_path + ".gz"
+            try:
+                gz_stat = os.stat(gz_path)
+            except OSError:
+                pass
+            else:
+                serve_path, stat_result, encoding = gz_path, gz_stat, "gzip"
+
+        response = FileResponse(
+            serve_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=media_type,
+        )
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        if os.path.exists(full_path + ".gz"):
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if is_fingerprinted(full_path) else REVALIDATE_CACHE_CONTROL
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from fastapi import status
+
+from backend.core.error_handler import error_handler
+
+
+def encode_cursor(key: datetime | Decimal, row_id: int) -> str:
+    """
+    Opaque keyset cursor for listings ordered by (key, id).
+    """
+    value = key.isoformat() if isinstance(key, datetime) else str(key)
+    raw = json.dumps([value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type = datetime) -> tuple:
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding)
+        value, row_id = json.loads(raw.decode("utf-8"))
+        key = datetime.fromisoformat(value) if key_type is datetime else key_type(value)
+        return key, int(row_id)
+    except (ValueError, TypeError, InvalidOperation):
+        raise error_handler(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
@@ -0,0 +1,44 @@
+import logging
+import threading
+from typing import Callable
+
+from backend.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """
+    Runs job(db) every interval seconds on a daemon thread with its own
+    session. Errors are logged and the job runs again on the next tick.
+    """
+
+    def __init__(self, name: str, interval: float, job: Callable) -> None:
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                self.job(db)
+            except Exception:
+                db.rollback()
+                logger.exception("periodic job %s failed", self.name)
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
@@ -0,0 +1,180 @@
+import logging
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+# every route, per client IP; off (0) by default. Behind a proxy every
+# client shares the proxy's IP unless RATE_LIMIT_TRUST_PROXY=1 and the proxy
+# sends X-Forwarded-For, so only turn it on once that is set up
+RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "0"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "60"))
+
+
+class TokenBucket:
+    """
+    In-process token buckets, one per key: `rate` tokens per second up to
+    `burst`. Keys are spread over shards with their own lock so concurrent
+    checks rarely contend; a check is a dict lookup and a bit of float math.
+    Idle buckets are dropped once a shard grows past max_keys / shards.
+    """
+
+    def __init__(self, rate: float, burst: float, shards: int = 64, max_keys: int = 200_000) -> None:
+        if rate <= 0 or burst <= 0:
+            raise ValueError("a token bucket needs a positive rate and burst; leave it out to disable the limit")
+        self.rate = rate
+        self.burst = burst
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._shard_max = max(max_keys // shards, 1)
+
+    def hit(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 if allowed, else seconds until it would be."""
+        buckets, lock = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            state = buckets.get(key)
+            if state is None:
+                if len(buckets) >= self._shard_max:
+                    self._prune(buckets, now)
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            if tokens >= cost:
+                buckets[key] = (tokens - cost, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+            return (cost - tokens) / self.rate
+
+    def peek(self, key: str, cost: float = 1.0) -> float:
+        """Like hit, without taking anything: 0 if cost tokens are there, else the wait."""
+        buckets, lock = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            state = buckets.get(key)
+        if state is None:
+            return 0.0
+        tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+        return 0.0 if tokens >= cost else (cost - tokens) / self.rate
+
+    def _prune(self, buckets: dict, now: float) -> None:
+        refill = self.burst / self.rate
+        for key in [k for k, (_, seen) in buckets.items() if now - seen >= refill]:
+            del buckets[key]
+
+
+_REDIS_BUCKET = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+if ARGV[4] == '1' then return tostring(wait) end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket:
+    """
+    TokenBucket shared by every worker through Redis (one Lua call per
+    check). Falls back to the local buckets when Redis is unreachable so
+    an outage does not lock everyone out.
+    """
+
+    def __init__(self, client, namespace: str, rate: float, burst: float) -> None:
+        self.namespace = namespace
+        self.rate = rate
+        self.burst = burst
+        self._script = client.register_script(_REDIS_BUCKET)
+        self._local = TokenBucket(rate, burst)
+
+    def hit(self, key: str, cost: float = 1.0) -> float:
+        return self._call(key, cost, peek=False)
+
+    def peek(self, key: str, cost: float = 1.0) -> float:
+        return self._call(key, cost, peek=True)
+
+    def _call(self, key: str, cost: float, *, peek: bool) -> float:
+        try:
+            return float(self._script(
+                keys=[f"{self.namespace}:{key}"], args=[self.rate, self.burst, cost, int(peek)]
+            ))
+        except Exception:
+            logger.warning("rate limit backend unavailable, using local buckets", exc_info=True)
+            return self._local.peek(key, cost) if peek else self._local.hit(key, cost)
+
+
+def build_bucket(namespace: str, rate: float, burst: float):
+    """
+    Redis-backed when RATE_LIMIT_REDIS_URL is set and the client library is
+    installed, otherwise in-process. None when rate or burst is 0 (or less):
+    that limit is switched off, as RATE_LIMIT_IP_RATE=0 is.
+    """
+    if rate <= 0 or burst <= 0:
+        return None
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            import redis
+        except ImportError:
+            redis = None
+        if redis is not None:
+            return RedisTokenBucket(redis.Redis.from_url(RATE_LIMIT_REDIS_URL), namespace, rate, burst)
+    return TokenBucket(rate, burst)
+
+
+def retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """
+    Per-IP token buckets checked before routing, so a throttled request
+    never reaches the database or bcrypt. `default` applies to every
+    request; `routes` maps exact paths to stricter buckets checked as
+    well. Rejections are 429 with Retry-After.
+    """
+
+    def __init__(self, app, default: Optional[TokenBucket] = None, routes: Optional[dict] = None) -> None:
+        self.app = app
+        self.default = default
+        self.routes = routes or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        ip = client_ip(scope)
+        wait = self.default.hit(ip) if self.default is not None else 0.0
+        route_bucket = self.routes.get(scope["path"])
+        if not wait and route_bucket is not None:
+            wait = route_bucket.hit(ip)
+
+        if wait:
+            response = JSONResponse(
+                {"detail": "Too many requests, please retry shortly"},
+                status_code=429,
+                headers={"Retry-After": retry_after(wait)},
+            )
+            return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
@@ -0,0 +1,49 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Optional
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class CookieSigner:
+    """
+    Tamper-proof (not encrypted) cookie values: base64url JSON plus an
+    HMAC-SHA256 over it. `purpose` separates keys derived from one secret.
+    """
+
+    def __init__(self, secret: str, purpose: str, max_age: int) -> None:
+        self.key = hashlib.sha256(f"{purpose}:{secret}".encode("utf-8")).digest()
+        self.max_age = max_age
+
+    def _sign(self, body: str) -> str:
+        return _b64(hmac.new(self.key, body.encode("ascii"), hashlib.sha256).digest())
+
+    def dumps(self, data: Any) -> str:
+        raw = json.dumps({"d": data, "t": int(time.time())}, separators=(",", ":"))
+        body = _b64(raw.encode("utf-8"))
+        return f"{body}.{self._sign(body)}"
+
+    def loads(self, value: Optional[str]) -> Optional[Any]:
+        """The signed data, or None if missing, tampered with or expired."""
+        if not value or "." not in value:
+            return None
+        body, sig = value.rsplit(".", 1)
+        try:
+            if not hmac.compare_digest(sig.encode("ascii"), self._sign(body).encode("ascii")):
+                return None
+            payload = json.loads(_unb64(body))
+        except (UnicodeEncodeError, binascii.Error, ValueError):
+            return None
+        if int(payload.get("t", 0)) + self.max_age < time.time():
+            return None
+        return payload.get("d")
@@ -0,0 +1,14 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session | Connection):
+    """
+    The dialect's insert() construct, which carries on_conflict_do_update /
+    on_conflict_do_nothing. Postgres in production, SQLite in local runs.
+    """
+    bind = db if isinstance(db, Connection) else db.get_bind()
+    if bind.dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
@@ -1,15 +1,38 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from backend.api.v1 import (
     customer, product, review, seller, admin, login, cart, address, order,
     seller_management, esewa_router
 )
 from backend.database import Base, engine
+from backend.core.media_files import MediaFiles
+from backend.core.rate_limit import (
+    RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_RATE, RateLimitMiddleware, TokenBucket
+)
+from backend.service.search_service import ensure_search_extensions
+from backend.service.inventory_service import expire_stale_reservations
+from backend.service.idempotency_service import purge_expired_idempotency_keys
+from backend.core.periodic import PeriodicJob
+from backend.service.checkout_queue import requeue_stale_checkouts, stop_checkout_queue
+from backend.service.stock_shard_service import rebalance_stock_shards
+from backend.service.cart_compaction_service import compact_carts
+from backend.service.credential_service import backfill_credentials
+from backend.service.schema_upgrade import upgrade_schema
+from backend.database import SessionLocal
+from backend.utils.hashed import stop_password_pool
+from backend.utils.jwt import purge_refresh_tokens
+import os
 from pathlib import Path
 app = FastAPI()
 
+# added before CORS so CORS wraps it and 429s still carry CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    default=TokenBucket(RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST) if RATE_LIMIT_IP_RATE > 0 else None,
+    routes=login.RATE_LIMITED_ROUTES,
+)
+
 origins = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
@@ -22,14 +45,18 @@ app.add_middleware(
     allow_credentials=True,  
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "Retry-After"],
 )
 BASE_DIR = Path(__file__).resolve().parent         
 UPLOAD_DIR = BASE_DIR / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount("/uploads", MediaFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
+ensure_search_extensions(engine)
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist; bring their columns and indexes up to date
+upgrade_schema(engine)
 
 app.include_router(login.router)
 app.include_router(customer.router)
@@ -43,6 +70,70 @@ app.include_router(cart.router)
 app.include_router(seller_management.router)
 app.include_router(esewa_router.router)
 
+reservation_sweeper = PeriodicJob(
+    "expire-stock-reservations",
+    float(os.getenv("RESERVATION_SWEEP_INTERVAL", "60")),
+    expire_stale_reservations,
+)
+idempotency_purger = PeriodicJob(
+    "purge-idempotency-keys",
+    float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600")),
+    purge_expired_idempotency_keys,
+)
+shard_rebalancer = PeriodicJob(
+    "rebalance-stock-shards",
+    float(os.getenv("STOCK_SHARD_REBALANCE_INTERVAL", "5")),
+    rebalance_stock_shards,
+)
+cart_compactor = PeriodicJob(
+    "compact-carts",
+    float(os.getenv("CART_COMPACTION_INTERVAL", "3600")),
+    compact_carts,
+)
+checkout_requeuer = PeriodicJob(
+    "requeue-checkouts",
+    float(os.getenv("CHECKOUT_REQUEUE_INTERVAL", "15")),
+    requeue_stale_checkouts,
+)
+refresh_token_purger = PeriodicJob(
+    "purge-refresh-tokens",
+    float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600")),
+    purge_refresh_tokens,
+)
+
+
+@app.on_event("startup")
+def backfill_login_index():
+    # first start after credentials was added: index the existing accounts
+    db = SessionLocal()
+    try:
+        backfill_credentials(db, only_if_empty=True)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_background_jobs():
+    reservation_sweeper.start()
+    idempotency_purger.start()
+    shard_rebalancer.start()
+    cart_compactor.start()
+    checkout_requeuer.start()
+    refresh_token_purger.start()
+
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    reservation_sweeper.stop()
+    idempotency_purger.stop()
+    shard_rebalancer.stop()
+    cart_compactor.stop()
+    checkout_requeuer.stop()
+    refresh_token_purger.stop()
+    stop_checkout_queue()
+    stop_password_pool()
+
+
 @app.get("/")
 def hello_world():
     return {"message": "hello this is online store"}
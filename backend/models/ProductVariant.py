@@ -4,7 +4,7 @@ from decimal import Decimal
 from datetime import datetime
 from sqlalchemy import (
     Integer, String, Numeric, ForeignKey, Boolean, DateTime,
-    UniqueConstraint, Index, CheckConstraint
+    UniqueConstraint, Index, CheckConstraint, text, false
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from backend.database import Base
@@ -18,6 +18,10 @@ class ProductVariant(Base):
         CheckConstraint("stock_quantity >= 0", name="ck_variant_stock_nonnegative"),
         CheckConstraint("price > 0", name="ck_variant_price_positive"),
         Index("ix_variant_product_active", "product_id", "is_active"),
+        Index(
+            "ix_variant_active_product_price", "product_id", "price", "id",
+            postgresql_where=text("is_active"),
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -35,6 +39,12 @@ class ProductVariant(Base):
     stock_quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    # stock lives in variant_stock_shards; stock_quantity is their sum as of
+    # the last rebalance and is only for display
+    stock_sharded: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -11,4 +11,10 @@ from .review import Review
 from .refresh_token import RefreshToken
 from .cart import Cart
 from .cart_items import CartItem
-from .address import Address
\ No newline at end of file
+from .address import Address
+from .media_blob import MediaBlob
+from .stock_reservation import StockReservation
+from .idempotency_key import IdempotencyKey
+from .variant_stock_shard import VariantStockShard
+from .cart_compaction_run import CartCompactionRun
+from .credential import Credential
\ No newline at end of file
@@ -15,6 +15,9 @@ class Admin(Base):
     created_at : Mapped[DateTime]=mapped_column(DateTime, default=datetime.utcnow)
     updated_at : Mapped[DateTime]=mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # bumped to revoke every access token issued so far
+    token_epoch : Mapped[int]=mapped_column(Integer, nullable=False, default=0, server_default="0")
+
     role_name : Mapped[str] = mapped_column(ForeignKey("roles.role_name"), default="Admin")
     
     roles : Mapped["Roles"]=relationship("Roles",back_populates="admin")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from backend.database import Base
-from sqlalchemy import Integer,String,Float,ForeignKey,Column,DateTime, func,Numeric
+from sqlalchemy import Integer,String,Float,ForeignKey,Column,DateTime, func,Numeric,Index,text
 from datetime import datetime
 from sqlalchemy.orm import relationship,Mapped,mapped_column
 from enum import Enum
@@ -13,12 +13,26 @@ class CartStauts(str,Enum):
 
 class Cart(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        # at most one ACTIVE cart per buyer; also the lookup index for it
+        Index(
+            "uq_carts_one_active_per_buyer",
+            "buyer_id",
+            unique=True,
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'"),
+        ),
+        # cart compaction scans by status and age
+        Index("ix_carts_status_updated_at", "status", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     buyer_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("customer.id", ondelete="CASCADE"), nullable=False
     )
     status: Mapped[str] = mapped_column(String, default="ACTIVE", nullable=False)
+    # bumped by every cart mutation; cart summaries are cached per version
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Integer, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.database import Base
+
+
+class CartCompactionRun(Base):
+    """Audit row per cart compaction run: how many carts it touched."""
+    __tablename__ = "cart_compaction_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    abandoned_carts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    deleted_carts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    deleted_items: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    batches: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -25,5 +25,7 @@ class CartItem(Base):
 
     quantity: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     price:Mapped[Decimal]=mapped_column(Numeric(12,2),nullable=False)
+    # bumped by every quantity change; writes are single atomic UPDATEs
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     cart: Mapped["Cart"] = relationship("Cart", back_populates="items")
     variant: Mapped["ProductVariant"] = relationship("ProductVariant", back_populates="cart_items")
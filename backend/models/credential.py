@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from sqlalchemy import Index, Integer, SmallInteger, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.database import Base
+
+
+class Credential(Base):
+    """
+    Login index over the admin, seller and customer tables: one row per
+    account with its email and password hash, so login is one lookup.
+    The same email may exist in more than one table; rank (Admin 0,
+    Seller 1, Customer 2) keeps the old probe order. Rows are written by
+    credential_service whenever an account is inserted, updated or deleted.
+    """
+    __tablename__ = "credentials"
+    __table_args__ = (
+        UniqueConstraint("role", "owner_id", name="uq_credentials_role_owner"),
+        Index("ix_credentials_email_rank", "email", "rank"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    email: Mapped[str] = mapped_column(String, nullable=False)
+    role: Mapped[str] = mapped_column(String(16), nullable=False)
+    rank: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    hashed_password: Mapped[str] = mapped_column(String, nullable=False)
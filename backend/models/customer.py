@@ -18,6 +18,8 @@ class Customer(Base):
     updated_at = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     status: Mapped[str] = mapped_column(String, default="active")
+    # bumped to revoke every access token issued so far
+    token_epoch: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     role_name: Mapped[str] = mapped_column(
         ForeignKey("roles.role_name"), default="Customer"
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime, JSON, UniqueConstraint, Index, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    One client-supplied Idempotency-Key per (owner, endpoint). The first
+    request claims the row as IN_PROGRESS; once it succeeds the response
+    body is stored and replayed for every retry until expires_at. A claim
+    whose locked_until has passed belonged to a process that died before
+    committing anything, and may be taken over by a retry.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "scope", "key", name="uq_idempotency_owner_scope_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+        # queued jobs whose lease ran out, for requeue_stale_checkouts
+        Index(
+            "ix_idempotency_keys_queued_lease",
+            "locked_until",
+            postgresql_where=text("status = 'IN_PROGRESS' AND request_body IS NOT NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    scope: Mapped[str] = mapped_column(String(64), nullable=False)
+    key: Mapped[str] = mapped_column(String(128), nullable=False)
+
+    # sha256 of the request body, so a key cannot be reused for a different order
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="IN_PROGRESS")
+    response_status: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # queued checkouts (CHECKOUT_MODE=queued): the ticket clients poll, and
+    # the request, so any worker can pick the job up again after a restart
+    ticket: Mapped[str | None] = mapped_column(String(32), nullable=True, unique=True, index=True)
+    request_body: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
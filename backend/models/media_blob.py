@@ -0,0 +1,39 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+from backend.database import Base
+
+
+class MediaBlob(Base):
+    """
+    One stored upload, addressed by the sha256 of its bytes. ref_count is
+    the number of Product.image_url / ProductImage.image_url values that
+    point at it; rows at zero are swept by media_store.collect_garbage.
+    """
+    __tablename__ = "media_blobs"
+
+    __table_args__ = (
+        Index(
+            "ix_media_blobs_unreferenced",
+            "updated_at",
+            postgresql_where=text("ref_count <= 0"),
+        ),
+    )
+
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    # relative to UPLOAD_DIR, e.g. "ab/cd/abcd....jpg"
+    path: Mapped[str] = mapped_column(String, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    # rendered once per blob; reused when the same bytes are uploaded again
+    blurhash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
@@ -27,6 +27,8 @@ class OrderStatus(str, Enum):
     PLACED = "PLACED"
     CANCELLED = "CANCELLED"
     COMPLETED = "COMPLETED"
+    # paid, but stock ran short when the payment landed; restock or refund
+    BACKORDERED = "BACKORDERED"
 
 class PaymentMethod(str,Enum):
     NULL="NULL"
@@ -1,9 +1,12 @@
 from __future__ import annotations
 from datetime import datetime
 from enum import Enum
+from decimal import Decimal
 from sqlalchemy import (
-    Integer, String, ForeignKey, DateTime, Enum as SAEnum, Text
+    Integer, String, ForeignKey, DateTime, Enum as SAEnum, Text, Index,
+    Numeric, Boolean, false, text
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from backend.database import Base
 
@@ -27,6 +30,37 @@ class ProductStatus(str, Enum):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index(
+            "ix_products_status_category_created_id",
+            "status", "product_category", "created_at", "id",
+        ),
+        Index("ix_products_status_created_id", "status", "created_at", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_products_name_trgm", "product_name",
+            postgresql_using="gin",
+            postgresql_ops={"product_name": "gin_trgm_ops"},
+        ),
+        # partial indexes backing the listing filters/sorts on active products
+        Index(
+            "ix_products_active_audience_created", "target_audience", "created_at", "id",
+            postgresql_where=text("status = 'active'"),
+        ),
+        Index(
+            "ix_products_active_min_price", "min_price", "id",
+            postgresql_where=text("status = 'active'"),
+        ),
+        Index(
+            "ix_products_active_category_min_price", "product_category", "min_price", "id",
+            postgresql_where=text("status = 'active'"),
+        ),
+        Index(
+            "ix_products_active_in_stock_created", "created_at", "id",
+            postgresql_where=text("status = 'active' AND in_stock"),
+        ),
+        Index("ix_products_seller_created", "seller_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
@@ -45,6 +79,12 @@ class Product(Base):
     )
     description: Mapped[str | None] = mapped_column(Text)
     image_url: Mapped[str | None] = mapped_column(String)
+    image_thumb_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    image_card_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    image_blurhash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"), nullable=True, deferred=True
+    )
 
     status: Mapped[ProductStatus] = mapped_column(
         SAEnum(ProductStatus, name="product_status"),
@@ -56,6 +96,14 @@ class Product(Base):
         Integer, ForeignKey("seller.id"), nullable=False
     )
 
+    # maintained by product_summary_service from the active variants
+    default_variant_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    default_price: Mapped[Decimal | None] = mapped_column(Numeric(12, 2), nullable=True)
+    min_price: Mapped[Decimal | None] = mapped_column(Numeric(12, 2), nullable=True)
+    in_stock: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow
     )
@@ -23,6 +23,15 @@ class ProductImage(Base):
 
     image_url: Mapped[str] = mapped_column(String, nullable=False)
 
+    # filled in by the image pipeline once the worker has rendered them
+    thumb_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    card_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    zoom_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    blurhash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    processing_status: Mapped[str] = mapped_column(
+        String(16), default="pending", server_default="pending", nullable=False
+    )
+
     is_primary: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
     sort_order: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey,Index
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey,Index,text
 from backend.database import Base
 
 class RefreshToken(Base):
@@ -11,9 +11,17 @@ class RefreshToken(Base):
     role = Column(String, nullable=False)    
     owner_id = Column(Integer, nullable=False)
 
+    # every token rotated out of one login shares its family; reusing a
+    # rotated token revokes the whole family
+    family_id = Column(String(32), nullable=False)
+
     expires_at = Column(DateTime, nullable=False)
     revoked = Column(Boolean, default=False, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
 
     __table_args__ = (
         Index("ix_refresh_owner_role", "owner_id", "role"),
-    )
\ No newline at end of file
+        # family revocation only touches live rows
+        Index("ix_refresh_tokens_live_family", "family_id", postgresql_where=text("revoked = false")),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
@@ -37,6 +37,8 @@ class Seller(Base):
 
     status: Mapped[str] = mapped_column(String, default="REJECTED")
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
+    # bumped to revoke every access token issued so far
+    token_epoch: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     role_name: Mapped[str] = mapped_column(ForeignKey("roles.role_name"), default="Seller")
 
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import (
+    Integer,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Enum as SAEnum,
+    Index,
+    CheckConstraint,
+    func,
+    text,
+    false,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.database import Base
+
+
+class ReservationStatus(str, Enum):
+    HELD = "HELD"
+    COMMITTED = "COMMITTED"
+    RELEASED = "RELEASED"
+    EXPIRED = "EXPIRED"
+    # committed by a completed payment, but the stock was gone by then
+    SHORT = "SHORT"
+
+
+class StockReservation(Base):
+    """
+    A hold on variant stock for an order awaiting payment. Held quantity is
+    not taken off ProductVariant.stock_quantity until the payment completes;
+    available stock is stock_quantity minus live holds.
+    """
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        CheckConstraint("quantity > 0", name="ck_stock_reservation_quantity_positive"),
+        Index("ix_stock_reservations_order", "order_id"),
+        # live holds per variant, summed on every availability read
+        Index(
+            "ix_stock_reservations_held_variant",
+            "variant_id", "expires_at",
+            postgresql_where=text("status = 'HELD'"),
+            postgresql_include=["quantity"],
+        ),
+        Index(
+            "ix_stock_reservations_held_expiry",
+            "expires_at",
+            postgresql_where=text("status = 'HELD'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    order_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False
+    )
+    variant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=False
+    )
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # sharded variants take held stock off their shards up front (and give it
+    # back on release/expiry) instead of being subtracted at read time
+    debited: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
+
+    status: Mapped[ReservationStatus] = mapped_column(
+        SAEnum(ReservationStatus, name="reservation_status"),
+        default=ReservationStatus.HELD,
+        nullable=False,
+    )
+
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    closed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<StockReservation(id={self.id}, order_id={self.order_id}, "
+            f"variant_id={self.variant_id}, quantity={self.quantity}, status={self.status})>"
+        )
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from sqlalchemy import Integer, ForeignKey, CheckConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.database import Base
+
+
+class VariantStockShard(Base):
+    """
+    One of K stock counters for a variant with stock_sharded set. The
+    variant's stock is the sum of its shards; checkouts decrement a single
+    random shard so orders on a hot SKU do not all queue on one row.
+    """
+    __tablename__ = "variant_stock_shards"
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="ck_variant_stock_shard_nonnegative"),
+    )
+
+    variant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), primary_key=True
+    )
+    shard_no: Mapped[int] = mapped_column(Integer, primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<VariantStockShard(variant_id={self.variant_id}, shard_no={self.shard_no}, quantity={self.quantity})>"
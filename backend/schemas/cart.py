@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from decimal import Decimal
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 from backend.models.cart import CartStauts
@@ -24,6 +24,14 @@ class CartItemOut(BaseModel):
     variant_id: int
     quantity: int
     price: Decimal 
+    version: int = 0
+    # filled in by the cart summary query
+    unit_price: Optional[Decimal] = None
+    line_total: Optional[Decimal] = None
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    color: Optional[str] = None
+    size: Optional[str] = None
 
 
 class CartOut(BaseModel):
@@ -34,5 +42,42 @@ class CartOut(BaseModel):
     status: str
     created_at: datetime
     updated_at: datetime
+    version: int = 0
     subtotal: Decimal
     items: List[CartItemOut] = Field(default_factory=list)
+
+
+CART_BULK_MAX = 100
+
+
+class CartBulkAdd(BaseModel):
+    items: List[CartItemAdd] = Field(..., min_length=1, max_length=CART_BULK_MAX)
+
+
+class CartLineError(BaseModel):
+    variant_id: int
+    quantity: int
+    error: str
+
+
+class CartBulkResult(BaseModel):
+    cart: CartOut
+    errors: List[CartLineError] = Field(default_factory=list)
+
+
+class GuestCartItemOut(BaseModel):
+    variant_id: int
+    quantity: int
+    unit_price: Optional[Decimal] = None
+    line_total: Optional[Decimal] = None
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    color: Optional[str] = None
+    size: Optional[str] = None
+    # the variant was removed or deactivated since it was carted
+    available: bool = True
+
+
+class GuestCartOut(BaseModel):
+    subtotal: Decimal
+    items: List[GuestCartItemOut] = Field(default_factory=list)
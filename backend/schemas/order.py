@@ -65,4 +65,11 @@ class BuyNowResponse(BaseModel):
     order_id: int
     status: str
     total_price: Decimal
-    seller_count: int
\ No newline at end of file
+    seller_count: int
+
+class CheckoutTicketRead(BaseModel):
+    ticket: str
+    status: str  # QUEUED | DONE | FAILED
+    result: Optional[PlaceOrderResponse] = None
+    error_status: Optional[int] = None
+    error: Optional[str] = None
@@ -21,6 +21,9 @@ class ProductRead(ProductCreate):
     status: ProductStatus
     seller_id: int
     image_url: str | None = None   
+    image_thumb_url: str | None = None
+    image_card_url: str | None = None
+    image_blurhash: str | None = None
     
 
     class Config:
@@ -32,6 +35,8 @@ class ProductListRead(ProductRead):
 
     default_variant_id: Optional[int] = None
     default_price: Optional[Decimal] = None
+    min_price: Optional[Decimal] = None
+    in_stock: bool = False
 
 class ProductVariantCreate(BaseModel):
     color: str | None = None
@@ -45,6 +50,7 @@ class ProductVariantRead(ProductVariantCreate):
     id: int
     product_id: int
     sku:str
+    stock_sharded: bool = False
     class Config:
         orm_mode=True
         from_attributes=True
@@ -52,6 +58,10 @@ class ProductVariantRead(ProductVariantCreate):
 class AllProduct(ProductRead):
     variants: List[ProductVariantRead] = []
 
+class ProductBatchRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list, max_length=300)
+    slugs: List[str] = Field(default_factory=list, max_length=300)
+
 class ProductSuggestion(BaseModel):
     id: int
     product_name: str
@@ -72,6 +82,11 @@ class ProductImageRead(ProductImageBase):
     id: int
     product_id: int
     image_url: str
+    thumb_url: str | None = None
+    card_url: str | None = None
+    zoom_url: str | None = None
+    blurhash: str | None = None
+    processing_status: str = "pending"
     created_at: datetime
 
     class Config:
@@ -85,4 +100,14 @@ class ProductImageUpdate(BaseModel):
 
     class Config:
         orm_mode = True
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class ProductFacets(BaseModel):
+    category: List[FacetCount] = []
+    target_audience: List[FacetCount] = []
+    color: List[FacetCount] = []
+    size: List[FacetCount] = []
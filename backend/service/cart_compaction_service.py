@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.cart import Cart, CartStauts
+from backend.models.cart_compaction_run import CartCompactionRun
+from backend.models.cart_items import CartItem
+
+CART_ABANDON_AFTER_DAYS = int(os.getenv("CART_ABANDON_AFTER_DAYS", "30"))
+CART_PURGE_AFTER_DAYS = int(os.getenv("CART_PURGE_AFTER_DAYS", "90"))
+CART_COMPACTION_BATCH = int(os.getenv("CART_COMPACTION_BATCH", "500"))
+# pause between batches so compaction never hogs the carts table
+CART_COMPACTION_PAUSE = float(os.getenv("CART_COMPACTION_PAUSE", "0.2"))
+CART_COMPACTION_MAX_BATCHES = int(os.getenv("CART_COMPACTION_MAX_BATCHES", "200"))
+
+
+def _idle_carts(db: Session, statuses: list[str], cutoff: datetime, batch_size: int) -> list[int]:
+    return list(
+        db.scalars(
+            select(Cart.id)
+            .where(Cart.status.in_(statuses), Cart.updated_at < cutoff)
+            .order_by(Cart.updated_at, Cart.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+    )
+
+
+def compact_carts(
+    db: Session,
+    *,
+    abandon_after_days: int = CART_ABANDON_AFTER_DAYS,
+    purge_after_days: int = CART_PURGE_AFTER_DAYS,
+    batch_size: int = CART_COMPACTION_BATCH,
+    pause: float = CART_COMPACTION_PAUSE,
+    max_batches: int = CART_COMPACTION_MAX_BATCHES,
+) -> CartCompactionRun:
+    """
+    Mark ACTIVE carts untouched for abandon_after_days as ABANDONED, then
+    delete ABANDONED and CHECKED_OUT carts older than purge_after_days with
+    their items. Works batch_size carts per transaction, skipping rows a
+    request has locked, sleeping pause seconds between batches and
+    stopping after max_batches; the next run picks up the rest. Every run
+    leaves a CartCompactionRun row with its counts.
+    """
+    now = datetime.now(timezone.utc)
+    abandon_cutoff = now - timedelta(days=abandon_after_days)
+    purge_cutoff = now - timedelta(days=purge_after_days)
+
+    run = CartCompactionRun(started_at=now, abandoned_carts=0, deleted_carts=0, deleted_items=0, batches=0)
+    db.add(run)
+    db.commit()
+
+    def more(ids: list[int]) -> bool:
+        db.commit()
+        if ids:
+            run.batches += 1
+        if len(ids) < batch_size or run.batches >= max_batches:
+            return False
+        if pause > 0:
+            time.sleep(pause)
+        return True
+
+    while True:
+        ids = _idle_carts(db, [CartStauts.ACTIVE.value], abandon_cutoff, batch_size)
+        if ids:
+            # updated_at is kept so the purge age still counts from the
+            # buyer's last touch
+            run.abandoned_carts += db.execute(
+                update(Cart)
+                .where(Cart.id.in_(ids))
+                .values(status=CartStauts.ABANDONED.value, version=Cart.version + 1, updated_at=Cart.updated_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        if not more(ids):
+            break
+
+    while run.batches < max_batches:
+        ids = _idle_carts(
+            db, [CartStauts.ABANDONED.value, CartStauts.CHECKED_OUT.value], purge_cutoff, batch_size
+        )
+        if ids:
+            # the FK cascades too, but sqlite only honours it with a pragma
+            run.deleted_items += db.execute(
+                delete(CartItem).where(CartItem.cart_id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            run.deleted_carts += db.execute(
+                delete(Cart).where(Cart.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+        if not more(ids):
+            break
+
+    run.finished_at = func.now()
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+if __name__ == "__main__":
+    # python -m backend.service.cart_compaction_service compact
+    from backend.database import SessionLocal
+
+    if sys.argv[1:] != ["compact"]:
+        sys.exit("usage: python -m backend.service.cart_compaction_service compact")
+
+    session = SessionLocal()
+    try:
+        result = compact_carts(session)
+        print(
+            f"abandoned {result.abandoned_carts} carts, deleted {result.deleted_carts} carts "
+            f"({result.deleted_items} items) in {result.batches} batches"
+        )
+    finally:
+        session.close()
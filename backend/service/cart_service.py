@@ -1,47 +1,291 @@
 from __future__ import annotations
+import os
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import select
-from backend.schemas.cart import DecreaseQty
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.exc import IntegrityError
+from backend.schemas.cart import DecreaseQty, CartItemAdd
 from backend.models.cart import Cart, CartStauts
 from backend.models.cart_items import CartItem
+from backend.models.product import Product
 from backend.models.ProductVariant import ProductVariant
+from backend.core.cache import build_cache
 from backend.core.error_handler import error_handler
+from backend.core.upsert import insert_for
+from backend.service.inventory_service import available_stock, availability_query
 from decimal import Decimal
 
+CART_SUMMARY_TTL = float(os.getenv("CART_SUMMARY_TTL", "60"))
+CART_WRITE_RETRIES = 3
+
+# keyed by (cart id, cart version): a mutation bumps the version, so stale
+# entries are never read and just age out
+summary_cache = build_cache("cart_summary", maxsize=10_000, ttl=CART_SUMMARY_TTL)
+
+
 def get_or_create_active_cart(db:Session,buyer_id:int)->Cart:
-    cart=db.query(Cart).options(selectinload(Cart.items)).filter(Cart.buyer_id ==  buyer_id,Cart.status == CartStauts.ACTIVE).first()
-    if cart:
-        return cart
-    cart=Cart(buyer_id=buyer_id,status=CartStauts.ACTIVE.value)
-    db.add(cart)
+    cart_id, _ = active_cart_ref(db, buyer_id)
+    return db.query(Cart).options(selectinload(Cart.items)).filter(Cart.id == cart_id).one()
+
+
+def active_cart_ref(db: Session, buyer_id: int) -> tuple[int, int]:
+    """
+    (cart id, version) of the buyer's active cart, creating it if needed,
+    without loading the cart or its items. Two first requests racing to
+    create it both end up on the same row: uq_carts_one_active_per_buyer
+    turns the loser's INSERT into a no-op and it reads the winner's cart.
+    """
+    lookup = select(Cart.id, Cart.version).where(
+        Cart.buyer_id == buyer_id, Cart.status == CartStauts.ACTIVE.value
+    )
+    row = db.execute(lookup).first()
+    if row:
+        return row.id, row.version
+
+    cart_id = db.execute(
+        insert_for(db)(Cart)
+        .values(buyer_id=buyer_id, status=CartStauts.ACTIVE.value, version=0)
+        .on_conflict_do_nothing(index_elements=["buyer_id"], index_where=text("status = 'ACTIVE'"))
+        .returning(Cart.id)
+    ).scalar()
     db.commit()
-    db.refresh(cart)
-    cart=db.query(Cart).options(selectinload(Cart.items)).filter(Cart.buyer_id ==  buyer_id,Cart.status == CartStauts.ACTIVE).first()
-    return cart
+    if cart_id is not None:
+        return cart_id, 0
+    row = db.execute(lookup).one()
+    return row.id, row.version
+
+
+def bump_cart_version(db: Session, cart_id: int) -> int:
+    """Call in the same transaction as the mutation; returns the new version."""
+    return db.execute(
+        update(Cart)
+        .where(Cart.id == cart_id)
+        .values(version=Cart.version + 1, updated_at=func.now())
+        .returning(Cart.version)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def _load_cart_summary(db: Session, cart_id: int) -> dict:
+    line_total = ProductVariant.price * CartItem.quantity
+    rows = db.execute(
+        select(
+            Cart.id,
+            Cart.buyer_id,
+            Cart.status,
+            Cart.created_at,
+            Cart.updated_at,
+            Cart.version,
+            CartItem.id.label("item_id"),
+            CartItem.variant_id,
+            CartItem.quantity,
+            CartItem.price,
+            CartItem.version.label("item_version"),
+            ProductVariant.price.label("unit_price"),
+            ProductVariant.product_id,
+            ProductVariant.color,
+            ProductVariant.size,
+            Product.product_name,
+            line_total.label("line_total"),
+            func.coalesce(func.sum(line_total).over(), 0).label("subtotal"),
+        )
+        .outerjoin(CartItem, CartItem.cart_id == Cart.id)
+        .outerjoin(ProductVariant, ProductVariant.id == CartItem.variant_id)
+        .outerjoin(Product, Product.id == ProductVariant.product_id)
+        .where(Cart.id == cart_id)
+        .order_by(CartItem.id)
+    ).all()
+    if not rows:
+        raise error_handler(404, "Cart not found")
 
-def add_to_cart_by_customer(db:Session,buyer_id:int,variant_id:int,quantity:int)->Cart:
-    cart=get_or_create_active_cart(db,buyer_id)
+    head = rows[0]
+    return {
+        "id": head.id,
+        "buyer_id": head.buyer_id,
+        "status": head.status,
+        "created_at": head.created_at,
+        "updated_at": head.updated_at,
+        "version": head.version,
+        "subtotal": Decimal(head.subtotal).quantize(Decimal("0.01")),
+        "items": [
+            {
+                "id": r.item_id,
+                "cart_id": head.id,
+                "variant_id": r.variant_id,
+                "quantity": r.quantity,
+                "price": r.price,
+                "version": r.item_version,
+                "unit_price": r.unit_price,
+                "line_total": r.line_total,
+                "product_id": r.product_id,
+                "product_name": r.product_name,
+                "color": r.color,
+                "size": r.size,
+            }
+            for r in rows
+            if r.item_id is not None
+        ],
+    }
+
+
+def cart_summary(db: Session, cart_id: int, version: int) -> dict:
+    """
+    CartOut body for a cart at a given version: one query on a cache miss,
+    none on a hit.
+    """
+    key = f"{cart_id}:{version}"
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+    summary = jsonable_encoder(_load_cart_summary(db, cart_id))
+    # a concurrent mutation may have landed between the version read and
+    # the load; only cache what matches the key
+    if summary["version"] == version:
+        summary_cache.set(key, summary)
+    return summary
+
+
+def get_active_cart_summary(db: Session, buyer_id: int) -> dict:
+    cart_id, version = active_cart_ref(db, buyer_id)
+    return cart_summary(db, cart_id, version)
+
+
+def add_to_cart_by_customer(db:Session,buyer_id:int,variant_id:int,quantity:int)->dict:
+    cart_id, _ = active_cart_ref(db, buyer_id)
     variant=db.query(ProductVariant).filter(ProductVariant.id == variant_id,ProductVariant.is_active == True).one_or_none()
     if not variant:
         raise HTTPException(404, "Variant not found or inactive")
-    if variant.stock_quantity < quantity:
+    if available_stock(db, [variant_id]).get(variant_id, 0) < quantity:
         raise HTTPException(400, "Not enough stock")
-    item=db.query(CartItem).filter(CartItem.cart_id == cart.id,
-                                   CartItem.variant_id == variant_id).one_or_none()
-    if item:
-        item.quantity+=quantity
-    else:
-        db.add(CartItem(cart_id=cart.id,variant_id=variant_id,quantity=quantity,price=variant.price))
+    increment_cart_item(db, cart_id, variant_id, quantity, variant.price)
+    version = bump_cart_version(db, cart_id)
     db.commit()
-    return get_or_create_active_cart(db,buyer_id)
+    return cart_summary(db, cart_id, version)
 
-def get_item_by_variant_id(db: Session, buyer_id: int, variant_id: int) -> CartItem:
-    cart = get_or_create_active_cart(db, buyer_id)
+def increment_cart_item(db: Session, cart_id: int, variant_id: int, quantity: int, price: Decimal) -> int:
+    """
+    Add quantity to the (cart, variant) line without reading it first:
+    an atomic UPDATE ... SET quantity = quantity + :n RETURNING, or an
+    INSERT when there is no line yet. A parallel request that inserts the
+    same line first makes our INSERT hit uq_cart_variant; the savepoint
+    is rolled back and the UPDATE retried. Returns the new quantity.
+    """
+    for _ in range(CART_WRITE_RETRIES):
+        new_quantity = db.execute(
+            update(CartItem)
+            .where(CartItem.cart_id == cart_id, CartItem.variant_id == variant_id)
+            .values(quantity=CartItem.quantity + quantity, version=CartItem.version + 1)
+            .returning(CartItem.quantity)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_quantity is not None:
+            return new_quantity
+        try:
+            with db.begin_nested():
+                db.execute(
+                    CartItem.__table__.insert().values(
+                        cart_id=cart_id, variant_id=variant_id, quantity=quantity, price=price, version=0
+                    )
+                )
+            return quantity
+        except IntegrityError:
+            continue
+    raise error_handler(409, "Cart was changed concurrently, please retry")
+
+
+def validate_cart_lines(db: Session, cart_id: int, requested: dict[int, int]) -> tuple[dict[int, Decimal], list[dict]]:
+    """
+    Check many (variant_id, quantity) lines against one query: variant
+    exists and is active, and what is already in the cart plus the new
+    quantity fits in available stock. Returns ({variant_id: price} for
+    the lines that pass, [per-line errors]).
+    """
+    if not requested:
+        return {}, []
+    existing = (
+        select(CartItem.variant_id, CartItem.quantity)
+        .where(CartItem.cart_id == cart_id, CartItem.variant_id.in_(list(requested)))
+        .subquery()
+    )
+    rows = db.execute(
+        availability_query(
+            list(requested),
+            ProductVariant.price,
+            ProductVariant.is_active,
+            func.coalesce(existing.c.quantity, 0).label("in_cart"),
+        ).outerjoin(existing, existing.c.variant_id == ProductVariant.id)
+    ).all()
+    found = {r.id: r for r in rows}
+
+    accepted: dict[int, Decimal] = {}
+    errors: list[dict] = []
+    for vid, qty in requested.items():
+        row = found.get(vid)
+        if row is None or not row.is_active:
+            errors.append({"variant_id": vid, "quantity": qty, "error": "Variant not found or inactive"})
+        elif row.in_cart + qty > row.available:
+            errors.append({"variant_id": vid, "quantity": qty, "error": "Not enough stock"})
+        else:
+            accepted[vid] = row.price
+    return accepted, errors
+
+
+def upsert_cart_lines(db: Session, cart_id: int, lines: dict[int, int], prices: dict[int, Decimal]) -> None:
+    """
+    INSERT ... ON CONFLICT (cart_id, variant_id) DO UPDATE adding to the
+    quantity; the price captured on first add is kept.
+    """
+    if not lines:
+        return
+    stmt = insert_for(db)(CartItem).values(
+        [
+            {"cart_id": cart_id, "variant_id": vid, "quantity": qty, "price": prices[vid]}
+            for vid, qty in sorted(lines.items())
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.variant_id],
+            set_={
+                "quantity": CartItem.quantity + stmt.excluded.quantity,
+                "version": CartItem.version + 1,
+            },
+        )
+    )
+
+
+def add_many_to_cart(db: Session, buyer_id: int, lines: list[CartItemAdd]) -> dict:
+    """
+    Add many lines in one transaction. Lines that fail validation are
+    reported back and skipped; the rest are written with a single upsert.
+    """
+    requested: dict[int, int] = {}
+    for line in lines:
+        requested[line.variant_id] = requested.get(line.variant_id, 0) + line.quantity
+
+    cart_id, version = active_cart_ref(db, buyer_id)
+    prices, errors = validate_cart_lines(db, cart_id, requested)
+
+    if prices:
+        upsert_cart_lines(db, cart_id, {vid: requested[vid] for vid in prices}, prices)
+        version = bump_cart_version(db, cart_id)
+        db.commit()
+    else:
+        db.rollback()
 
+    return {"cart": cart_summary(db, cart_id, version), "errors": errors}
+
+
+def get_item_by_variant_id(db: Session, buyer_id: int, variant_id: int) -> CartItem:
     item = (
         db.query(CartItem)
-        .filter(CartItem.cart_id == cart.id, CartItem.variant_id == variant_id)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .filter(
+            Cart.buyer_id == buyer_id,
+            Cart.status == CartStauts.ACTIVE.value,
+            CartItem.variant_id == variant_id,
+        )
         .first()
     )
     if not item:
@@ -49,45 +293,70 @@ def get_item_by_variant_id(db: Session, buyer_id: int, variant_id: int) -> CartI
     return item
 
 
-def uncart_the_product(db: Session, buyer_id: int, item_id: int) -> Cart:
-    cart=get_or_create_active_cart(db,buyer_id)
-    item=db.query(CartItem).filter(CartItem.id == item_id,CartItem.cart_id == cart.id).one_or_none()
-    if not item:
+def uncart_the_product(db: Session, buyer_id: int, item_id: int) -> dict:
+    cart_id, _ = active_cart_ref(db, buyer_id)
+    deleted = db.execute(
+        delete(CartItem)
+        .where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+        .returning(CartItem.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if deleted is None:
         raise error_handler(404,"Cart item not found")
-    db.delete(item)
+    version = bump_cart_version(db, cart_id)
     db.commit()
 
-    return get_or_create_active_cart(db, buyer_id=buyer_id)
+    return cart_summary(db, cart_id, version)
+
+def decrease__item_quantity(item_id: int, payload: DecreaseQty, db: Session, buyer_id: int) -> dict:
+    cart_id, _ = active_cart_ref(db, buyer_id)
+    decrement_cart_item(db, cart_id, item_id, payload.amount)
+    version = bump_cart_version(db, cart_id)
+    db.commit()
+    return cart_summary(db, cart_id, version)
+
+
 
-def decrease__item_quantity(item_id: int, payload: DecreaseQty, db: Session, buyer_id: int):
-    cart=get_or_create_active_cart(db,buyer_id)
-    item=db.query(CartItem).filter(CartItem.id == item_id,
-                                   CartItem.cart_id == cart.id).one_or_none()
-    if not item:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-    if item.quantity<1:
-        raise HTTPException(400, "amount must be >= 1")
-    if item.quantity>payload.amount:
-        item.quantity-=payload.amount
-    else:
-        db.delete(item)
-    return get_or_create_active_cart(db, buyer_id=buyer_id)
 
 
+def decrement_cart_item(db: Session, cart_id: int, item_id: int, amount: int) -> int:
+    """
+    Take amount off a line, deleting it when that would leave nothing.
+    Both branches are guarded single statements; if a parallel write
+    moves the quantity across the boundary between them, retry. Returns
+    the new quantity (0 when deleted).
+    """
+    for _ in range(CART_WRITE_RETRIES):
+        new_quantity = db.execute(
+            update(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id, CartItem.quantity > amount)
+            .values(quantity=CartItem.quantity - amount, version=CartItem.version + 1)
+            .returning(CartItem.quantity)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if new_quantity is not None:
+            return new_quantity
 
+        deleted = db.execute(
+            delete(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id, CartItem.quantity <= amount)
+            .returning(CartItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if deleted is not None:
+            return 0
 
+        exists = db.execute(
+            select(CartItem.id).where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+        ).scalar()
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+    raise error_handler(409, "Cart was changed concurrently, please retry")
 
-def cart_subtotal(cart: Cart) -> Decimal:
-    total = Decimal("0.00")
-    for item in cart.items:
-        
-        total += item.variant.price * item.quantity
-    return total
 
-def clear_cart(db: Session, buyer_id: int) -> Cart:
-    cart=get_or_create_active_cart(db,buyer_id)
-    if not cart:
-        raise error_handler(400,"cart not found")
-    db.query(CartItem).filter(CartItem.cart_id == cart.id).delete(synchronize_session=False)
+def clear_cart(db: Session, buyer_id: int) -> dict:
+    cart_id, _ = active_cart_ref(db, buyer_id)
+    db.query(CartItem).filter(CartItem.cart_id == cart_id).delete(synchronize_session=False)
+    version = bump_cart_version(db, cart_id)
     db.commit()
-    return get_or_create_active_cart(db, buyer_id)
+    return cart_summary(db, cart_id, version)
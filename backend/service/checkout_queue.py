@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.core.error_handler import error_handler
+from backend.database import SessionLocal
+from backend.models.cart import Cart, CartStauts
+from backend.models.cart_items import CartItem
+from backend.models.idempotency_key import IdempotencyKey
+from backend.schemas.order import CheckoutTicketRead
+from backend.service.idempotency_service import (
+    IDEMPOTENCY_LEASE_SECONDS,
+    claim_key,
+    existing_claim,
+    finish_claim,
+    hash_request,
+)
+from backend.service.order_service import place_order_response
+
+logger = logging.getLogger(__name__)
+
+# "sync" (default): POST /orders/order places the order in the request.
+# "queued": the request only enqueues; workers place orders in batches.
+CHECKOUT_MODE = os.getenv("CHECKOUT_MODE", "sync").lower()
+
+# each worker holds one pooled connection while it runs a batch; keep this
+# well under pool_size so the rest of the API still gets connections
+CHECKOUT_WORKERS = int(os.getenv("CHECKOUT_WORKERS", "4"))
+CHECKOUT_QUEUE_SIZE = int(os.getenv("CHECKOUT_QUEUE_SIZE", "1000"))
+CHECKOUT_BATCH_MAX = int(os.getenv("CHECKOUT_BATCH_MAX", "50"))
+CHECKOUT_BATCH_WINDOW = float(os.getenv("CHECKOUT_BATCH_WINDOW", "0.02"))
+CHECKOUT_RETRY_AFTER = 2
+CHECKOUT_REQUEUE_BATCH = 100
+
+# queued checkouts are idempotency keys of the sync endpoint's scope, so a
+# key places at most one order whichever mode handled it; jobs without a
+# client key get a generated one
+CHECKOUT_SCOPE = "orders.place"
+_TICKET_STATES = {"IN_PROGRESS": "QUEUED", "COMPLETED": "DONE", "FAILED": "FAILED"}
+
+
+@dataclass(frozen=True)
+class CheckoutJob:
+    ticket: str
+    claim_id: int
+    # the idempotency row's locked_until when the job was queued; a worker
+    # only runs the job if the row still carries it
+    lease: datetime
+    user_id: int
+    address_id: int
+    payment_method: str
+    variant_ids: frozenset[int]
+
+
+def group_by_variants(jobs: list[CheckoutJob]) -> list[list[CheckoutJob]]:
+    """
+    Split a batch into groups that share no variant, so groups can run in
+    parallel without waiting on each other's row locks. Jobs keep their
+    arrival order inside a group.
+    """
+    parent = list(range(len(jobs)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: dict[int, int] = {}
+    for i, job in enumerate(jobs):
+        for vid in job.variant_ids:
+            if vid in owner:
+                parent[find(i)] = find(owner[vid])
+            else:
+                owner[vid] = i
+
+    groups: dict[int, list[CheckoutJob]] = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(find(i), []).append(job)
+    return list(groups.values())
+
+
+def _take_job(db: Session, job: CheckoutJob) -> Optional[datetime]:
+    """
+    Renew the job's lease for the run. None when the job already finished
+    or was requeued under a newer lease since it was queued.
+    """
+    lease = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    taken = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == job.claim_id,
+            IdempotencyKey.status == "IN_PROGRESS",
+            IdempotencyKey.locked_until == job.lease,
+        )
+        .values(locked_until=lease)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return lease if taken else None
+
+
+def _run_job(db: Session, job: CheckoutJob) -> None:
+    lease = _take_job(db, job)
+    if lease is None:
+        return
+
+    def record(result) -> None:
+        # in the order's transaction: the order and its DONE ticket commit together
+        finish_claim(
+            db, job.claim_id, lease,
+            state="COMPLETED", response_status=status.HTTP_201_CREATED, body=result.model_dump(mode="json"),
+        )
+
+    try:
+        place_order_response(
+            db,
+            user_id=job.user_id,
+            address_id=job.address_id,
+            payment_method=job.payment_method,
+            record=record,
+        )
+        return
+    except HTTPException as exc:
+        db.rollback()
+        error_status, error = exc.status_code, str(exc.detail)
+    except Exception:
+        db.rollback()
+        logger.exception("queued checkout %s failed", job.ticket)
+        error_status, error = 500, "Checkout failed"
+
+    try:
+        finish_claim(db, job.claim_id, lease, state="FAILED", response_status=error_status, body={"detail": error})
+        db.commit()
+    except HTTPException:
+        # another run holds the ticket now and reports for it
+        db.rollback()
+
+
+class CheckoutQueue:
+    """
+    Bounded in-process checkout queue. A dispatcher thread collects up to
+    CHECKOUT_BATCH_MAX jobs (waiting at most CHECKOUT_BATCH_WINDOW for
+    stragglers), groups them by overlapping variants and hands each group
+    to one of `workers` threads, which places the orders one after another
+    on a single session.
+    """
+
+    def __init__(self, workers: int = CHECKOUT_WORKERS, maxsize: int = CHECKOUT_QUEUE_SIZE) -> None:
+        self._pending: queue.Queue[CheckoutJob] = queue.Queue(maxsize=maxsize)
+        self._slots = threading.Semaphore(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checkout")
+        self._stopped = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="checkout-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, job: CheckoutJob) -> None:
+        """Raises queue.Full when the queue is at capacity."""
+        self._pending.put_nowait(job)
+
+    def depth(self) -> int:
+        return self._pending.qsize()
+
+    def _next_batch(self) -> list[CheckoutJob]:
+        batch = [self._pending.get(timeout=0.5)]
+        deadline = time.monotonic() + CHECKOUT_BATCH_WINDOW
+        while len(batch) < CHECKOUT_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                continue
+            for group in group_by_variants(batch):
+                self._slots.acquire()
+                self._pool.submit(self._run_group, group)
+
+    def _run_group(self, group: list[CheckoutJob]) -> None:
+        try:
+            db = SessionLocal()
+            try:
+                for job in group:
+                    _run_job(db, job)
+            finally:
+                db.close()
+        finally:
+            self._slots.release()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._dispatcher.join(timeout=1)
+        self._pool.shutdown(wait=True)
+
+
+_queue: CheckoutQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_checkout_queue() -> CheckoutQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = CheckoutQueue()
+        return _queue
+
+
+def stop_checkout_queue() -> None:
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+            _queue = None
+
+
+def _cart_variant_ids(db: Session, user_id: int) -> frozenset[int]:
+    return frozenset(
+        db.scalars(
+            select(CartItem.variant_id)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.buyer_id == user_id, Cart.status == CartStauts.ACTIVE.value)
+        )
+    )
+
+
+def _ticket_read(row: IdempotencyKey) -> CheckoutTicketRead:
+    state = _TICKET_STATES[row.status]
+    body = row.response_body or {}
+    return CheckoutTicketRead(
+        ticket=row.ticket,
+        status=state,
+        result=body if state == "DONE" else None,
+        error_status=row.response_status if state == "FAILED" else None,
+        error=body.get("detail") if state == "FAILED" else None,
+    )
+
+
+def _accepted(ticket: CheckoutTicketRead) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=ticket.model_dump(mode="json"),
+        headers={"Location": f"/orders/checkout/{ticket.ticket}", "Retry-After": "1"},
+    )
+
+
+def _release(db: Session, claim_id: int, lease: datetime) -> None:
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.id == claim_id, IdempotencyKey.locked_until == lease
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def enqueue_checkout(
+    db: Session,
+    *,
+    user_id: int,
+    address_id: int,
+    payment_method: str,
+    idempotency_key: Optional[str] = None,
+) -> JSONResponse:
+    """
+    Queue the buyer's active cart for checkout and answer 202 with a ticket
+    to poll at GET /orders/checkout/{ticket}. The job is an idempotency
+    key row, so a retried key gets its first ticket back (on any worker,
+    at any time before the key expires) and a job lost to a restart is
+    picked up again by requeue_stale_checkouts. 503 with Retry-After when
+    the queue is full.
+    """
+    payload = {"address_id": address_id, "payment_method": payment_method}
+    request_hash = hash_request(payload)
+    key = idempotency_key or uuid4().hex
+
+    claim = claim_key(
+        db, user_id, CHECKOUT_SCOPE, key, request_hash, ticket=uuid4().hex, request_body=payload
+    )
+    if claim is None:
+        row = existing_claim(db, user_id, CHECKOUT_SCOPE, key, request_hash)
+        if row is None:
+            raise error_handler(status.HTTP_409_CONFLICT, "A request with this Idempotency-Key is still being processed")
+        if row.ticket is None:
+            # claimed by the sync endpoint; give it a ticket to poll
+            row.ticket = uuid4().hex
+            db.commit()
+        return _accepted(_ticket_read(row))
+    claim_id, lease = claim
+
+    variant_ids = _cart_variant_ids(db, user_id)
+    # hand the connection back before the order is even attempted
+    db.rollback()
+    if not variant_ids:
+        _release(db, claim_id, lease)
+        raise error_handler(400, "Cart is empty")
+
+    row = db.get(IdempotencyKey, claim_id)
+    job = CheckoutJob(
+        ticket=row.ticket,
+        claim_id=claim_id,
+        lease=lease,
+        user_id=user_id,
+        address_id=address_id,
+        payment_method=payment_method,
+        variant_ids=variant_ids,
+    )
+    ticket = _ticket_read(row)
+    db.rollback()
+    try:
+        get_checkout_queue().submit(job)
+    except queue.Full:
+        _release(db, claim_id, lease)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Checkout is busy, please retry shortly",
+            headers={"Retry-After": str(CHECKOUT_RETRY_AFTER)},
+        )
+    return _accepted(ticket)
+
+
+def get_checkout_ticket(db: Session, ticket: str, user_id: int) -> CheckoutTicketRead:
+    row = db.scalars(
+        select(IdempotencyKey).where(
+            IdempotencyKey.ticket == ticket,
+            IdempotencyKey.owner_id == user_id,
+            IdempotencyKey.expires_at > datetime.now(timezone.utc),
+        )
+    ).first()
+    if row is None:
+        raise error_handler(404, "Checkout ticket not found")
+    return _ticket_read(row)
+
+
+def requeue_stale_checkouts(db: Session, batch_size: int = CHECKOUT_REQUEUE_BATCH) -> int:
+    """
+    Queue again the checkouts whose lease ran out: jobs of a worker that
+    restarted or died, or that sat in a queue past their lease. Each one
+    gets a new lease first, so the stale copy is skipped if it ever runs.
+    Only in queued mode. Returns the number of jobs queued.
+    """
+    if CHECKOUT_MODE != "queued":
+        return 0
+    now = datetime.now(timezone.utc)
+    stale = db.execute(
+        select(
+            IdempotencyKey.id,
+            IdempotencyKey.owner_id,
+            IdempotencyKey.ticket,
+            IdempotencyKey.request_body,
+            IdempotencyKey.locked_until,
+        )
+        .where(
+            IdempotencyKey.scope == CHECKOUT_SCOPE,
+            IdempotencyKey.status == "IN_PROGRESS",
+            IdempotencyKey.request_body.is_not(None),
+            IdempotencyKey.ticket.is_not(None),
+            IdempotencyKey.locked_until <= now,
+            IdempotencyKey.expires_at > now,
+        )
+        .order_by(IdempotencyKey.locked_until)
+        .limit(batch_size)
+    ).all()
+    db.rollback()
+
+    requeued = 0
+    for row in stale:
+        lease = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+        taken = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == row.id,
+                IdempotencyKey.status == "IN_PROGRESS",
+                IdempotencyKey.locked_until == row.locked_until,
+            )
+            .values(locked_until=lease)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if not taken:
+            continue
+        job = CheckoutJob(
+            ticket=row.ticket,
+            claim_id=row.id,
+            lease=lease,
+            user_id=row.owner_id,
+            address_id=row.request_body["address_id"],
+            payment_method=row.request_body["payment_method"],
+            variant_ids=_cart_variant_ids(db, row.owner_id),
+        )
+        db.rollback()
+        try:
+            get_checkout_queue().submit(job)
+        except queue.Full:
+            # its lease runs out again and the next sweep retries it
+            break
+        requeued += 1
+    return requeued
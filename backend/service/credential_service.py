@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import sys
+
+from sqlalchemy import delete, event, inspect, literal, select, true, union_all
+from sqlalchemy.orm import Session
+
+from backend.core.upsert import insert_for
+from backend.models.admin import Admin
+from backend.models.credential import Credential
+from backend.models.customer import Customer
+from backend.models.seller import Seller
+
+# lower rank wins when one email has accounts in several tables
+ROLE_RANKS = {"Admin": 0, "Seller": 1, "Customer": 2}
+_ROLE_BY_MODEL = {Admin: "Admin", Seller: "Seller", Customer: "Customer"}
+
+
+def find_credential(db: Session, email: str) -> Credential | None:
+    return db.scalars(
+        select(Credential).where(Credential.email == email).order_by(Credential.rank).limit(1)
+    ).first()
+
+
+def _update_on_conflict(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["role", "owner_id"],
+        set_={"email": stmt.excluded.email, "hashed_password": stmt.excluded.hashed_password},
+    )
+
+
+def _sync_account(mapper, connection, target) -> None:
+    # runs inside the flush, so the credential commits or rolls back with the account
+    state = inspect(target)
+    if not state.attrs.email.history.has_changes() and not state.attrs.hashed_password.history.has_changes():
+        return
+    role = _ROLE_BY_MODEL[mapper.class_]
+    connection.execute(
+        _update_on_conflict(
+            insert_for(connection)(Credential).values(
+                email=target.email,
+                role=role,
+                rank=ROLE_RANKS[role],
+                owner_id=target.id,
+                hashed_password=target.hashed_password,
+            )
+        )
+    )
+
+
+def _drop_account(mapper, connection, target) -> None:
+    connection.execute(
+        delete(Credential).where(
+            Credential.role == _ROLE_BY_MODEL[mapper.class_], Credential.owner_id == target.id
+        )
+    )
+
+
+for _model in _ROLE_BY_MODEL:
+    event.listen(_model, "after_insert", _sync_account)
+    event.listen(_model, "after_update", _sync_account)
+    event.listen(_model, "after_delete", _drop_account)
+
+
+def backfill_credentials(db: Session, *, only_if_empty: bool = False) -> int:
+    """
+    Copy every admin, seller and customer into credentials with one
+    INSERT ... SELECT, updating rows that already exist. Safe to re-run.
+    With only_if_empty it does nothing once the table has rows, which is
+    how startup uses it. Returns the number of rows written.
+    """
+    if only_if_empty and db.scalar(select(Credential.id).limit(1)) is not None:
+        return 0
+
+    accounts = union_all(*(
+        select(
+            model.email.label("email"),
+            literal(role).label("role"),
+            literal(ROLE_RANKS[role]).label("rank"),
+            model.id.label("owner_id"),
+            model.hashed_password.label("hashed_password"),
+        )
+        for model, role in _ROLE_BY_MODEL.items()
+    )).subquery("accounts")
+    # SQLite reads "SELECT ... ON CONFLICT" as a join constraint unless the
+    # SELECT ends in a WHERE clause
+    stmt = insert_for(db)(Credential).from_select(
+        ["email", "role", "rank", "owner_id", "hashed_password"],
+        select(accounts).where(true()),
+    )
+    written = db.execute(_update_on_conflict(stmt)).rowcount
+    db.commit()
+    return written
+
+
+if __name__ == "__main__":
+    # python -m backend.service.credential_service backfill
+    from backend.database import SessionLocal
+
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m backend.service.credential_service backfill")
+
+    session = SessionLocal()
+    try:
+        print(f"wrote {backfill_credentials(session)} credentials")
+    finally:
+        session.close()
@@ -13,6 +13,7 @@ from backend.schemas.customer import (
 )
 from backend.api.v1.login import LoginResponse
 from backend.utils.jwt import create_access_token, verify_token,create_refresh_token
+from backend.utils.principal import forget_principal
 from backend.utils.hashed import  verify_password
 from backend.utils.hashed import hashed_password as hashed_pwd
 from backend.core.permission import check_permission
@@ -122,6 +123,7 @@ def delete_account_by_owner(db: Session, current_user: Customer):
     try:
         db.delete(user)
         db.commit()
+        forget_principal("Customer", current_user.id)
         return {"message": "Your account has been deleted successfully."}
 
     except SQLAlchemyError:
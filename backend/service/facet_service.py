@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import String, cast, distinct, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from backend.core.cache import build_cache
+from backend.models.product import Product, ProductCategory, TargetAudience
+from backend.models.ProductVariant import ProductVariant
+from backend.service.product_service import apply_listing_filters
+
+FACETS_CACHE_TTL = float(os.getenv("FACETS_CACHE_TTL", "30"))
+
+facets_cache = build_cache("product_facets", maxsize=1024, ttl=FACETS_CACHE_TTL)
+
+FACET_NAMES = ("category", "target_audience", "color", "size")
+
+# enum columns are stored by member name; the API speaks member values
+_ENUM_FACETS = {"category": ProductCategory, "target_audience": TargetAudience}
+
+
+def _signature(filters: dict) -> str:
+    raw = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _display_value(facet: str, raw: str) -> str:
+    enum_cls = _ENUM_FACETS.get(facet)
+    if enum_cls is None:
+        return raw
+    try:
+        return enum_cls[raw].value
+    except KeyError:
+        return raw
+
+
+def _facet_query(db: Session, filters: dict):
+    filtered = apply_listing_filters(
+        db.query(Product.id, Product.product_category, Product.target_audience),
+        **filters,
+    ).cte("filtered_products")
+
+    by_category = (
+        select(literal("category"), cast(filtered.c.product_category, String), func.count())
+        .group_by(filtered.c.product_category)
+    )
+    by_audience = (
+        select(literal("target_audience"), cast(filtered.c.target_audience, String), func.count())
+        .group_by(filtered.c.target_audience)
+    )
+
+    def by_variant_column(name: str, column):
+        return (
+            select(literal(name), column, func.count(distinct(ProductVariant.product_id)))
+            .join(filtered, filtered.c.id == ProductVariant.product_id)
+            .where(ProductVariant.is_active == True, column.isnot(None))
+            .group_by(column)
+        )
+
+    return union_all(
+        by_category,
+        by_audience,
+        by_variant_column("color", ProductVariant.color),
+        by_variant_column("size", ProductVariant.size),
+    )
+
+
+def get_product_facets(
+    db: Session,
+    *,
+    category: Optional[ProductCategory] = None,
+    target_audience: Optional[TargetAudience] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock_only: bool = False,
+    seller_id: Optional[int] = None,
+) -> dict:
+    """
+    Counts of active products per category, audience, color and size for
+    the given filter set, computed in one UNION ALL round trip and cached
+    per filter signature for FACETS_CACHE_TTL seconds.
+    """
+    filters = {
+        "category": category,
+        "target_audience": target_audience,
+        "min_price": min_price,
+        "max_price": max_price,
+        "in_stock_only": in_stock_only,
+        "seller_id": seller_id,
+    }
+    key = _signature(filters)
+    cached = facets_cache.get(key)
+    if cached is not None:
+        return cached
+
+    facets: dict[str, list[dict]] = {name: [] for name in FACET_NAMES}
+    for facet, value, count in db.execute(_facet_query(db, filters)).all():
+        facets[facet].append({"value": _display_value(facet, value), "count": int(count)})
+
+    for values in facets.values():
+        values.sort(key=lambda f: (-f["count"], f["value"]))
+
+    facets_cache.set(key, facets)
+    return facets
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.core.cache import build_cache
+from backend.core.signed_cookie import CookieSigner
+from backend.models.product import Product
+from backend.models.ProductVariant import ProductVariant
+from backend.schemas.cart import CART_BULK_MAX, CartItemAdd
+from backend.service.cart_service import add_many_to_cart
+from backend.service.inventory_service import availability_query
+from backend.utils.jwt import settings
+
+# Guest carts live entirely in a signed cookie: anonymous shoppers (and
+# bots) never get a carts row. The lines are folded into the real cart by
+# merge_guest_cart after login.
+
+GUEST_CART_COOKIE = "guest_cart"
+GUEST_CART_MAX_AGE = int(os.getenv("GUEST_CART_MAX_AGE", str(30 * 24 * 3600)))
+GUEST_CART_SECURE_COOKIE = os.getenv("GUEST_CART_SECURE_COOKIE", "false").lower() == "true"
+GUEST_VARIANT_CACHE_TTL = float(os.getenv("GUEST_VARIANT_CACHE_TTL", "60"))
+
+_signer = CookieSigner(settings.SECRET_KEY, "guest-cart", GUEST_CART_MAX_AGE)
+
+# display data per variant for guest cart pages; prices may lag by the TTL
+variant_card_cache = build_cache("guest_variant_cards", maxsize=20_000, ttl=GUEST_VARIANT_CACHE_TTL)
+
+
+def read_guest_lines(request: Request) -> dict[int, int]:
+    data = _signer.loads(request.cookies.get(GUEST_CART_COOKIE))
+    lines: dict[int, int] = {}
+    if not isinstance(data, list):
+        return lines
+    for entry in data[:CART_BULK_MAX]:
+        try:
+            vid, qty = int(entry[0]), int(entry[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+        if vid > 0 and qty > 0:
+            lines[vid] = qty
+    return lines
+
+
+def write_guest_lines(response: Response, lines: dict[int, int]) -> None:
+    if not lines:
+        response.delete_cookie(GUEST_CART_COOKIE)
+        return
+    response.set_cookie(
+        GUEST_CART_COOKIE,
+        _signer.dumps([[vid, qty] for vid, qty in lines.items()]),
+        max_age=GUEST_CART_MAX_AGE,
+        httponly=True,
+        samesite="lax",
+        secure=GUEST_CART_SECURE_COOKIE,
+    )
+
+
+def _variant_cards(db: Session, variant_ids: list[int]) -> dict[int, Optional[dict]]:
+    cards: dict[int, Optional[dict]] = {}
+    missing = []
+    for vid in variant_ids:
+        cached = variant_card_cache.get(str(vid))
+        if cached is None:
+            missing.append(vid)
+        else:
+            cards[vid] = cached or None
+
+    if missing:
+        rows = db.execute(
+            select(
+                ProductVariant.id,
+                ProductVariant.price,
+                ProductVariant.color,
+                ProductVariant.size,
+                ProductVariant.product_id,
+                Product.product_name,
+            )
+            .join(Product, Product.id == ProductVariant.product_id)
+            .where(ProductVariant.id.in_(missing), ProductVariant.is_active == True)
+        ).all()
+        found = {
+            r.id: {
+                "unit_price": str(r.price),
+                "color": r.color,
+                "size": r.size,
+                "product_id": r.product_id,
+                "product_name": r.product_name,
+            }
+            for r in rows
+        }
+        for vid in missing:
+            card = found.get(vid)
+            # {} remembers "gone or inactive" so it is not looked up again
+            variant_card_cache.set(str(vid), card or {})
+            cards[vid] = card
+    return cards
+
+
+def guest_cart_summary(db: Session, lines: dict[int, int]) -> dict:
+    cards = _variant_cards(db, sorted(lines))
+    items = []
+    subtotal = Decimal("0.00")
+    for vid, qty in lines.items():
+        card = cards.get(vid)
+        if card is None:
+            items.append({"variant_id": vid, "quantity": qty, "available": False})
+            continue
+        unit_price = Decimal(card["unit_price"])
+        line_total = (unit_price * qty).quantize(Decimal("0.01"))
+        subtotal += line_total
+        items.append({**card, "variant_id": vid, "quantity": qty, "unit_price": unit_price, "line_total": line_total})
+    return {"subtotal": subtotal.quantize(Decimal("0.01")), "items": items}
+
+
+def add_guest_item(db: Session, lines: dict[int, int], variant_id: int, quantity: int) -> dict[int, int]:
+    if variant_id not in lines and len(lines) >= CART_BULK_MAX:
+        raise HTTPException(400, f"A guest cart holds at most {CART_BULK_MAX} items")
+
+    row = db.execute(availability_query([variant_id], ProductVariant.is_active)).first()
+    if row is None or not row.is_active:
+        raise HTTPException(404, "Variant not found or inactive")
+    wanted = lines.get(variant_id, 0) + quantity
+    if wanted > row.available:
+        raise HTTPException(400, "Not enough stock")
+
+    return {**lines, variant_id: wanted}
+
+
+def decrease_guest_item(lines: dict[int, int], variant_id: int, amount: int) -> dict[int, int]:
+    if variant_id not in lines:
+        raise HTTPException(404, "Cart item not found")
+    lines = dict(lines)
+    if lines[variant_id] > amount:
+        lines[variant_id] -= amount
+    else:
+        del lines[variant_id]
+    return lines
+
+
+def remove_guest_item(lines: dict[int, int], variant_id: int) -> dict[int, int]:
+    if variant_id not in lines:
+        raise HTTPException(404, "Cart item not found")
+    return {vid: qty for vid, qty in lines.items() if vid != variant_id}
+
+
+def merge_guest_cart(db: Session, buyer_id: int, lines: dict[int, int]) -> dict:
+    """
+    Fold the guest lines into the buyer's cart with one validation query
+    and one upsert (add_many_to_cart); lines that no longer fit are
+    reported in errors.
+    """
+    return add_many_to_cart(
+        db,
+        buyer_id,
+        [CartItemAdd(variant_id=vid, quantity=qty) for vid, qty in lines.items()],
+    )
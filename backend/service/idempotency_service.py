@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Type, TypeVar
+
+from fastapi import Response, status
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.core.cache import build_cache
+from backend.core.error_handler import error_handler
+from backend.core.upsert import insert_for
+from backend.models.idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# how long a duplicate waits on the first attempt before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# a claim not completed within this long is presumed dead and can be taken over
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+IDEMPOTENCY_PURGE_BATCH = 1000
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+replay_cache = build_cache("idempotency", maxsize=10_000, ttl=IDEMPOTENCY_TTL_SECONDS)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def hash_request(payload: dict) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_key(owner_id: int, scope: str, key: str) -> str:
+    return f"{scope}:{owner_id}:{key}"
+
+
+def _check_hash(stored_hash: str, request_hash: str) -> None:
+    if stored_hash != request_hash:
+        raise error_handler(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            "Idempotency-Key was already used with a different request",
+        )
+
+
+def claim_key(
+    db: Session, owner_id: int, scope: str, key: str, request_hash: str, **values
+) -> Optional[tuple[int, datetime]]:
+    """
+    Claim the key for this attempt: a new row, or an existing one that is
+    past expires_at, FAILED, or whose holder's lease ran out (it died
+    without committing, since the stored response commits with the work).
+    values are stored on the row as well. Returns (row id, lease); writes
+    that finish the attempt must still match the lease, or another attempt
+    has taken over. None while another attempt holds the key.
+    """
+    now = datetime.now(timezone.utc)
+    lease = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    fresh = {
+        "request_hash": request_hash,
+        "status": "IN_PROGRESS",
+        "response_status": None,
+        "response_body": None,
+        "locked_until": lease,
+        "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        **values,
+    }
+    stmt = (
+        insert_for(db)(IdempotencyKey)
+        .values(owner_id=owner_id, scope=scope, key=key, **fresh)
+        .on_conflict_do_nothing(index_elements=["owner_id", "scope", "key"])
+        .returning(IdempotencyKey.id)
+    )
+    claim_id = db.execute(stmt).scalar()
+    if claim_id is None:
+        claim_id = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.owner_id == owner_id,
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    IdempotencyKey.status == "FAILED",
+                    and_(IdempotencyKey.status == "IN_PROGRESS", IdempotencyKey.locked_until <= now),
+                ),
+            )
+            .values(**fresh)
+            .returning(IdempotencyKey.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+    # committed on its own so concurrent duplicates can see the claim
+    db.commit()
+    return (claim_id, lease) if claim_id is not None else None
+
+
+def existing_claim(
+    db: Session, owner_id: int, scope: str, key: str, request_hash: str
+) -> Optional[IdempotencyKey]:
+    """The key's row unless it is past expires_at; 422 if it was made for a different request."""
+    row = db.scalars(
+        select(IdempotencyKey).where(
+            IdempotencyKey.owner_id == owner_id,
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > datetime.now(timezone.utc),
+        )
+    ).first()
+    if row is not None:
+        _check_hash(row.request_hash, request_hash)
+    return row
+
+
+def finish_claim(
+    db: Session, claim_id: int, lease: datetime, *, state: str, response_status: int, body: dict
+) -> None:
+    """
+    Store the attempt's outcome in the caller's transaction. Raises 409
+    when the lease was lost to another attempt; the caller must roll back.
+    """
+    finished = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == claim_id,
+            IdempotencyKey.status == "IN_PROGRESS",
+            IdempotencyKey.locked_until == lease,
+        )
+        .values(status=state, response_status=response_status, response_body=body, locked_until=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not finished:
+        raise error_handler(
+            status.HTTP_409_CONFLICT,
+            "A request with this Idempotency-Key is still being processed",
+        )
+
+
+def _wait_for_first_attempt(
+    db: Session, owner_id: int, scope: str, key: str, request_hash: str
+) -> Optional[dict]:
+    """
+    Poll the claim row until the first attempt stores its response.
+    Returns the stored entry, or None when the key is free to claim again:
+    the first attempt failed and gave it up (or, when queued, marked it
+    FAILED), its lease ran out, or the row is past expires_at.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.now(timezone.utc)
+        row = db.execute(
+            select(
+                IdempotencyKey.request_hash,
+                IdempotencyKey.status,
+                IdempotencyKey.response_status,
+                IdempotencyKey.response_body,
+                (IdempotencyKey.expires_at <= now).label("expired"),
+                (IdempotencyKey.locked_until <= now).label("lease_lost"),
+            ).where(
+                IdempotencyKey.owner_id == owner_id,
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+            )
+        ).first()
+        db.rollback()
+
+        if row is None or row.expired or row.status == "FAILED":
+            return None
+        _check_hash(row.request_hash, request_hash)
+        if row.status == "COMPLETED":
+            return {
+                "request_hash": row.request_hash,
+                "status": row.response_status,
+                "body": row.response_body,
+            }
+        if row.lease_lost:
+            return None
+        if time.monotonic() >= deadline:
+            raise error_handler(
+                status.HTTP_409_CONFLICT,
+                "A request with this Idempotency-Key is still being processed",
+            )
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+
+def _replay(entry: dict, response_model: Type[M], response: Response) -> M:
+    response.status_code = entry["status"]
+    response.headers[REPLAY_HEADER] = "true"
+    return response_model.model_validate(entry["body"])
+
+
+def run_idempotent(
+    db: Session,
+    *,
+    owner_id: int,
+    scope: str,
+    key: Optional[str],
+    payload: dict,
+    response: Response,
+    response_model: Type[M],
+    status_code: int,
+    handler: Callable[[Callable[[M], None]], M],
+) -> M:
+    """
+    Run handler at most once per (owner_id, scope, key).
+
+    handler is called with `record`; it must call record(result) inside
+    its transaction, right before it commits, so the stored response
+    commits atomically with the work and a crash can never leave work
+    done but the key unfinished. (A handler that never calls it gets its
+    result stored after it returns.)
+
+    Retries of a completed request get the stored response back (from the
+    in-process cache when possible, without touching the database).
+    Retries that arrive while the first attempt is still running wait for
+    it. If the first attempt fails, the key is released so the client can
+    try again; if it died, its claim lapses after IDEMPOTENCY_LEASE_SECONDS.
+    Without a key, handler just runs.
+    """
+    if not key:
+        return handler(lambda result: None)
+
+    request_hash = hash_request(payload)
+    cache_key = _cache_key(owner_id, scope, key)
+
+    while True:
+        cached = replay_cache.get(cache_key)
+        if cached is not None:
+            _check_hash(cached["request_hash"], request_hash)
+            return _replay(cached, response_model, response)
+
+        claim = claim_key(db, owner_id, scope, key, request_hash)
+        if claim is not None:
+            claim_id, lease = claim
+            break
+
+        entry = _wait_for_first_attempt(db, owner_id, scope, key, request_hash)
+        if entry is not None:
+            replay_cache.set(cache_key, entry)
+            return _replay(entry, response_model, response)
+        # the first attempt gave the key up; try to claim it ourselves
+
+    recorded: list[dict] = []
+
+    def record(result: M) -> None:
+        body = result.model_dump(mode="json")
+        finish_claim(db, claim_id, lease, state="COMPLETED", response_status=status_code, body=body)
+        recorded.append(body)
+
+    try:
+        result = handler(record)
+    except Exception:
+        db.rollback()
+        db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.id == claim_id,
+                IdempotencyKey.status == "IN_PROGRESS",
+                IdempotencyKey.locked_until == lease,
+            )
+        )
+        db.commit()
+        raise
+
+    if recorded:
+        body = recorded[-1]
+    else:
+        record(result)
+        db.commit()
+        body = recorded[-1]
+    replay_cache.set(cache_key, {"request_hash": request_hash, "status": status_code, "body": body})
+    return result
+
+
+def purge_expired_idempotency_keys(db: Session, batch_size: int = IDEMPOTENCY_PURGE_BATCH) -> int:
+    purged = 0
+    while True:
+        expired = (
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at <= func.now())
+            .order_by(IdempotencyKey.id)
+            .limit(batch_size)
+        )
+        res = db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired)))
+        db.commit()
+        purged += res.rowcount
+        if res.rowcount < batch_size:
+            return purged
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from backend.core.image_renditions import RENDITIONS, render_image, rendition_path
+from backend.core.settings import UPLOAD_DIR
+from backend.database import SessionLocal
+from backend.models.media_blob import MediaBlob
+from backend.models.product import Product
+from backend.models.product_img import ProductImage
+from backend.service.product_cache import invalidate_product_options
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return _executor
+
+
+def public_url(path: str | Path) -> str:
+    return "/uploads/" + Path(path).resolve().relative_to(UPLOAD_DIR.resolve()).as_posix()
+
+
+def _record_product_image(image_id: int, result: dict | None) -> None:
+    db = SessionLocal()
+    try:
+        row = db.query(ProductImage).filter(ProductImage.id == image_id).one_or_none()
+        if row is None:
+            return
+        if result is None:
+            row.processing_status = "failed"
+        else:
+            urls = {name: public_url(p) for name, p in result["renditions"].items()}
+            row.thumb_url = urls.get("thumb")
+            row.card_url = urls.get("card")
+            row.zoom_url = urls.get("zoom")
+            row.blurhash = result["blurhash"]
+            row.processing_status = "ready"
+        db.commit()
+        invalidate_product_options(row.product_id)
+    finally:
+        db.close()
+
+
+def _record_product(product_id: int, result: dict | None) -> None:
+    if result is None:
+        return
+    db = SessionLocal()
+    try:
+        product = db.query(Product).filter(Product.id == product_id).one_or_none()
+        if product is None:
+            return
+        urls = {name: public_url(p) for name, p in result["renditions"].items()}
+        product.image_thumb_url = urls.get("thumb")
+        product.image_card_url = urls.get("card")
+        product.image_blurhash = result["blurhash"]
+        db.commit()
+    finally:
+        db.close()
+
+
+def _record_blob(digest: str, result: dict | None) -> None:
+    if result is None:
+        return
+    db = SessionLocal()
+    try:
+        db.query(MediaBlob).filter(MediaBlob.digest == digest).update(
+            {"blurhash": result["blurhash"]}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+_RECORDERS = {"product_image": _record_product_image, "product": _record_product}
+
+
+def _existing_renditions(source: Path, blurhash: str | None) -> dict | None:
+    if not blurhash:
+        return None
+    paths = {name: rendition_path(source, name, "webp") for name in RENDITIONS}
+    if not all(p.exists() for p in paths.values()):
+        return None
+    return {"renditions": {name: str(p) for name, p in paths.items()}, "blurhash": blurhash}
+
+
+def schedule_renditions(
+    target: str,
+    row_id: int,
+    source: str | Path,
+    blurhash: str | None = None,
+) -> Future:
+    """
+    Hand an uploaded original to the worker pool and return at once; the
+    rendition URLs are written back to the row when the worker finishes.
+    Content-addressed originals that were rendered before (blurhash known,
+    files on disk) are recorded straight away without re-rendering.
+    """
+    recorder = _RECORDERS[target]
+    source = Path(source)
+
+    existing = _existing_renditions(source, blurhash)
+    if existing is not None:
+        future: Future = Future()
+        future.set_result(existing)
+    else:
+        future = _get_executor().submit(render_image, str(source))
+
+    def _done(fut: Future) -> None:
+        try:
+            result = fut.result()
+        except Exception:
+            logger.exception("rendition failed for %s %s (%s)", target, row_id, source)
+            result = None
+        try:
+            recorder(row_id, result)
+            if existing is None:
+                _record_blob(source.stem, result)
+        except Exception:
+            logger.exception("could not record renditions for %s %s", target, row_id)
+
+    future.add_done_callback(_done)
+    return future
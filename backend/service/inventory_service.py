@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Mapping
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, case, column, func, insert, select, update, values
+from sqlalchemy.orm import Session
+
+from backend.core.error_handler import error_handler
+from backend.models.ProductVariant import ProductVariant
+from backend.models.stock_reservation import ReservationStatus, StockReservation
+from backend.models.variant_stock_shard import VariantStockShard
+from backend.service.stock_shard_service import (
+    credit_stock,
+    shard_totals,
+    sharded_variant_ids,
+    take_from_shards,
+)
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+RESERVATION_SWEEP_BATCH = 1000
+# holds are kept at least this long once the buyer is sent to the payment provider
+PAYMENT_HOLD_SECONDS = int(os.getenv("PAYMENT_HOLD_SECONDS", "1800"))
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _live_hold():
+    # debited holds (sharded variants) are already off the shards
+    return (
+        StockReservation.status == ReservationStatus.HELD,
+        StockReservation.debited == False,
+        StockReservation.expires_at > func.now(),
+    )
+
+
+def _held_quantity():
+    # correlated: live holds on the ProductVariant row being filtered
+    return (
+        select(func.coalesce(func.sum(StockReservation.quantity), 0))
+        .where(StockReservation.variant_id == ProductVariant.id, *_live_hold())
+        .correlate(ProductVariant)
+        .scalar_subquery()
+    )
+
+
+def _insufficient(variant_qty: Mapping[int, int], decremented) -> None:
+    short = sorted(set(variant_qty) - set(decremented))
+    if short:
+        ids = ", ".join(str(vid) for vid in short)
+        raise error_handler(400, f"Insufficient stock for variant {ids}")
+
+
+def _lock_variants(db: Session, variant_ids: list[int]) -> None:
+    # always in id order, so checkouts sharing hot SKUs queue behind each
+    # other instead of deadlocking
+    if _is_postgres(db):
+        db.execute(
+            select(ProductVariant.id)
+            .where(ProductVariant.id.in_(variant_ids))
+            .order_by(ProductVariant.id)
+            .with_for_update()
+        )
+
+
+def availability_query(variant_ids: list[int], *columns):
+    """
+    SELECT ProductVariant.id, <available>, *columns for the given variants;
+    callers add joins for any extra columns. available is stock minus
+    live holds, where stock is the shard sum for sharded variants.
+    """
+    held = (
+        select(StockReservation.variant_id, func.sum(StockReservation.quantity).label("held"))
+        .where(StockReservation.variant_id.in_(variant_ids), *_live_hold())
+        .group_by(StockReservation.variant_id)
+        .subquery()
+    )
+    shards = (
+        select(VariantStockShard.variant_id, func.sum(VariantStockShard.quantity).label("stock"))
+        .where(VariantStockShard.variant_id.in_(variant_ids))
+        .group_by(VariantStockShard.variant_id)
+        .subquery()
+    )
+    stock = case(
+        (ProductVariant.stock_sharded == True, func.coalesce(shards.c.stock, 0)),
+        else_=ProductVariant.stock_quantity,
+    )
+    return (
+        select(ProductVariant.id, (stock - func.coalesce(held.c.held, 0)).label("available"), *columns)
+        .outerjoin(held, held.c.variant_id == ProductVariant.id)
+        .outerjoin(shards, shards.c.variant_id == ProductVariant.id)
+        .where(ProductVariant.id.in_(variant_ids))
+    )
+
+
+def available_stock(db: Session, variant_ids: Iterable[int]) -> dict[int, int]:
+    """
+    Available stock per variant, in one query. Variants that do not exist
+    are missing from the result.
+    """
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return {}
+    rows = db.execute(availability_query(variant_ids)).all()
+    return {vid: int(available) for vid, available in rows}
+
+
+def _decrement_sharded(db: Session, variant_qty: Mapping[int, int]) -> dict[int, int]:
+    taken = [vid for vid, qty in sorted(variant_qty.items()) if take_from_shards(db, vid, qty)]
+    _insufficient(variant_qty, taken)
+
+    remaining = shard_totals(db, taken)
+    sold_out = [vid for vid, left in remaining.items() if left <= 0]
+    if sold_out:
+        # stock_quantity is otherwise only synced by the rebalancer; the
+        # sold-out flag on the product needs it now
+        db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id.in_(sold_out))
+            .values(stock_quantity=0)
+            .execution_options(synchronize_session=False)
+        )
+    return remaining
+
+
+def decrement_stock(db: Session, variant_qty: Mapping[int, int]) -> dict[int, int]:
+    """
+    Take qty off every variant in one statement:
+
+        UPDATE product_variants SET stock_quantity = stock_quantity - w.qty
+        FROM (VALUES (:id, :qty), ...) AS w (variant_id, qty)
+        WHERE product_variants.id = w.variant_id
+          AND product_variants.stock_quantity - <live holds> >= w.qty
+        RETURNING id, stock_quantity
+
+    If any variant is short the whole call fails with 400; the caller's
+    transaction must be rolled back, as other rows may already be
+    decremented.
+
+    Sharded variants are taken off their shards instead (see
+    stock_shard_service.take_from_shards) and their rows are not locked.
+
+    Returns {variant_id: remaining stock}.
+    """
+    variant_qty = {int(vid): int(qty) for vid, qty in variant_qty.items()}
+    sharded = sharded_variant_ids(db, variant_qty)
+    remaining = _decrement_sharded(db, {v: q for v, q in variant_qty.items() if v in sharded}) if sharded else {}
+
+    items = sorted((vid, qty) for vid, qty in variant_qty.items() if vid not in sharded)
+    if not items:
+        return remaining
+
+    _lock_variants(db, [vid for vid, _ in items])
+
+    if not _is_postgres(db):
+        # no UPDATE ... FROM (VALUES ...) on SQLite; same guard, per row
+        for vid, qty in items:
+            row = db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.id == vid, ProductVariant.stock_quantity - _held_quantity() >= qty)
+                .values(stock_quantity=ProductVariant.stock_quantity - qty)
+                .returning(ProductVariant.stock_quantity)
+                .execution_options(synchronize_session=False)
+            ).first()
+            if row is not None:
+                remaining[vid] = row[0]
+        _insufficient(variant_qty, remaining)
+        return remaining
+
+    wanted = values(
+        column("variant_id", Integer),
+        column("qty", Integer),
+        name="wanted",
+    ).data(items)
+
+    rows = db.execute(
+        update(ProductVariant)
+        .where(
+            ProductVariant.id == wanted.c.variant_id,
+            ProductVariant.stock_quantity - _held_quantity() >= wanted.c.qty,
+        )
+        .values(stock_quantity=ProductVariant.stock_quantity - wanted.c.qty)
+        .returning(ProductVariant.id, ProductVariant.stock_quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    remaining.update({vid: stock for vid, stock in rows})
+    _insufficient(variant_qty, remaining)
+    return remaining
+
+
+def reserve_stock(
+    db: Session,
+    order_id: int,
+    variant_qty: Mapping[int, int],
+    ttl_seconds: int = RESERVATION_TTL_SECONDS,
+) -> datetime:
+    """
+    Hold stock for an order that is waiting on payment. Nothing is taken
+    off stock_quantity yet; the holds only lower available_stock until
+    they are committed, released or expire. Sharded variants are the
+    exception: their held quantity comes off the shards right away
+    (debited holds) and is credited back if the hold does not go through.
+    Returns the expiry.
+    """
+    items = sorted((int(vid), int(qty)) for vid, qty in variant_qty.items())
+    if not items:
+        raise error_handler(400, "Nothing to reserve")
+
+    sharded = sharded_variant_ids(db, [vid for vid, _ in items])
+    plain = [(vid, qty) for vid, qty in items if vid not in sharded]
+
+    if plain:
+        _lock_variants(db, [vid for vid, _ in plain])
+        available = available_stock(db, [vid for vid, _ in plain])
+        _insufficient(dict(plain), [vid for vid, qty in plain if available.get(vid, 0) >= qty])
+
+    taken = [vid for vid, qty in items if vid in sharded and take_from_shards(db, vid, qty)]
+    _insufficient({vid: qty for vid, qty in items if vid in sharded}, taken)
+
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+    db.execute(
+        insert(StockReservation),
+        [
+            {
+                "order_id": order_id,
+                "variant_id": vid,
+                "quantity": qty,
+                "status": ReservationStatus.HELD,
+                "debited": vid in sharded,
+                "expires_at": expires_at,
+            }
+            for vid, qty in items
+        ],
+    )
+    return expires_at
+
+
+def commit_reservations(db: Session, order_id: int) -> tuple[dict[int, int], dict[int, int]]:
+    """
+    Payment went through: close the order's holds and take their quantity
+    off stock (debited holds already are). Holds that already expired are
+    committed too, but then the stock guard in decrement_stock applies for
+    real. A payment that has landed must stick, so this never fails on a
+    shortfall: variants that cannot be covered are left as they are and
+    their holds are marked SHORT for a restock or refund.
+
+    Returns ({variant_id: remaining stock}, {variant_id: quantity short});
+    both are empty if there were no holds.
+    """
+    rows = db.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.order_id == order_id,
+            StockReservation.status.in_([ReservationStatus.HELD, ReservationStatus.EXPIRED]),
+        )
+        .values(status=ReservationStatus.COMMITTED, closed_at=func.now())
+        .returning(StockReservation.variant_id, StockReservation.quantity, StockReservation.debited)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    variant_qty: dict[int, int] = defaultdict(int)
+    for vid, qty, debited in rows:
+        if not debited:
+            variant_qty[vid] += qty
+
+    short: dict[int, int] = {}
+    try:
+        with db.begin_nested():
+            remaining = decrement_stock(db, variant_qty)
+    except HTTPException:
+        # one savepoint per variant so the ones in stock are still taken
+        remaining = {}
+        for vid, qty in sorted(variant_qty.items()):
+            try:
+                with db.begin_nested():
+                    remaining.update(decrement_stock(db, {vid: qty}))
+            except HTTPException:
+                short[vid] = qty
+        db.execute(
+            update(StockReservation)
+            .where(
+                StockReservation.order_id == order_id,
+                StockReservation.variant_id.in_(short),
+                StockReservation.status == ReservationStatus.COMMITTED,
+                StockReservation.debited == False,
+            )
+            .values(status=ReservationStatus.SHORT)
+            .execution_options(synchronize_session=False)
+        )
+
+    already_taken = {vid for vid, _, debited in rows if debited} - set(remaining)
+    remaining.update(available_stock(db, already_taken))
+    return remaining, short
+
+
+def extend_reservations(db: Session, order_id: int, ttl_seconds: int) -> int:
+    """
+    Push the expiry of the order's live holds to at least ttl_seconds from
+    now, for when the buyer has been sent off to pay and the stock should
+    not lapse mid-payment. Holds already expired stay expired. Returns the
+    number of holds extended.
+    """
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+    return db.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.order_id == order_id,
+            StockReservation.status == ReservationStatus.HELD,
+            StockReservation.expires_at > func.now(),
+            StockReservation.expires_at < expires_at,
+        )
+        .values(expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def release_reservations(db: Session, order_id: int) -> list[int]:
+    """
+    Payment failed or was cancelled: drop the order's live holds. Returns
+    the variant ids whose availability went back up.
+    """
+    rows = db.execute(
+        update(StockReservation)
+        .where(StockReservation.order_id == order_id, StockReservation.status == ReservationStatus.HELD)
+        .values(status=ReservationStatus.RELEASED, closed_at=func.now())
+        .returning(StockReservation.variant_id, StockReservation.quantity, StockReservation.debited)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    debited: dict[int, int] = defaultdict(int)
+    for vid, qty, was_debited in rows:
+        if was_debited:
+            debited[vid] += qty
+    credit_stock(db, debited)
+    return sorted({vid for vid, _, _ in rows})
+
+
+def expire_stale_reservations(db: Session, batch_size: int = RESERVATION_SWEEP_BATCH) -> int:
+    """
+    Mark holds past their expiry as EXPIRED, batch_size rows per
+    transaction. Availability reads already ignore undebited ones; debited
+    ones are credited back to their shards here and flagged undebited, so
+    a late commit takes the stock again. Returns the number of holds
+    expired.
+    """
+    expired = 0
+    while True:
+        stale = db.execute(
+            select(StockReservation.id, StockReservation.variant_id, StockReservation.quantity, StockReservation.debited)
+            .where(
+                StockReservation.status == ReservationStatus.HELD,
+                StockReservation.expires_at <= func.now(),
+            )
+            .order_by(StockReservation.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if stale:
+            db.execute(
+                update(StockReservation)
+                .where(StockReservation.id.in_([row.id for row in stale]))
+                .values(status=ReservationStatus.EXPIRED, debited=False, closed_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            debited: dict[int, int] = defaultdict(int)
+            for row in stale:
+                if row.debited:
+                    debited[row.variant_id] += row.quantity
+            credit_stock(db, debited)
+        db.commit()
+        expired += len(stale)
+        if len(stale) < batch_size:
+            return expired
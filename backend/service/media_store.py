@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import shutil
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from fastapi import UploadFile
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend.core.settings import UPLOAD_DIR
+from backend.core.upsert import insert_for
+from backend.models.media_blob import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+MEDIA_GC_BATCH = 500
+
+# image formats are already compressed; only text-based ones get a .gz
+# sibling for the /uploads handler to serve
+PRECOMPRESS_EXTS = {".svg"}
+
+_INCOMING_DIR = ".incoming"
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
+_URL_RE = re.compile(r"^/uploads/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.?[a-z0-9]*$")
+
+
+@dataclass(frozen=True)
+class StoredMedia:
+    digest: str
+    path: Path
+    url: str
+    # set when these bytes were uploaded and rendered before
+    blurhash: Optional[str]
+
+
+def _safe_ext(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXT_RE.match(ext) else ""
+
+
+def blob_relpath(digest: str, ext: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def digest_from_url(url: str | None) -> Optional[str]:
+    """
+    The blob digest behind an /uploads URL, or None for files stored
+    before content addressing (uuid or client filenames).
+    """
+    if not url:
+        return None
+    match = _URL_RE.match(url)
+    return match.group(1) if match else None
+
+
+def _precompress(path: Path) -> None:
+    gz_path = path.with_name(path.name + ".gz")
+    tmp = gz_path.with_name(f".{gz_path.name}.part")
+    with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+    os.replace(tmp, gz_path)
+
+
+def store_upload(db: Session, upload: UploadFile, root: Path = UPLOAD_DIR) -> StoredMedia:
+    """
+    Stream an upload to disk while hashing it and take one reference on the
+    resulting blob. Identical bytes land on the same path and are written
+    once. The reference is part of the caller's transaction, so a rollback
+    releases it too.
+    """
+    incoming = root / _INCOMING_DIR
+    incoming.mkdir(parents=True, exist_ok=True)
+    tmp = incoming / f"{uuid4().hex}.part"
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            while chunk := upload.file.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        digest = hasher.hexdigest()
+
+        # take the row first: a concurrent collect_garbage holds it locked
+        # while unlinking, so by the time we get it the file is either
+        # still there or gone for good and rewritten below
+        stmt = insert_for(db)(MediaBlob).values(
+            digest=digest,
+            path=blob_relpath(digest, _safe_ext(upload.filename)),
+            size_bytes=size,
+            ref_count=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaBlob.digest],
+            set_={"ref_count": MediaBlob.ref_count + 1, "updated_at": func.now()},
+        ).returning(MediaBlob.path, MediaBlob.blurhash)
+        relpath, blurhash = db.execute(stmt).one()
+
+        dest = root / relpath
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest)
+            if dest.suffix in PRECOMPRESS_EXTS:
+                _precompress(dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+    return StoredMedia(digest=digest, path=dest, url=f"/uploads/{relpath}", blurhash=blurhash)
+
+
+def release_urls(db: Session, urls: Iterable[str | None]) -> list[str]:
+    """
+    Drop one reference per URL. Returns the digests touched so the caller
+    can pass them to collect_garbage after committing.
+    """
+    counts = Counter(d for d in map(digest_from_url, urls) if d)
+    for digest, n in counts.items():
+        db.execute(
+            update(MediaBlob)
+            .where(MediaBlob.digest == digest)
+            .values(ref_count=MediaBlob.ref_count - n, updated_at=func.now())
+        )
+    return list(counts)
+
+
+def _remove_blob_files(root: Path, blob: MediaBlob) -> None:
+    path = root / blob.path
+    path.unlink(missing_ok=True)
+    path.with_name(path.name + ".gz").unlink(missing_ok=True)
+    for rendition in path.parent.glob(f"{blob.digest}_*"):
+        rendition.unlink(missing_ok=True)
+    for parent in (path.parent, path.parent.parent):
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+
+
+def _sweep_orphan_files(db: Session, root: Path, cutoff: datetime) -> int:
+    """
+    Files whose upload transaction rolled back never got a row; remove the
+    ones older than the grace period, plus abandoned partial uploads.
+    """
+    removed = 0
+    cutoff_ts = cutoff.timestamp()
+
+    for part in (root / _INCOMING_DIR).glob("*.part"):
+        if part.stat().st_mtime < cutoff_ts:
+            part.unlink(missing_ok=True)
+            removed += 1
+
+    candidates: dict[str, list[Path]] = {}
+    for path in root.glob("[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]/*"):
+        digest = path.stem.split("_", 1)[0]
+        if len(digest) == 64 and path.stat().st_mtime < cutoff_ts:
+            candidates.setdefault(digest, []).append(path)
+
+    digests = list(candidates)
+    for i in range(0, len(digests), MEDIA_GC_BATCH):
+        chunk = digests[i:i + MEDIA_GC_BATCH]
+        known = set(db.scalars(select(MediaBlob.digest).where(MediaBlob.digest.in_(chunk))))
+        for digest in chunk:
+            if digest in known:
+                continue
+            for path in candidates[digest]:
+                path.unlink(missing_ok=True)
+                removed += 1
+    return removed
+
+
+def collect_garbage(
+    db: Session,
+    digests: Optional[Iterable[str]] = None,
+    grace_seconds: int = MEDIA_GC_GRACE_SECONDS,
+    root: Path = UPLOAD_DIR,
+) -> int:
+    """
+    Delete unreferenced blobs and their renditions. With digests, only
+    those blobs are considered and no grace period applies (used right
+    after a delete); without, every blob that has sat at zero references
+    for grace_seconds is swept, along with orphaned files on disk.
+    Returns the number of blobs removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    targeted = digests is not None
+    if targeted:
+        digests = list(digests)
+        if not digests:
+            return 0
+
+    removed = 0
+    while True:
+        q = select(MediaBlob).where(MediaBlob.ref_count <= 0)
+        if targeted:
+            q = q.where(MediaBlob.digest.in_(digests))
+        else:
+            q = q.where(MediaBlob.updated_at < cutoff)
+        blobs = db.scalars(
+            q.order_by(MediaBlob.digest).limit(MEDIA_GC_BATCH).with_for_update(skip_locked=True)
+        ).all()
+        if not blobs:
+            break
+
+        for blob in blobs:
+            _remove_blob_files(root, blob)
+            db.delete(blob)
+        db.commit()
+        removed += len(blobs)
+
+        if targeted or len(blobs) < MEDIA_GC_BATCH:
+            break
+
+    if not targeted:
+        _sweep_orphan_files(db, root, cutoff)
+
+    return removed
+
+
+def collect_garbage_quietly(db: Session, digests: Iterable[str]) -> None:
+    # the product row is already gone; a failed sweep is retried by the
+    # periodic collect_garbage run, so it must not fail the request
+    try:
+        collect_garbage(db, digests)
+    except Exception:
+        db.rollback()
+        logger.exception("media garbage collection failed")
+
+
+if __name__ == "__main__":
+    # python -m backend.service.media_store gc
+    from backend.database import SessionLocal
+
+    if sys.argv[1:] != ["gc"]:
+        sys.exit("usage: python -m backend.service.media_store gc")
+
+    session = SessionLocal()
+    try:
+        print(f"removed {collect_garbage(session)} blobs")
+    finally:
+        session.close()
@@ -2,20 +2,23 @@ from __future__ import annotations
 from fastapi import HTTPException
 from decimal import Decimal
 from collections import defaultdict
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 from sqlalchemy.exc import SQLAlchemyError,IntegrityError
-from sqlalchemy import update
 from sqlalchemy.orm import Session, selectinload
 
 from backend.core.error_handler import error_handler
+from backend.schemas.order import PlaceOrderResponse
 from backend.models.address import Address
 from backend.models.cart import Cart
 from backend.models.cart_items import CartItem
 from backend.models.ProductVariant import ProductVariant
-from backend.models.order import Order
+from backend.models.order import Order, PaymentMethod
 from backend.models.order_address import OrderAddress
 from backend.models.order_iteam import OrderItem, OrderItemStatus
 from backend.models.order_fullments import OrderFulfillment, FulfillmentStatus
+from backend.service.inventory_service import available_stock, decrement_stock, reserve_stock
+from backend.service.product_cache import invalidate_product_options
+from backend.service.product_summary_service import mark_sold_out_products
 
 DELIVERY_CHARGE = Decimal("100.00")
 
@@ -33,8 +36,14 @@ def place_order_service(
     user_id: int,
     address_id: int,
     paymentmethod: str,
+    before_commit: Optional[Callable[[Order, Decimal, int], None]] = None,
 ) -> Tuple[Order, Decimal, int]:
-  
+    """
+    Turns the buyer's ACTIVE cart into an order and commits it.
+    before_commit(order, items_subtotal, seller_count) runs inside the same
+    transaction just before the commit (run_idempotent stores its response
+    there).
+    """
     tx= _begin_tx(db)
     with tx:
         address = (
@@ -66,15 +75,17 @@ def place_order_service(
                 raise error_handler(400, "Invalid cart quantity")
             variant_qty[ci.variant_id] += qty
 
+        # not locked here: decrement_stock locks and re-checks stock in one
+        # statement at the end, so row locks are held only for the tail
         variant_ids = sorted(variant_qty.keys())
         variants = (
             db.query(ProductVariant)
             .filter(ProductVariant.id.in_(variant_ids))
-            .with_for_update()
             .options(selectinload(ProductVariant.product))
             .all()
         )
         variant_map = {v.id: v for v in variants}
+        available = available_stock(db, variant_ids)
 
         for vid in variant_ids:
             v = variant_map.get(vid)
@@ -82,7 +93,7 @@ def place_order_service(
                 raise error_handler(404, f"Variant {vid} not found")
             if not getattr(v, "is_active", True):
                 raise error_handler(400, f"Variant {vid} is unavailable")
-            if v.stock_quantity < variant_qty[vid]:
+            if available.get(vid, 0) < variant_qty[vid]:
                 raise error_handler(400, f"Insufficient stock for variant {vid}")
 
         items_subtotal = Decimal("0.00")
@@ -154,23 +165,75 @@ def place_order_service(
         ]
         db.add_all(fulfillments)
         
-        for vid in variant_ids:
-            qty = variant_qty[vid]
-            res = db.execute(
-                update(ProductVariant)
-                .where(ProductVariant.id == vid, ProductVariant.stock_quantity >= qty)
-                .values(stock_quantity=ProductVariant.stock_quantity - qty)
+        if paymentmethod == PaymentMethod.ESEWA:
+            # held until the payment settles; see esewa_router._apply_esewa_status
+            reserve_stock(db, order.id, variant_qty)
+        else:
+            remaining = decrement_stock(db, variant_qty)
+            mark_sold_out_products(
+                db, {variant_map[vid].product_id for vid, left in remaining.items() if left <= 0}
             )
-            if res.rowcount != 1:
-                raise error_handler(400, f"Insufficient stock for variant {vid}")
 
         db.query(CartItem).filter(CartItem.cart_id == cart.id).delete(synchronize_session=False)
         cart.status = "CHECKED_OUT"
-        
+        if before_commit is not None:
+            db.flush()
+            before_commit(order, items_subtotal, len(seller_subtotals))
 
+    # _begin_tx only opened a savepoint when the session was already in a
+    # transaction (it always is after the auth lookup)
+    db.commit()
+    invalidate_product_options(*{v.product_id for v in variants})
     return order, items_subtotal, len(seller_subtotals)
 
 
+def _place_order_result(
+    order: Order, total_price: Decimal, seller_count: int, payment_method: str
+) -> PlaceOrderResponse:
+    payment_redirect_url = None
+    if payment_method == PaymentMethod.ESEWA:
+        payment_redirect_url = f"/payments/esewa/initiate?order_id={order.id}"
+
+    return PlaceOrderResponse(
+        order_id=order.id,
+        status=str(order.status),
+        total_price=total_price,
+        seller_count=seller_count,
+        payment_method=str(order.payment_Method),
+        payment_redirect_url=payment_redirect_url,
+    )
+
+
+def place_order_response(
+    db: Session,
+    *,
+    user_id: int,
+    address_id: int,
+    payment_method: str,
+    record: Optional[Callable[[PlaceOrderResponse], None]] = None,
+) -> PlaceOrderResponse:
+    """
+    place_order_service plus the API response; shared by the sync endpoint
+    and the checkout queue workers. record, when given, gets the response
+    inside the order's transaction (see idempotency_service.run_idempotent).
+    """
+    recorded: list[PlaceOrderResponse] = []
+
+    def before_commit(order: Order, total_price: Decimal, seller_count: int) -> None:
+        recorded.append(_place_order_result(order, total_price, seller_count, payment_method))
+        record(recorded[0])
+
+    order, total_price, seller_count = place_order_service(
+        db,
+        user_id=user_id,
+        address_id=address_id,
+        paymentmethod=payment_method,
+        before_commit=before_commit if record is not None else None,
+    )
+    # the recorded response is what retries replay; answer with the same one
+    return recorded[0] if recorded else _place_order_result(order, total_price, seller_count, payment_method)
+
+
 def buy_now_service(
     db: Session,
     *,
@@ -179,9 +242,11 @@ def buy_now_service(
     variant_id: int,
     quantity: int,
     paymentmethod: str,
+    before_commit: Optional[Callable[[Order, Decimal, int], None]] = None,
 ) -> Tuple[Order, Decimal, int]:
     """
     Creates single-item order with delivery charge.
+    before_commit works as in place_order_service.
     Returns: (order, items_subtotal, seller_count)
     """
     try:
@@ -202,14 +267,13 @@ def buy_now_service(
                 db.query(ProductVariant)
                 .filter(ProductVariant.id == variant_id)
                 .options(selectinload(ProductVariant.product))
-                .with_for_update()
                 .first()
             )
             if not variant:
                 raise error_handler(404, "Variant not found")
             if not getattr(variant, "is_active", True):
                 raise error_handler(400, "Variant is inactive")
-            if variant.stock_quantity < quantity:
+            if available_stock(db, [variant_id]).get(variant_id, 0) < quantity:
                 raise error_handler(400, "Insufficient stock")
 
             product = variant.product
@@ -267,21 +331,23 @@ def buy_now_service(
                 )
             )
 
-            
-            res = db.execute(
-                update(ProductVariant)
-                .where(ProductVariant.id == variant_id, ProductVariant.stock_quantity >= quantity)
-                .values(stock_quantity=ProductVariant.stock_quantity - quantity)
-            )
-            if res.rowcount != 1:
-                raise error_handler(400, "Insufficient stock")
+            if paymentmethod == PaymentMethod.ESEWA:
+                reserve_stock(db, order.id, {variant_id: quantity})
+            else:
+                remaining = decrement_stock(db, {variant_id: quantity})
+                if remaining[variant_id] <= 0:
+                    mark_sold_out_products(db, [product.id])
+            if before_commit is not None:
+                db.flush()
+                before_commit(order, items_subtotal, 1)
             db.commit()
+        invalidate_product_options(product.id)
         return order, items_subtotal, 1
     except IntegrityError:
         db.rollback()
-        return HTTPException(
+        raise HTTPException(
             status_code=400,
-            detail="Depulciated order"
+            detail="Duplicate order"
         )
     except SQLAlchemyError:
         db.rollback()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from backend.core.cache import build_cache
+
+PRODUCT_OPTIONS_CACHE_TTL = float(os.getenv("PRODUCT_OPTIONS_CACHE_TTL", "300"))
+
+options_cache = build_cache("product_options", maxsize=4096, ttl=PRODUCT_OPTIONS_CACHE_TTL)
+
+
+def _options_key(product_id: int) -> str:
+    return str(product_id)
+
+
+def make_etag(body) -> str:
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_options(product_id: int) -> dict | None:
+    return options_cache.get(_options_key(product_id))
+
+
+def store_options(product_id: int, body) -> dict:
+    document = {"etag": make_etag(body), "body": body}
+    options_cache.set(_options_key(product_id), document)
+    return document
+
+
+def invalidate_product_options(*product_ids: int) -> None:
+    options_cache.delete(*[_options_key(pid) for pid in product_ids if pid is not None])
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
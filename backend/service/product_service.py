@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 import os
 import shutil
+from pathlib import Path
 from decimal import Decimal
 from sqlalchemy.exc import SQLAlchemyError
 from backend.database import get_db
@@ -11,19 +12,26 @@ from backend.models.product import Product,ProductStatus,ProductCategory,TargetA
 from backend.models.seller import Seller
 from backend.models.product_img import ProductImage
 from backend.models.ProductVariant import ProductVariant
-from backend.schemas.product import ProductCreate,ProductRead,ProductUpdate,ProductVariantCreate,ProductVariantRead,AllProduct,ProductImageBase,ProductImageRead,ProductImageUpdate
+from backend.schemas.product import ProductCreate,ProductRead,ProductListRead,ProductUpdate,ProductVariantCreate,ProductVariantRead,AllProduct,ProductImageBase,ProductImageRead,ProductImageUpdate
 from backend.core.sku import  generate_hybrid_sku
 from backend.core.permission import check_permission
 from backend.core.error_handler import error_handler
 from backend.models.admin import Admin
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, tuple_
 from typing import Optional
 from backend.core.random_slang_url import generate_unique_url_slug
+from backend.core.pagination import encode_cursor, decode_cursor
+from backend.service.search_service import index_product, unindex_product, search_product_rows
+from backend.service.product_cache import get_cached_options, store_options, invalidate_product_options
+from backend.service.product_summary_service import refresh_product_summaries
+from backend.service.image_pipeline import schedule_renditions
+from backend.service.media_store import store_upload, release_urls, collect_garbage_quietly
+from fastapi.encoders import jsonable_encoder
 from datetime import datetime
 from uuid import uuid4
 from backend.core.settings import UPLOAD_DIR
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, noload, selectinload
 
 UPLOAD_FOLDER="backend/uploads/"
 
@@ -38,13 +46,7 @@ def add_product_by_seller(
     upload_folder: str,
 ) -> ProductRead:
 
-    os.makedirs(upload_folder, exist_ok=True)
-
-    filename = image.filename
-    file_path = os.path.join(upload_folder, filename)
-
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(image.file, f)
+    stored = store_upload(db, image, Path(upload_folder))
 
     url_slug = generate_unique_url_slug(db, product_name)
 
@@ -54,15 +56,17 @@ def add_product_by_seller(
         target_audience=targetAudience,
         product_category=product_category,
         description=description,
-        image_url=f"/uploads/{filename}",
+        image_url=stored.url,
         status=ProductStatus.inactive,
         seller_id=current_seller.id,
     )
 
     db.add(new_product)
     db.flush()  
+    index_product(db, new_product)
     db.commit()
     db.refresh(new_product)
+    schedule_renditions("product", new_product.id, stored.path, stored.blurhash)
 
     return ProductRead.from_orm(new_product)
 
@@ -81,14 +85,7 @@ def upload_single_product_image(
     if product.seller_id != current_seller.id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    os.makedirs(UPLOAD_DIR, exist_ok=True)  
-
-    ext = os.path.splitext(image.filename)[1].lower()
-    filename = f"{uuid4().hex}{ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)  
-
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(image.file, f)
+    stored = store_upload(db, image)
 
     try:
         with db.begin_nested():
@@ -100,14 +97,16 @@ def upload_single_product_image(
 
             row = ProductImage(
                 product_id=product_id,
-                image_url=f"/uploads/{filename}",
+                image_url=stored.url,
                 is_primary=is_primary,
                 sort_order=sort_order,
             )
             db.add(row)
             db.flush()
         db.commit()
+        invalidate_product_options(product_id)
         db.refresh(row)
+        schedule_renditions("product_image", row.id, stored.path, stored.blurhash)
         return ProductImageRead.from_orm(row)
 
     except IntegrityError:
@@ -131,9 +130,8 @@ def upload_multiple_product_images(
     if product.seller_id != current_seller.id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-
     saved_rows: list[ProductImage] = []
+    saved_media = []
 
     try:
         last_sort = (
@@ -145,18 +143,14 @@ def upload_multiple_product_images(
         start_sort = (last_sort[0] + 1) if last_sort else 0
 
         for i, img in enumerate(images):
-            ext = os.path.splitext(img.filename)[1].lower()
-            filename = f"{uuid4().hex}{ext}"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-
-            with open(file_path, "wb") as f:
-                shutil.copyfileobj(img.file, f)
+            stored = store_upload(db, img)
+            saved_media.append(stored)
 
             row = ProductImage(
                 
                 product_id=product_id,
                 color=color,
-                image_url=f"/uploads/{filename}",
+                image_url=stored.url,
                 is_primary=False,
                 sort_order=start_sort + i,
             )
@@ -164,9 +158,11 @@ def upload_multiple_product_images(
             saved_rows.append(row)
 
         db.commit()
+        invalidate_product_options(product_id)
 
-        for r in saved_rows:
+        for r, stored in zip(saved_rows, saved_media):
             db.refresh(r)
+            schedule_renditions("product_image", r.id, stored.path, stored.blurhash)
 
         return [ProductImageRead.from_orm(r) for r in saved_rows]
 
@@ -226,7 +222,10 @@ def add_product_variant(
             created_variants.append(variant)
 
         product.status = ProductStatus.active
+        db.flush()
+        refresh_product_summaries(db, [product_id])
         db.commit()
+        invalidate_product_options(product_id)
 
         for var in created_variants:
             db.refresh(var)
@@ -260,6 +259,54 @@ def view_product_by_slug(db: Session, slug: str) -> AllProduct:
         raise error_handler(status.HTTP_404_NOT_FOUND, "Product not found")
     return AllProduct.from_orm(product)
 
+PRODUCT_BATCH_MAX = 300
+
+def view_products_batch(
+    db: Session,
+    ids: list[int],
+    slugs: list[str],
+    fields: Optional[set[str]] = None,
+) -> list[dict]:
+    """
+    AllProduct payloads for many ids/slugs in request order. Costs one
+    products query plus one IN query for variants, whatever the batch size.
+    """
+    if len(ids) + len(slugs) > PRODUCT_BATCH_MAX:
+        raise error_handler(
+            status.HTTP_400_BAD_REQUEST, f"At most {PRODUCT_BATCH_MAX} products per batch"
+        )
+    if fields:
+        unknown = fields - set(AllProduct.model_fields)
+        if unknown:
+            raise error_handler(
+                status.HTTP_400_BAD_REQUEST, f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+    if not ids and not slugs:
+        return []
+
+    wants_variants = not fields or "variants" in fields
+    products = (
+        db.query(Product)
+        .options(
+            selectinload(Product.variants) if wants_variants else noload(Product.variants),
+            noload(Product.images),
+        )
+        .filter(or_(Product.id.in_(ids), Product.url_slug.in_(slugs)))
+        .all()
+    )
+
+    by_id = {p.id: p for p in products}
+    by_slug = {p.url_slug: p for p in products}
+    ordered = []
+    seen = set()
+    for product in [by_id.get(i) for i in ids] + [by_slug.get(s) for s in slugs]:
+        if product is None or product.id in seen:
+            continue
+        seen.add(product.id)
+        ordered.append(product)
+
+    return [AllProduct.model_validate(p).model_dump(include=fields or None) for p in ordered]
+
 def search_products(
     *,
     q: str,
@@ -267,32 +314,52 @@ def search_products(
     skip: int,
     limit: int,
     db: Session,
+    sort: str = "newest",
 ) -> AllProduct:
     term = q.strip()
     if not term:
         return []
 
-    like = f"%{term.lower()}%"
-    active_value = getattr(ProductStatus.active, "value", ProductStatus.active)
-
-    query = (
-        db.query(Product)
-        .filter(Product.status == active_value)
+    products = search_product_rows(
+        db, term=term, category=category, skip=skip, limit=limit, sort=sort
     )
+    return [ProductRead.from_orm(p) for p in products]
 
-    if category is not None:
-        query = query.filter(Product.product_category == category)
+LISTING_SORTS = {
+    "newest": (Product.created_at, "desc", datetime),
+    "price_asc": (Product.min_price, "asc", Decimal),
+    "price_desc": (Product.min_price, "desc", Decimal),
+}
 
-    query = query.filter(
-        or_(
-            func.lower(func.trim(Product.product_name)).like(like),
-            func.lower(func.trim(Product.url_slug)).like(like),
-            func.lower(func.trim(Product.description)).like(like),
-        )
-    ).order_by(Product.created_at.desc())
+def apply_listing_filters(
+    q,
+    *,
+    only_active: bool = True,
+    category: Optional[ProductCategory] = None,
+    target_audience: Optional[TargetAudience] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock_only: bool = False,
+    seller_id: Optional[int] = None,
+):
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise error_handler(status.HTTP_400_BAD_REQUEST, "min_price cannot exceed max_price")
 
-    products = query.offset(skip).limit(limit).all()
-    return [ProductRead.from_orm(p) for p in products]
+    if only_active:
+        q = q.filter(Product.status == ProductStatus.active)
+    if category:
+        q = q.filter(Product.product_category == category)
+    if target_audience:
+        q = q.filter(Product.target_audience == target_audience)
+    if min_price is not None:
+        q = q.filter(Product.min_price >= min_price)
+    if max_price is not None:
+        q = q.filter(Product.min_price <= max_price)
+    if in_stock_only:
+        q = q.filter(Product.in_stock == True)
+    if seller_id is not None:
+        q = q.filter(Product.seller_id == seller_id)
+    return q
 
 def view_all_product(
     db: Session,
@@ -300,55 +367,77 @@ def view_all_product(
     skip: int = 0,
     limit: int = 20,
     only_active: bool = True,
+    cursor: Optional[str] = None,
+    target_audience: Optional[TargetAudience] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock_only: bool = False,
+    seller_id: Optional[int] = None,
+    sort: str = "newest",
 ):
-
-    first_variant_sq = (
-        db.query(
-            ProductVariant.product_id.label("pid"),
-            func.min(ProductVariant.id).label("vid"),
-        )
-        .filter(ProductVariant.is_active == True)
-        .group_by(ProductVariant.product_id)
-        .subquery()
+    sort_col, direction, key_type = LISTING_SORTS[sort]
+
+    # listing columns are denormalized on products; skip the selectin loads
+    q = db.query(Product).options(noload(Product.variants), noload(Product.images))
+    q = apply_listing_filters(
+        q,
+        only_active=only_active,
+        category=category,
+        target_audience=target_audience,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        seller_id=seller_id,
     )
 
-    V = aliased(ProductVariant)
+    if sort_col is Product.min_price:
+        # products without an active variant have no price to sort on
+        q = q.filter(Product.min_price.isnot(None))
 
-    q = (
-        db.query(
-            Product,
-            V.id.label("default_variant_id"),
-            V.price.label("default_price"),
-        )
-        .outerjoin(first_variant_sq, first_variant_sq.c.pid == Product.id)
-        .outerjoin(V, V.id == first_variant_sq.c.vid)
-    )
+    if direction == "desc":
+        q = q.order_by(sort_col.desc(), Product.id.desc())
+    else:
+        q = q.order_by(sort_col.asc(), Product.id.asc())
 
-    if only_active:
-        q = q.filter(Product.status == ProductStatus.active)
+    if cursor:
+        after_key, after_id = decode_cursor(cursor, key_type)
+        position = tuple_(sort_col, Product.id)
+        if direction == "desc":
+            q = q.filter(position < (after_key, after_id))
+        else:
+            q = q.filter(position > (after_key, after_id))
+    else:
+        q = q.offset(skip)
 
-    if category:
-        q = q.filter(Product.product_category == category)
+    rows = q.limit(limit).all()
 
-    rows = (
-        q.order_by(Product.created_at.desc())
-         .offset(skip)
-         .limit(limit)
-         .all()
-    )
+    out = [ProductListRead.model_validate(product).model_dump() for product in rows]
 
-    out = []
-    for product, default_variant_id, default_price in rows:
-        base = ProductRead.model_validate(product).model_dump()
-        base["default_variant_id"] = default_variant_id
-        base["default_price"] = default_price
-        out.append(base)
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        last_key = last.created_at if sort == "newest" else last.min_price
+        next_cursor = encode_cursor(last_key, last.id)
 
-    return out
+    return out, next_cursor
 
 from sqlalchemy import select
 
 def get_product_options(db: Session, product_id: int):
+    return get_product_options_document(db, product_id)["body"]
+
+def get_product_options_document(db: Session, product_id: int) -> dict:
+    """
+    Returns {"etag", "body"}; the body is built once per product and kept
+    in the options cache until a variant, image or stock write invalidates it.
+    """
+    document = get_cached_options(product_id)
+    if document is None:
+        body = jsonable_encoder(_build_product_options(db, product_id))
+        document = store_options(product_id, body)
+    return document
+
+def _build_product_options(db: Session, product_id: int):
     variants = db.execute(
         select(ProductVariant).where(
             ProductVariant.product_id == product_id,
@@ -408,6 +497,10 @@ def get_product_options(db: Session, product_id: int):
         images_by_color[c].append({
             "id": img.id,
             "image_url": img.image_url,
+            "thumb_url": img.thumb_url,
+            "card_url": img.card_url,
+            "zoom_url": img.zoom_url,
+            "blurhash": img.blurhash,
             "is_primary": img.is_primary,
             "sort_order": img.sort_order,
         })
@@ -441,6 +534,8 @@ def edit_product_by_seller(
     for key, value in product_update.dict(exclude_unset=True).items():
         setattr(product, key, value)
 
+    db.flush()
+    index_product(db, product)
     db.commit()
     db.refresh(product)
 
@@ -461,8 +556,12 @@ def delete_product_by_admin(
     if not product:
         raise error_handler(status.HTTP_404_NOT_FOUND, "Product not found")
 
+    released = release_urls(db, [product.image_url, *(img.image_url for img in product.images)])
     db.delete(product)
     db.commit()
+    unindex_product(db, product_id)
+    invalidate_product_options(product_id)
+    collect_garbage_quietly(db, released)
 
     return {"message": "Product deleted successfully"}
 
@@ -480,8 +579,12 @@ def delete_product_by_seller(
     if product.seller_id != current_seller.id:
         raise error_handler(status.HTTP_403_FORBIDDEN, "Not authorized")
 
+    released = release_urls(db, [product.image_url, *(img.image_url for img in product.images)])
     db.delete(product)
     db.commit()
+    unindex_product(db, product_id)
+    invalidate_product_options(product_id)
+    collect_garbage_quietly(db, released)
 
     return {"message": "Product deleted successfully"}
 
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import sys
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import and_, exists, func, update
+from sqlalchemy.orm import Session
+
+from backend.models.product import Product
+from backend.models.ProductVariant import ProductVariant
+
+SUMMARY_FIELDS = ("default_variant_id", "default_price", "min_price", "in_stock")
+
+
+def _empty_summary() -> dict:
+    return {"default_variant_id": None, "default_price": None, "min_price": None, "in_stock": False}
+
+
+def compute_product_summaries(db: Session, product_ids: Iterable[int]) -> dict[int, dict]:
+    """
+    Expected denormalized listing columns per product, computed from the
+    active variants with one grouped query plus one IN lookup for prices.
+    """
+    product_ids = sorted(set(product_ids))
+    summaries = {pid: _empty_summary() for pid in product_ids}
+    if not product_ids:
+        return summaries
+
+    rows = (
+        db.query(
+            ProductVariant.product_id,
+            func.min(ProductVariant.id),
+            func.min(ProductVariant.price),
+            func.max(ProductVariant.stock_quantity),
+        )
+        .filter(ProductVariant.product_id.in_(product_ids), ProductVariant.is_active == True)
+        .group_by(ProductVariant.product_id)
+        .all()
+    )
+
+    default_ids = [vid for _, vid, _, _ in rows]
+    default_prices = dict(
+        db.query(ProductVariant.id, ProductVariant.price)
+        .filter(ProductVariant.id.in_(default_ids))
+        .all()
+    ) if default_ids else {}
+
+    for pid, vid, min_price, max_stock in rows:
+        summaries[pid] = {
+            "default_variant_id": vid,
+            "default_price": default_prices.get(vid),
+            "min_price": min_price,
+            "in_stock": (max_stock or 0) > 0,
+        }
+    return summaries
+
+
+def refresh_product_summaries(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Recompute and write the listing columns inside the caller's transaction.
+    Flush pending variant changes first; the session does not autoflush.
+    """
+    summaries = compute_product_summaries(db, product_ids)
+    if not summaries:
+        return
+    db.execute(
+        update(Product),
+        [{"id": pid, **summary} for pid, summary in summaries.items()],
+    )
+
+
+def mark_sold_out_products(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Stock decrements can only flip in_stock to False. Touch the product row
+    only when that happens so hot products are not locked on every order.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    has_stock = exists().where(
+        and_(
+            ProductVariant.product_id == Product.id,
+            ProductVariant.is_active == True,
+            ProductVariant.stock_quantity > 0,
+        )
+    )
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.in_stock == True, ~has_stock)
+        .values(in_stock=False)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _same(stored, expected) -> bool:
+    if stored is None or expected is None:
+        return stored is None and expected is None
+    if isinstance(stored, Decimal) or isinstance(expected, Decimal):
+        return Decimal(str(stored)) == Decimal(str(expected))
+    return stored == expected
+
+
+def _iter_product_id_batches(db: Session, batch_size: int):
+    last_id = 0
+    while True:
+        ids = [
+            pid for (pid,) in db.query(Product.id)
+            .filter(Product.id > last_id)
+            .order_by(Product.id)
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def find_inconsistent_products(db: Session, batch_size: int = 1000) -> list[dict]:
+    mismatches = []
+    for ids in _iter_product_id_batches(db, batch_size):
+        expected = compute_product_summaries(db, ids)
+        stored = db.query(Product.id, *[getattr(Product, f) for f in SUMMARY_FIELDS]).filter(
+            Product.id.in_(ids)
+        ).all()
+        for row in stored:
+            pid, values = row[0], dict(zip(SUMMARY_FIELDS, row[1:]))
+            diff = {
+                f: {"stored": values[f], "expected": expected[pid][f]}
+                for f in SUMMARY_FIELDS
+                if not _same(values[f], expected[pid][f])
+            }
+            if diff:
+                mismatches.append({"product_id": pid, "fields": diff})
+    return mismatches
+
+
+def repair_product_summaries(db: Session, batch_size: int = 500) -> int:
+    """
+    Backfill or repair every product in id batches, one commit per batch.
+    """
+    repaired = 0
+    for ids in _iter_product_id_batches(db, batch_size):
+        refresh_product_summaries(db, ids)
+        db.commit()
+        repaired += len(ids)
+    return repaired
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    session = SessionLocal()
+    try:
+        if command == "repair":
+            print(f"refreshed {repair_product_summaries(session)} products")
+        elif command == "check":
+            problems = find_inconsistent_products(session)
+            for problem in problems:
+                print(problem)
+            print(f"{len(problems)} inconsistent products")
+            sys.exit(1 if problems else 0)
+        else:
+            sys.exit("usage: python -m backend.service.product_summary_service [check|repair]")
+    finally:
+        session.close()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import logging
+import sys
+
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy import String, cast, func, inspect, literal, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from backend.database import Base
+from backend.models.cart import Cart, CartStauts
+from backend.models.refresh_token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+# any constant works; it only has to be the same in every process
+_UPGRADE_LOCK_KEY = 7_310_442_019
+
+_PRODUCT_SUMMARY_COLUMNS = {"default_variant_id", "default_price", "min_price", "in_stock"}
+
+
+def _column_ddl(conn: Connection, column, *, allow_not_null: bool) -> str:
+    dialect = conn.dialect
+    ddl = dialect.ddl_compiler(dialect, None)
+    spec = (
+        f"{ddl.preparer.format_column(column)} "
+        f"{dialect.type_compiler_instance.process(column.type, type_expression=column)}"
+    )
+    default = ddl.get_column_default_string(column)
+    if default is not None:
+        spec += f" DEFAULT {default}"
+    if not column.nullable and allow_not_null:
+        spec += " NOT NULL"
+    return f"ALTER TABLE {ddl.preparer.format_table(column.table)} ADD COLUMN {spec}"
+
+
+def _add_enum_values(conn: Connection) -> list[str]:
+    """Postgres enum types only grow through ALTER TYPE; create_all never does it."""
+    added = []
+    preparer = conn.dialect.identifier_preparer
+    seen = set()
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            enum_type = column.type
+            if not isinstance(enum_type, SAEnum) or not enum_type.native_enum or enum_type.name in seen:
+                continue
+            seen.add(enum_type.name)
+            labels = set(conn.scalars(
+                text(
+                    "SELECT e.enumlabel FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid "
+                    "WHERE t.typname = :name"
+                ),
+                {"name": enum_type.name},
+            ))
+            if not labels:
+                continue  # the type is new; create_all made it complete
+            for label in enum_type.enums:
+                if label not in labels:
+                    quoted = "'" + label.replace("'", "''") + "'"
+                    conn.execute(text(f"ALTER TYPE {preparer.format_type(enum_type)} ADD VALUE IF NOT EXISTS {quoted}"))
+                    added.append(f"{enum_type.name}.{label}")
+    return added
+
+
+def _add_missing_columns(conn: Connection) -> list[tuple[str, str]]:
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        have = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in have:
+                continue
+            # NOT NULL without a server default cannot be added to a filled
+            # table; it goes in nullable and is tightened after the backfill
+            conn.execute(text(_column_ddl(conn, column, allow_not_null=column.server_default is not None)))
+            added.append((table.name, column.name))
+    return added
+
+
+def _merge_duplicate_active_carts(db: Session) -> int:
+    """
+    Carts created by the old get-or-create race: keep each buyer's most
+    recently touched ACTIVE cart, move the other carts' lines into it
+    (adding quantities for variants it already has) and mark them
+    ABANDONED. Returns the number of carts retired.
+    """
+    buyers = db.scalars(
+        select(Cart.buyer_id)
+        .where(Cart.status == CartStauts.ACTIVE.value)
+        .group_by(Cart.buyer_id)
+        .having(func.count() > 1)
+    ).all()
+    retired = 0
+    for buyer_id in buyers:
+        carts = db.scalars(
+            select(Cart)
+            .where(Cart.buyer_id == buyer_id, Cart.status == CartStauts.ACTIVE.value)
+            .order_by(Cart.updated_at.desc(), Cart.id.desc())
+        ).all()
+        keeper, extras = carts[0], carts[1:]
+        lines = {item.variant_id: item for item in keeper.items}
+        for cart in extras:
+            for item in list(cart.items):
+                kept = lines.get(item.variant_id)
+                if kept is None:
+                    item.cart = keeper
+                    lines[item.variant_id] = item
+                else:
+                    kept.quantity += item.quantity
+                    kept.version += 1
+                    db.delete(item)
+            cart.status = CartStauts.ABANDONED.value
+            cart.version += 1
+            retired += 1
+        keeper.version += 1
+        db.flush()
+    db.commit()
+    return retired
+
+
+def _backfill(db: Session, added: set[tuple[str, str]]) -> None:
+    from backend.service.product_summary_service import repair_product_summaries
+    from backend.service.search_service import reindex_all_products
+
+    if ("refresh_tokens", "family_id") in added:
+        # tokens issued before families existed each become their own family
+        db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id.is_(None))
+            .values(family_id=literal("legacy-") + cast(RefreshToken.id, String))
+        )
+        db.commit()
+    if {("products", c) for c in _PRODUCT_SUMMARY_COLUMNS} & added:
+        repair_product_summaries(db)
+    if ("products", "search_vector") in added:
+        reindex_all_products(db)
+
+
+def _tighten_not_null(conn: Connection, added: set[tuple[str, str]]) -> None:
+    if conn.dialect.name != "postgresql":
+        return  # SQLite cannot alter a column; it stays nullable there
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if (table.name, column.name) in added and not column.nullable and column.server_default is None:
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ALTER COLUMN {preparer.format_column(column)} SET NOT NULL"
+                ))
+
+
+def _create_missing_indexes(conn: Connection) -> list[str]:
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        have = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in have:
+                index.create(conn)
+                created.append(index.name)
+    return created
+
+
+def upgrade_schema(engine: Engine) -> dict:
+    """
+    Bring tables that existed before the current models up to date; run
+    after Base.metadata.create_all, which only creates missing tables.
+    Adds missing columns (with their server defaults), backfills the ones
+    that need data, adds new enum labels, merges duplicate ACTIVE carts
+    so uq_carts_one_active_per_buyer can be built, and creates missing
+    indexes. Idempotent: on an up-to-date database it only inspects.
+    On Postgres an advisory lock keeps concurrent workers from racing.
+    """
+    summary: dict = {"enum_values": [], "columns": [], "carts_merged": 0, "indexes": []}
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _UPGRADE_LOCK_KEY})
+        try:
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    summary["enum_values"] = _add_enum_values(conn)
+                summary["columns"] = _add_missing_columns(conn)
+
+            added = set(summary["columns"])
+            with Session(bind=engine) as db:
+                if added:
+                    _backfill(db, added)
+                if "uq_carts_one_active_per_buyer" not in {ix["name"] for ix in inspect(engine).get_indexes("carts")}:
+                    summary["carts_merged"] = _merge_duplicate_active_carts(db)
+
+            with engine.begin() as conn:
+                _tighten_not_null(conn, added)
+                summary["indexes"] = _create_missing_indexes(conn)
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _UPGRADE_LOCK_KEY})
+                lock_conn.commit()
+
+    if any(summary.values()):
+        logger.info("schema upgraded: %s", summary)
+    return summary
+
+
+if __name__ == "__main__":
+    # python -m backend.service.schema_upgrade upgrade
+    from backend.database import engine
+    from backend.service.search_service import ensure_search_extensions
+
+    if sys.argv[1:] != ["upgrade"]:
+        sys.exit("usage: python -m backend.service.schema_upgrade upgrade")
+
+    ensure_search_extensions(engine)
+    Base.metadata.create_all(bind=engine)
+    print(upgrade_schema(engine))
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import difflib
+import re
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import cast, func, text, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+
+from backend.models.product import Product, ProductCategory, ProductStatus
+
+TS_CONFIG = "simple"
+
+# field weights used by both backends: name > slug > description
+FIELD_WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.1}
+
+# runs of Unicode letters and digits ("Кофе", "café", "v2"); none of the
+# tsquery operators (& | ! ( ) : * < > ' \) can end up inside a token, so
+# tokens go into to_tsquery as they are
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(value: str | None) -> list[str]:
+    return _TOKEN_RE.findall((value or "").lower())
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def ensure_search_extensions(bind) -> None:
+    """
+    pg_trgm must exist before create_all builds the trigram index.
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    with bind.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def _tsvector_expr():
+    cfg = cast(TS_CONFIG, REGCONFIG)
+    name = func.setweight(func.to_tsvector(cfg, func.coalesce(Product.product_name, "")), "A")
+    slug = func.setweight(
+        func.to_tsvector(cfg, func.replace(func.coalesce(Product.url_slug, ""), "-", " ")), "B"
+    )
+    description = func.setweight(func.to_tsvector(cfg, func.coalesce(Product.description, "")), "C")
+    return name.op("||")(slug).op("||")(description)
+
+
+def _tsquery_expr(tokens: list[str]):
+    # prefix match on every token so "snea" finds "sneakers" while typing
+    query = " & ".join(f"{t}:*" for t in tokens)
+    return func.to_tsquery(cast(TS_CONFIG, REGCONFIG), query)
+
+
+class InMemoryProductIndex:
+    """
+    Pure-Python inverted index used when the database has no full-text
+    support (SQLite test runs). Built lazily from the products table.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self._doc_terms: dict[int, set[str]] = {}
+        self._loaded = False
+
+    def _add_locked(self, product_id: int, fields: dict[str, str | None]) -> None:
+        self._remove_locked(product_id)
+        terms: set[str] = set()
+        for weight_key, value in fields.items():
+            weight = FIELD_WEIGHTS[weight_key]
+            for token in tokenize(value):
+                postings = self._postings[token]
+                postings[product_id] = postings.get(product_id, 0.0) + weight
+                terms.add(token)
+        self._doc_terms[product_id] = terms
+
+    def _remove_locked(self, product_id: int) -> None:
+        for token in self._doc_terms.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def add(self, product: Product) -> None:
+        with self._lock:
+            self._add_locked(product.id, _product_fields(product))
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def ensure_loaded(self, db: Session, *, force: bool = False) -> None:
+        if self._loaded and not force:
+            return
+        rows = db.query(
+            Product.id, Product.product_name, Product.url_slug, Product.description
+        ).all()
+        with self._lock:
+            if self._loaded and not force:
+                return
+            self._postings.clear()
+            self._doc_terms.clear()
+            for pid, name, slug, description in rows:
+                self._add_locked(pid, {"A": name, "B": slug, "C": description})
+            self._loaded = True
+
+    def _match_prefix(self, token: str) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        for term, postings in self._postings.items():
+            if term.startswith(token):
+                for pid, score in postings.items():
+                    scores[pid] = max(scores.get(pid, 0.0), score)
+        return scores
+
+    def search(self, tokens: list[str]) -> dict[int, float]:
+        with self._lock:
+            result: dict[int, float] | None = None
+            for token in tokens:
+                matches = self._match_prefix(token)
+                if result is None:
+                    result = matches
+                else:
+                    result = {pid: result[pid] + s for pid, s in matches.items() if pid in result}
+                if not result:
+                    return {}
+            return result or {}
+
+    def correct(self, tokens: list[str]) -> list[str]:
+        with self._lock:
+            vocabulary = list(self._postings.keys())
+        corrected = []
+        for token in tokens:
+            close = difflib.get_close_matches(token, vocabulary, n=1, cutoff=0.75)
+            corrected.append(close[0] if close else token)
+        return corrected
+
+
+_memory_index = InMemoryProductIndex()
+
+
+def _product_fields(product: Product) -> dict[str, str | None]:
+    return {"A": product.product_name, "B": product.url_slug, "C": product.description}
+
+
+def index_product(db: Session, product: Product) -> None:
+    """
+    Keep the search document of a product in sync; call after flush and
+    before commit so the update rides in the same transaction.
+    """
+    if _is_postgres(db):
+        db.execute(
+            update(Product)
+            .where(Product.id == product.id)
+            .values(search_vector=_tsvector_expr())
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        _memory_index.add(product)
+
+
+def unindex_product(db: Session, product_id: int) -> None:
+    if not _is_postgres(db):
+        _memory_index.remove(product_id)
+
+
+def reindex_all_products(db: Session) -> None:
+    if _is_postgres(db):
+        db.execute(update(Product).values(search_vector=_tsvector_expr()))
+        db.commit()
+    else:
+        _memory_index.ensure_loaded(db, force=True)
+
+
+def _base_query(db: Session, category: Optional[ProductCategory]):
+    query = db.query(Product).filter(Product.status == ProductStatus.active)
+    if category is not None:
+        query = query.filter(Product.product_category == category)
+    return query
+
+
+def _search_postgres(db, tokens, term, category, skip, limit, sort):
+    tsq = _tsquery_expr(tokens)
+    rank = func.ts_rank_cd(Product.search_vector, tsq)
+    query = _base_query(db, category).filter(Product.search_vector.op("@@")(tsq))
+    if sort == "relevance":
+        query = query.order_by(rank.desc(), Product.created_at.desc(), Product.id.desc())
+    else:
+        query = query.order_by(Product.created_at.desc(), Product.id.desc())
+    products = query.offset(skip).limit(limit).all()
+    if products or skip:
+        return products
+
+    # nothing matched the lexemes; fall back to trigram similarity for typos
+    similarity = func.similarity(Product.product_name, term)
+    return (
+        _base_query(db, category)
+        .filter(Product.product_name.op("%")(term))
+        .order_by(similarity.desc(), Product.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _search_memory(db, tokens, category, skip, limit, sort):
+    _memory_index.ensure_loaded(db)
+    scores = _memory_index.search(tokens)
+    if not scores:
+        scores = _memory_index.search(_memory_index.correct(tokens))
+    if not scores:
+        return []
+
+    products = _base_query(db, category).filter(Product.id.in_(list(scores))).all()
+    if sort == "relevance":
+        products.sort(key=lambda p: (scores[p.id], p.created_at, p.id), reverse=True)
+    else:
+        products.sort(key=lambda p: (p.created_at, p.id), reverse=True)
+    return products[skip:skip + limit]
+
+
+def search_product_rows(
+    db: Session,
+    *,
+    term: str,
+    category: Optional[ProductCategory],
+    skip: int,
+    limit: int,
+    sort: str = "newest",
+) -> list[Product]:
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+    if _is_postgres(db):
+        return _search_postgres(db, tokens, term, category, skip, limit, sort)
+    return _search_memory(db, tokens, category, skip, limit, sort)
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        reindex_all_products(session)
+        print("search index rebuilt")
+    finally:
+        session.close()
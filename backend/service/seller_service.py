@@ -21,6 +21,7 @@ from backend.utils.hashed import  verify_password
 from backend.core.permission import check_permission
 from backend.core.error_handler import error_handler
 from backend.utils.jwt import  verify_token,create_refresh_token
+from backend.utils.principal import forget_principal, revoke_access_tokens
 from sqlalchemy.exc import SQLAlchemyError,IntegrityError
 
 from typing import Dict
@@ -83,6 +84,8 @@ def admin_approve_account(
     seller.status = seller_approved.status
     seller.is_verified = seller_approved.is_verified
     seller.updated_at = datetime.utcnow()
+    # tokens carry the verification flags; make the seller pick up new ones
+    revoke_access_tokens(db, "Seller", seller.id)
     try:
         db.commit()
     except SQLAlchemyError:
@@ -116,6 +119,7 @@ def update_seller_profile(
     ):
         seller.is_verified = False
         seller.status = "PENDING"
+        revoke_access_tokens(db, "Seller", seller.id)
 
     db.commit()
     db.refresh(seller)
@@ -146,6 +150,7 @@ def delete_seller_by_admin(
     try:
         db.delete(seller)
         db.commit()
+        forget_principal("Seller", seller_id)
 
         return {"message": f"Seller '{seller.username}' has been deleted."}
     except SQLAlchemyError:
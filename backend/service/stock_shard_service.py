@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+from typing import Iterable, Mapping
+
+from fastapi import status
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.core.error_handler import error_handler
+from backend.models.ProductVariant import ProductVariant
+from backend.models.stock_reservation import ReservationStatus, StockReservation
+from backend.models.variant_stock_shard import VariantStockShard
+from backend.service.product_cache import invalidate_product_options
+from backend.service.product_summary_service import refresh_product_summaries
+
+STOCK_SHARDS_DEFAULT = int(os.getenv("STOCK_SHARDS_DEFAULT", "8"))
+STOCK_SHARDS_MAX = 64
+
+
+def _even_split(total: int, shards: int) -> list[int]:
+    base, extra = divmod(max(total, 0), shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def sharded_variant_ids(db: Session, variant_ids: Iterable[int]) -> set[int]:
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return set()
+    return set(
+        db.scalars(
+            select(ProductVariant.id).where(
+                ProductVariant.id.in_(variant_ids), ProductVariant.stock_sharded == True
+            )
+        )
+    )
+
+
+def shard_totals(db: Session, variant_ids: Iterable[int]) -> dict[int, int]:
+    variant_ids = sorted(set(variant_ids))
+    if not variant_ids:
+        return {}
+    rows = db.execute(
+        select(VariantStockShard.variant_id, func.sum(VariantStockShard.quantity))
+        .where(VariantStockShard.variant_id.in_(variant_ids))
+        .group_by(VariantStockShard.variant_id)
+    ).all()
+    totals = {vid: 0 for vid in variant_ids}
+    totals.update({vid: int(total or 0) for vid, total in rows})
+    return totals
+
+
+def take_from_shards(db: Session, variant_id: int, qty: int) -> bool:
+    """
+    Take qty off a sharded variant. Usually one UPDATE on a random shard
+    that has enough left and is not locked by another checkout; when no
+    single shard can cover it, all shards are locked and qty is spread
+    over them. Returns False if the shards together are short.
+    """
+    pick = (
+        select(VariantStockShard.shard_no)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.quantity >= qty)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    hit = db.execute(
+        update(VariantStockShard)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.shard_no == pick)
+        .values(quantity=VariantStockShard.quantity - qty)
+        .returning(VariantStockShard.quantity)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if hit is not None:
+        return True
+
+    shards = db.execute(
+        select(VariantStockShard.shard_no, VariantStockShard.quantity)
+        .where(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard_no)
+        .with_for_update()
+    ).all()
+    if sum(q for _, q in shards) < qty:
+        return False
+
+    left = qty
+    changes = []
+    for shard_no, quantity in sorted(shards, key=lambda s: -s.quantity):
+        if left == 0:
+            break
+        taken = min(quantity, left)
+        left -= taken
+        changes.append({"variant_id": variant_id, "shard_no": shard_no, "quantity": quantity - taken})
+    db.execute(update(VariantStockShard), changes)
+    return True
+
+
+def credit_stock(db: Session, variant_qty: Mapping[int, int]) -> None:
+    """
+    Give stock back, e.g. a released hold that had been debited. Sharded
+    variants get it on their emptiest shard; the rest on stock_quantity.
+    """
+    sharded = sharded_variant_ids(db, variant_qty)
+    for vid, qty in sorted(variant_qty.items()):
+        if vid in sharded:
+            emptiest = (
+                select(VariantStockShard.shard_no)
+                .where(VariantStockShard.variant_id == vid)
+                .order_by(VariantStockShard.quantity, VariantStockShard.shard_no)
+                .limit(1)
+                .scalar_subquery()
+            )
+            db.execute(
+                update(VariantStockShard)
+                .where(VariantStockShard.variant_id == vid, VariantStockShard.shard_no == emptiest)
+                .values(quantity=VariantStockShard.quantity + qty)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.id == vid)
+                .values(stock_quantity=ProductVariant.stock_quantity + qty)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _locked_variant(db: Session, variant_id: int) -> ProductVariant:
+    variant = (
+        db.query(ProductVariant)
+        .filter(ProductVariant.id == variant_id)
+        .with_for_update()
+        .one_or_none()
+    )
+    if not variant:
+        raise error_handler(status.HTTP_404_NOT_FOUND, "Variant not found")
+    return variant
+
+
+def enable_stock_sharding(db: Session, variant_id: int, shards: int = STOCK_SHARDS_DEFAULT) -> ProductVariant:
+    if not 2 <= shards <= STOCK_SHARDS_MAX:
+        raise error_handler(status.HTTP_400_BAD_REQUEST, f"shards must be between 2 and {STOCK_SHARDS_MAX}")
+
+    variant = _locked_variant(db, variant_id)
+    if variant.stock_sharded:
+        raise error_handler(status.HTTP_409_CONFLICT, "Variant stock is already sharded")
+
+    # undebited holds are subtracted from stock_quantity at read time, which
+    # sharded reads do not do; let them settle first
+    open_holds = db.scalar(
+        select(func.count())
+        .select_from(StockReservation)
+        .where(
+            StockReservation.variant_id == variant_id,
+            StockReservation.status == ReservationStatus.HELD,
+            StockReservation.debited == False,
+        )
+    )
+    if open_holds:
+        raise error_handler(status.HTTP_409_CONFLICT, "Variant has open stock holds, try again later")
+
+    db.execute(
+        insert(VariantStockShard),
+        [
+            {"variant_id": variant_id, "shard_no": i, "quantity": q}
+            for i, q in enumerate(_even_split(variant.stock_quantity, shards))
+        ],
+    )
+    variant.stock_sharded = True
+    db.commit()
+    db.refresh(variant)
+    return variant
+
+
+def disable_stock_sharding(db: Session, variant_id: int) -> ProductVariant:
+    variant = _locked_variant(db, variant_id)
+    if not variant.stock_sharded:
+        raise error_handler(status.HTTP_409_CONFLICT, "Variant stock is not sharded")
+
+    db.execute(
+        select(VariantStockShard.shard_no)
+        .where(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard_no)
+        .with_for_update()
+    )
+    total = shard_totals(db, [variant_id])[variant_id]
+    db.execute(delete(VariantStockShard).where(VariantStockShard.variant_id == variant_id))
+    variant.stock_quantity = total
+    variant.stock_sharded = False
+    db.commit()
+    db.refresh(variant)
+    invalidate_product_options(variant.product_id)
+    return variant
+
+
+def rebalance_stock_shards(db: Session) -> int:
+    """
+    Even out every sharded variant's shards so random picks keep hitting
+    shards with stock, and copy the total onto stock_quantity for reads.
+    One short transaction per variant. Returns the number rebalanced.
+    """
+    variant_ids = list(
+        db.scalars(select(ProductVariant.id).where(ProductVariant.stock_sharded == True))
+    )
+    db.rollback()
+
+    changed_products: set[int] = set()
+    for vid in variant_ids:
+        shards = db.execute(
+            select(VariantStockShard.shard_no, VariantStockShard.quantity)
+            .where(VariantStockShard.variant_id == vid)
+            .order_by(VariantStockShard.shard_no)
+            .with_for_update()
+        ).all()
+        if not shards:
+            db.rollback()
+            continue
+
+        total = sum(q for _, q in shards)
+        target = _even_split(total, len(shards))
+        changes = [
+            {"variant_id": vid, "shard_no": shard_no, "quantity": want}
+            for (shard_no, have), want in zip(shards, target)
+            if have != want
+        ]
+        if changes:
+            db.execute(update(VariantStockShard), changes)
+
+        product_id = db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == vid, ProductVariant.stock_quantity != total)
+            .values(stock_quantity=total)
+            .returning(ProductVariant.product_id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if product_id is not None:
+            refresh_product_summaries(db, [product_id])
+            changed_products.add(product_id)
+        db.commit()
+
+    invalidate_product_options(*changed_products)
+    return len(variant_ids)
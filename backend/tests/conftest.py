@@ -0,0 +1,82 @@
+import os
+import tempfile
+from pathlib import Path
+
+# backend.database builds its engine at import time, so point it at a
+# throwaway SQLite file before anything under backend is imported
+_DB_FILE = Path(tempfile.mkdtemp(prefix="online_store_tests_")) / "test.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_FILE}")
+os.environ.setdefault("database_url", os.environ["DATABASE_URL"])
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def app():
+    from backend.main import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    from backend.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def customer(db):
+    from uuid import uuid4
+
+    from backend.models.customer import Customer
+
+    tag = uuid4().hex[:10]
+    row = Customer(username=f"c{tag}", email=f"c{tag}@example.com", phone_number=tag, hashed_password="x")
+    db.add(row)
+    db.commit()
+    return row
+
+
+@pytest.fixture
+def make_variant(db):
+    """make_variant(stock=5, price=...) -> an active product variant with its own product and seller."""
+    from decimal import Decimal
+    from uuid import uuid4
+
+    from backend.models.ProductVariant import ProductVariant
+    from backend.models.product import Product, ProductCategory, ProductStatus, TargetAudience
+    from backend.models.seller import Seller
+
+    def make(stock: int = 5, price: Decimal = Decimal("10.00")) -> ProductVariant:
+        tag = uuid4().hex[:10]
+        seller = Seller(
+            username=f"s{tag}", email=f"s{tag}@example.com", phone_number=f"s{tag}",
+            hashed_password="x", business_name="shop", business_address="here",
+            status="APPROVED", is_verified=True,
+        )
+        product = Product(
+            product_name=f"product {tag}", url_slug=f"product-{tag}",
+            product_category=ProductCategory.CLOTHES, target_audience=TargetAudience.UNISEX,
+            status=ProductStatus.active, seller=seller,
+        )
+        variant = ProductVariant(product=product, sku=f"sku-{tag}", price=price, stock_quantity=stock)
+        db.add(variant)
+        db.commit()
+        return variant
+
+    return make
@@ -0,0 +1,99 @@
+"""
+Query budgets for every cart route, counted with a before_cursor_execute
+listener on SQLite. Caches are cleared before each request so the counts
+are cold-path worst cases, and the same budget holds for one cart line or
+many: a route whose count grows with the cart has an N+1.
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import engine
+from backend.service.cart_service import summary_cache
+from backend.service.guest_cart_service import variant_card_cache
+from backend.utils.jwt import create_access_token
+from backend.utils.principal import principal_cache
+
+
+@contextmanager
+def count_queries():
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def shopper(client, customer):
+    client.cookies.clear()
+    client.headers["Authorization"] = f"Bearer {create_access_token(customer, role='Customer')}"
+    yield customer
+    del client.headers["Authorization"]
+    client.cookies.clear()
+
+
+def _request(client, method, url, **kwargs):
+    summary_cache.clear()
+    variant_card_cache.clear()
+    principal_cache.clear()
+    with count_queries() as statements:
+        response = client.request(method, url, **kwargs)
+    assert response.status_code == 200, response.text
+    return response, len(statements)
+
+
+@pytest.mark.parametrize("lines", [1, 5])
+def test_customer_cart_routes(client, shopper, make_variant, lines):
+    variants = [make_variant(stock=10) for _ in range(lines)]
+    for v in variants:
+        client.post("/cart/items", json={"variant_id": v.id, "quantity": 2})
+    extra = make_variant(stock=10)
+
+    cart, n = _request(client, "GET", "/cart/me")
+    assert n <= 3
+    item_id = cart.json()["items"][0]["id"]
+
+    _, n = _request(client, "GET", f"/cart/items/by-variant/{variants[0].id}")
+    assert n <= 2
+    _, n = _request(client, "POST", "/cart/items", json={"variant_id": extra.id, "quantity": 1})
+    assert n <= 10  # update-or-insert of the line runs in a savepoint
+    _, n = _request(client, "POST", "/cart/items/bulk", json={"items": [{"variant_id": v.id} for v in variants]})
+    assert n <= 6
+    _, n = _request(client, "PATCH", f"/cart/items/{item_id}/decrease", json={"amount": 1})
+    assert n <= 5
+    _, n = _request(client, "DELETE", f"/cart/items/{item_id}")
+    assert n <= 5
+    _, n = _request(client, "DELETE", "/cart/all-item/delete")
+    assert n <= 5
+
+
+@pytest.mark.parametrize("lines", [1, 5])
+def test_guest_cart_routes(client, shopper, make_variant, lines):
+    auth = client.headers.pop("Authorization")
+    variants = [make_variant(stock=10) for _ in range(lines)]
+    for v in variants[1:]:
+        client.post("/cart/guest/items", json={"variant_id": v.id, "quantity": 1})
+
+    _, n = _request(client, "POST", "/cart/guest/items", json={"variant_id": variants[0].id, "quantity": 2})
+    assert n <= 2
+    _, n = _request(client, "GET", "/cart/guest")
+    assert n <= 1
+    _, n = _request(client, "PATCH", f"/cart/guest/items/{variants[0].id}/decrease", json={"amount": 1})
+    assert n <= 1
+    _, n = _request(client, "DELETE", f"/cart/guest/items/{variants[0].id}")
+    assert n <= 1
+
+    client.post("/cart/guest/items", json={"variant_id": variants[0].id, "quantity": 1})
+    client.headers["Authorization"] = auth
+    _, n = _request(client, "POST", "/cart/guest/merge")
+    assert n <= 7
+
+    _, n = _request(client, "DELETE", "/cart/guest")
+    assert n == 0
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.models.address import Address
+from backend.models.cart import Cart
+from backend.models.cart_items import CartItem
+from backend.models.idempotency_key import IdempotencyKey
+from backend.service import checkout_queue
+
+
+class _Jobs(list):
+    def submit(self, job):
+        self.append(job)
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    queued = _Jobs()
+    monkeypatch.setattr(checkout_queue, "get_checkout_queue", lambda: queued)
+    monkeypatch.setattr(checkout_queue, "CHECKOUT_MODE", "queued")
+    return queued
+
+
+@pytest.fixture
+def address_id(db, customer, make_variant):
+    variant = make_variant(stock=5)
+    address = Address(customer_id=customer.id, full_name="Buyer", phone_number="1", region="Bagmati", line1="Street")
+    cart = Cart(buyer_id=customer.id, status="ACTIVE")
+    cart.items.append(CartItem(variant_id=variant.id, quantity=1, price=variant.price))
+    db.add_all([address, cart])
+    db.commit()
+    return address.id
+
+
+def _enqueue(db, customer, address_id, key="k1"):
+    response = checkout_queue.enqueue_checkout(
+        db, user_id=customer.id, address_id=address_id, payment_method="CASH ON DELIVERY", idempotency_key=key,
+    )
+    assert response.status_code == 202
+    return json.loads(response.body)
+
+
+def test_queued_checkout_survives_a_restart(db, customer, address_id, jobs):
+    ticket = _enqueue(db, customer, address_id)["ticket"]
+    assert checkout_queue.get_checkout_ticket(db, ticket, customer.id).status == "QUEUED"
+    lost = jobs.pop()
+
+    # the process died with the job in memory; its lease runs out
+    db.query(IdempotencyKey).filter(IdempotencyKey.ticket == ticket).update(
+        {"locked_until": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.commit()
+    assert checkout_queue.requeue_stale_checkouts(db) == 1
+    requeued = jobs.pop()
+
+    # a stale copy of the job never runs once it has been requeued
+    checkout_queue._run_job(db, lost)
+    assert checkout_queue.get_checkout_ticket(db, ticket, customer.id).status == "QUEUED"
+
+    checkout_queue._run_job(db, requeued)
+    done = checkout_queue.get_checkout_ticket(db, ticket, customer.id)
+    assert done.status == "DONE"
+    assert done.result.order_id
+
+
+def test_retried_key_gets_the_first_ticket_back(db, customer, address_id, jobs):
+    first = _enqueue(db, customer, address_id, key="k2")
+    checkout_queue._run_job(db, jobs.pop())
+
+    again = _enqueue(db, customer, address_id, key="k2")
+    assert again["ticket"] == first["ticket"]
+    assert again["status"] == "DONE"
+    assert not jobs
+
+
+def test_tickets_are_private(db, customer, address_id, jobs):
+    ticket = _enqueue(db, customer, address_id, key="k3")["ticket"]
+    with pytest.raises(Exception) as exc:
+        checkout_queue.get_checkout_ticket(db, ticket, customer.id + 1000)
+    assert exc.value.status_code == 404
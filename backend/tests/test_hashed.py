@@ -0,0 +1,19 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from backend.utils import hashed
+
+
+def test_pool_is_rebuilt_after_a_worker_dies():
+    restarts = hashed.password_pool_stats()["pool_restarts"]
+
+    # a worker that exits takes the pool down with it, on the retry too
+    with pytest.raises(HTTPException) as exc:
+        hashed._run(os._exit, 1)
+    assert exc.value.status_code == 503
+    assert hashed.password_pool_stats()["pool_restarts"] == restarts + 2
+
+    digest = hashed.hashed_password("secret")
+    assert hashed.verify_password("secret", digest)
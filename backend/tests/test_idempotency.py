@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi import Response
+from pydantic import BaseModel
+
+from backend.models.idempotency_key import IdempotencyKey
+from backend.service.idempotency_service import REPLAY_HEADER, replay_cache, run_idempotent
+
+
+class Out(BaseModel):
+    n: int
+
+
+def _run(db, key, handler, owner_id=1):
+    response = Response()
+    result = run_idempotent(
+        db, owner_id=owner_id, scope="test", key=key, payload={"a": 1},
+        response=response, response_model=Out, status_code=201, handler=handler,
+    )
+    return result, response
+
+
+def _counting_handler(db, calls):
+    def handler(record):
+        calls.append(1)
+        result = Out(n=len(calls))
+        record(result)
+        db.commit()
+        return result
+    return handler
+
+
+def test_response_commits_with_the_work(db):
+    key, calls = uuid4().hex, []
+
+    def crashes_after_commit(record):
+        calls.append(1)
+        record(Out(n=1))
+        db.commit()
+        raise RuntimeError("worker died after committing")
+
+    with pytest.raises(RuntimeError):
+        _run(db, key, crashes_after_commit)
+    replay_cache.clear()
+
+    result, response = _run(db, key, _counting_handler(db, calls))
+    assert result.n == 1
+    assert response.headers[REPLAY_HEADER] == "true"
+    assert len(calls) == 1
+
+
+def _stale_row(db, key, **values):
+    now = datetime.now(timezone.utc)
+    db.add(IdempotencyKey(
+        owner_id=1, scope="test", key=key, request_hash="0" * 64,
+        expires_at=now + timedelta(hours=1), **values,
+    ))
+    db.commit()
+
+
+def test_dead_claim_is_taken_over_after_its_lease(db):
+    key, calls = uuid4().hex, []
+    _stale_row(db, key, status="IN_PROGRESS", locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+
+    result, response = _run(db, key, _counting_handler(db, calls))
+    assert result.n == 1
+    assert REPLAY_HEADER not in response.headers
+
+
+def test_expired_key_runs_again(db):
+    key, calls = uuid4().hex, []
+    _stale_row(db, key, status="COMPLETED", response_status=201, response_body={"n": 99})
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update(
+        {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    result, _ = _run(db, key, _counting_handler(db, calls))
+    assert result.n == 1
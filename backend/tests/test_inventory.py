@@ -0,0 +1,107 @@
+from decimal import Decimal
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from backend.models.order import Order, OrderStatus
+from backend.models.payment import Payment, PaymentProvider, PaymentStatus
+from backend.models.stock_reservation import ReservationStatus, StockReservation
+from backend.service.inventory_service import (
+    commit_reservations,
+    decrement_stock,
+    extend_reservations,
+    reserve_stock,
+)
+
+
+def _order(db, customer, total=Decimal("10.00")):
+    order = Order(buyer_id=customer.id, total_price=total)
+    db.add(order)
+    db.flush()
+    return order
+
+
+def test_late_payment_on_sold_out_stock_is_backordered_not_lost(db, customer, make_variant):
+    from backend.api.v1.esewa_router import _apply_esewa_status
+
+    variant = make_variant(stock=1)
+    order = _order(db, customer)
+    # the hold lapses while the buyer is on the payment page...
+    reserve_stock(db, order.id, {variant.id: 1}, ttl_seconds=-60)
+    # ...and someone else buys the last unit
+    decrement_stock(db, {variant.id: 1})
+    payment = Payment(
+        order_id=order.id, provider=PaymentProvider.ESEWA, status=PaymentStatus.PENDING,
+        amount=order.total_price, transaction_uuid=str(uuid4()),
+    )
+    db.add(payment)
+    db.commit()
+
+    _apply_esewa_status(db, payment, "COMPLETE", "REF1")
+    db.commit()
+
+    db.refresh(payment)
+    db.refresh(order)
+    assert payment.status == PaymentStatus.COMPLETE
+    assert order.status == OrderStatus.BACKORDERED
+    hold = db.scalar(select(StockReservation.status).where(StockReservation.order_id == order.id))
+    assert hold == ReservationStatus.SHORT
+    db.refresh(variant)
+    assert variant.stock_quantity == 0
+
+
+def test_commit_takes_what_is_there_and_reports_the_rest(db, customer, make_variant):
+    in_stock, sold_out = make_variant(stock=3), make_variant(stock=1)
+    order = _order(db, customer)
+    reserve_stock(db, order.id, {in_stock.id: 2, sold_out.id: 1}, ttl_seconds=-60)
+    decrement_stock(db, {sold_out.id: 1})
+
+    remaining, short = commit_reservations(db, order.id)
+    db.commit()
+
+    assert remaining == {in_stock.id: 1}
+    assert short == {sold_out.id: 1}
+
+
+def test_extend_reservations_pins_live_holds(db, customer, make_variant):
+    variant = make_variant(stock=2)
+    order = _order(db, customer)
+    reserve_stock(db, order.id, {variant.id: 1}, ttl_seconds=60)
+    assert extend_reservations(db, order.id, 3600) == 1
+
+    lapsed = _order(db, customer)
+    reserve_stock(db, lapsed.id, {variant.id: 1}, ttl_seconds=-60)
+    assert extend_reservations(db, lapsed.id, 3600) == 0
+    db.commit()
+
+
+def test_replayed_success_callback_keeps_the_backorder(db, customer, make_variant):
+    from backend.api.v1.esewa_router import _apply_esewa_status
+
+    variant = make_variant(stock=1)
+    order = _order(db, customer)
+    reserve_stock(db, order.id, {variant.id: 1}, ttl_seconds=-60)
+    decrement_stock(db, {variant.id: 1})
+    payment = Payment(
+        order_id=order.id, provider=PaymentProvider.ESEWA, status=PaymentStatus.PENDING,
+        amount=order.total_price, transaction_uuid=str(uuid4()),
+    )
+    db.add(payment)
+    db.commit()
+
+    _apply_esewa_status(db, payment, "COMPLETE", "REF1")
+    db.commit()
+    db.refresh(payment)
+    verified_at = payment.verified_at
+
+    # eSewa retries the callback, or the buyer reloads the success page
+    assert _apply_esewa_status(db, payment, "COMPLETE", "REF2") == set()
+    db.commit()
+
+    db.refresh(payment)
+    db.refresh(order)
+    assert order.status == OrderStatus.BACKORDERED
+    assert payment.ref_id == "REF1"
+    assert payment.verified_at == verified_at
+    hold = db.scalar(select(StockReservation.status).where(StockReservation.order_id == order.id))
+    assert hold == ReservationStatus.SHORT
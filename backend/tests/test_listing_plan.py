@@ -0,0 +1,111 @@
+"""
+Query-plan regression test for the catalog listing: every filter/sort
+combination GET /product/ can build must be answered from an index on a
+seeded, ANALYZEd table. The statements are the ones view_all_product
+actually sends, captured with a before_cursor_execute listener, so a
+change to the query that stops matching an index fails here.
+
+SQLite reports index use as SEARCH and full walks as SCAN; Postgres as
+Index Scan / Bitmap Index Scan vs Seq Scan.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from backend.database import engine
+from backend.models.product import Product, ProductCategory, ProductStatus, TargetAudience
+from backend.service.product_service import view_all_product
+
+SEED_PRODUCTS = 5000
+
+CASES = {
+    "newest": {},
+    "category": {"category": ProductCategory.CLOTHES},
+    "audience": {"target_audience": TargetAudience.KIDS},
+    "price_range": {"min_price": Decimal("20"), "max_price": Decimal("40"), "sort": "price_asc"},
+    "category_by_price": {"category": ProductCategory.FOOTWEAR, "sort": "price_desc"},
+    "in_stock": {"in_stock_only": True},
+    "seller": {"seller_id": None},  # filled in with the seeded seller
+    "min_price": {"min_price": Decimal("45")},
+}
+
+
+@pytest.fixture(scope="module")
+def seller_id(client):
+    from backend.database import SessionLocal
+    from backend.models.seller import Seller
+
+    db = SessionLocal()
+    try:
+        tag = uuid4().hex[:10]
+        seller = Seller(
+            username=f"s{tag}", email=f"s{tag}@example.com", phone_number=f"s{tag}",
+            hashed_password="x", business_name="shop", business_address="here",
+            status="APPROVED", is_verified=True,
+        )
+        db.add(seller)
+        db.flush()
+        categories, audiences = list(ProductCategory), list(TargetAudience)
+        now = datetime.utcnow()
+        db.execute(insert(Product), [
+            {
+                "product_name": f"plan {tag} {i}",
+                "url_slug": f"plan-{tag}-{i}",
+                "product_category": categories[i % len(categories)],
+                "target_audience": audiences[i % len(audiences)],
+                "status": ProductStatus.active if i % 10 else ProductStatus.inactive,
+                "seller_id": seller.id,
+                "min_price": Decimal(10 + i % 50),
+                "default_price": Decimal(10 + i % 50),
+                "in_stock": i % 3 == 0,
+                "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(SEED_PRODUCTS)
+        ])
+        db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+        return seller.id
+    finally:
+        db.close()
+
+
+def _listing_statements(db, **filters):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM products" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        view_all_product(db, **filters)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert captured
+    return captured
+
+
+def _plan(db, statement, parameters) -> list[str]:
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        return [row[0] for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters)]
+    return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_listing_never_scans_the_table(db, seller_id, case):
+    filters = dict(CASES[case])
+    if "seller_id" in filters:
+        filters["seller_id"] = seller_id
+
+    for statement, parameters in _listing_statements(db, **filters):
+        plan = _plan(db, statement, parameters)
+        if db.connection().dialect.name == "postgresql":
+            assert not any("Seq Scan" in step for step in plan), "\n".join(plan)
+        else:
+            table_steps = [step for step in plan if " products" in step]
+            assert table_steps and all(step.startswith("SEARCH") for step in table_steps), plan
@@ -0,0 +1,22 @@
+from backend.utils.principal import current_token_epoch, principal_cache, revoke_access_tokens
+
+
+def test_revocation_drops_the_cached_epoch_only_after_commit(db, customer):
+    assert current_token_epoch(db, "Customer", customer.id) == 0
+
+    revoke_access_tokens(db, "Customer", customer.id)
+    # until the commit other requests still see (and may re-cache) the old epoch
+    assert principal_cache.get(f"Customer:{customer.id}") == 0
+    db.commit()
+
+    assert principal_cache.get(f"Customer:{customer.id}") is None
+    assert current_token_epoch(db, "Customer", customer.id) == 1
+
+
+def test_rolled_back_revocation_keeps_the_cache(db, customer):
+    current_token_epoch(db, "Customer", customer.id)
+    revoke_access_tokens(db, "Customer", customer.id)
+    db.rollback()
+    db.commit()
+
+    assert principal_cache.get(f"Customer:{customer.id}") == 0
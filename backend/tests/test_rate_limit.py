@@ -0,0 +1,63 @@
+import pytest
+
+from backend.core.rate_limit import RATE_LIMIT_IP_RATE, TokenBucket
+
+
+def test_global_ip_limit_is_off_by_default():
+    assert RATE_LIMIT_IP_RATE == 0
+
+
+def test_peek_does_not_take_tokens():
+    bucket = TokenBucket(rate=0.001, burst=2)
+    assert bucket.peek("k") == 0
+    assert bucket.peek("k") == 0
+    assert bucket.hit("k") == 0
+    assert bucket.hit("k") == 0
+    assert bucket.peek("k") > 0
+
+
+def test_only_failed_logins_count_and_only_per_ip(client, db, customer):
+    from backend.api.v1.login import LOGIN_ACCOUNT_BURST, login_account_bucket
+    from backend.utils.hashed import hashed_password
+
+    customer.hashed_password = hashed_password("right-password")
+    db.commit()
+
+    def login(password):
+        return client.post("/login/login", data={"username": customer.email, "password": password})
+
+    assert login("right-password").status_code == 200
+    for _ in range(int(LOGIN_ACCOUNT_BURST)):
+        assert login("wrong").status_code == 401
+    blocked = login("right-password")
+    assert blocked.status_code == 429
+    assert "Retry-After" in blocked.headers
+
+    # the same account from another address is unaffected
+    assert login_account_bucket.peek(f"{customer.email}|10.0.0.1") == 0
+
+
+def test_zero_rate_disables_the_limit():
+    from backend.core.rate_limit import build_bucket
+
+    assert build_bucket("rl_test", 0, 5) is None
+    assert build_bucket("rl_test", 1, 0) is None
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=5)
+
+
+def test_logins_work_with_the_limits_switched_off(client, db, customer, monkeypatch):
+    from backend.api.v1 import login as login_module
+    from backend.utils.hashed import hashed_password
+
+    customer.hashed_password = hashed_password("right-password")
+    db.commit()
+    # what AUTH_IP_RATE_PER_MINUTE=0 and LOGIN_ACCOUNT_RATE_PER_MINUTE=0 build
+    monkeypatch.delitem(login_module.RATE_LIMITED_ROUTES, "/login/login")
+    monkeypatch.setattr(login_module, "login_account_bucket", None)
+
+    for _ in range(int(login_module.LOGIN_ACCOUNT_BURST) + 2):
+        response = client.post("/login/login", data={"username": customer.email, "password": "wrong"})
+        assert response.status_code == 401
+    response = client.post("/login/login", data={"username": customer.email, "password": "right-password"})
+    assert response.status_code == 200
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from backend.models.refresh_token import RefreshToken
+from backend.utils import jwt
+
+
+def test_concurrent_refresh_within_grace_gets_a_successor(db, customer):
+    raw = jwt.create_refresh_token(db, user_id=customer.id, role="Customer")
+    first, _ = jwt.rotate_refresh_token(db, raw)
+    db.commit()
+
+    # the second tab sent the same token a moment later
+    second, _ = jwt.rotate_refresh_token(db, raw)
+    db.commit()
+    assert second.family_id == first.family_id
+
+
+def test_reuse_after_grace_revokes_the_family(db, customer):
+    raw = jwt.create_refresh_token(db, user_id=customer.id, role="Customer")
+    old, successor = jwt.rotate_refresh_token(db, raw)
+    db.commit()
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == old.family_id, RefreshToken.revoked == True)
+        .values(revoked_at=jwt._now() - timedelta(seconds=jwt.REFRESH_REUSE_GRACE_SECONDS + 1))
+    )
+    db.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        jwt.rotate_refresh_token(db, raw)
+    assert exc.value.detail == "Refresh token reuse detected"
+    with pytest.raises(HTTPException):
+        jwt.rotate_refresh_token(db, successor)
+
+
+def test_logged_out_token_is_not_revived_by_the_grace_window(db, customer):
+    raw = jwt.create_refresh_token(db, user_id=customer.id, role="Customer")
+    jwt.revoke_refresh_token(db, raw)
+
+    with pytest.raises(HTTPException):
+        jwt.rotate_refresh_token(db, raw)
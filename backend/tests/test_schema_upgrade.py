@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine, inspect, text
+
+from backend.database import Base
+
+
+def _old_schema(tmp_path):
+    """A database as create_all left it before carts.version, refresh token families and the cart index."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_carts_one_active_per_buyer"))
+        conn.execute(text("DROP INDEX ix_refresh_tokens_live_family"))
+        conn.execute(text("ALTER TABLE carts DROP COLUMN version"))
+        conn.execute(text("ALTER TABLE cart_items DROP COLUMN version"))
+        conn.execute(text("ALTER TABLE refresh_tokens DROP COLUMN family_id"))
+        conn.execute(text("INSERT INTO carts (id, buyer_id, status, updated_at) VALUES "
+                          "(1, 7, 'ACTIVE', '2024-01-01'), (2, 7, 'ACTIVE', '2024-02-01')"))
+        conn.execute(text("INSERT INTO cart_items (cart_id, variant_id, quantity, price) VALUES "
+                          "(1, 10, 2, 5), (1, 11, 1, 5), (2, 10, 3, 5)"))
+        conn.execute(text("INSERT INTO refresh_tokens (id, token_hash, role, owner_id, expires_at, revoked) "
+                          "VALUES (5, 'h', 'Customer', 7, '2099-01-01', 0)"))
+    return engine
+
+
+def test_upgrade_adds_columns_merges_carts_and_builds_index(client, tmp_path):
+    from backend.service.schema_upgrade import upgrade_schema
+
+    engine = _old_schema(tmp_path)
+    summary = upgrade_schema(engine)
+
+    assert ("carts", "version") in summary["columns"]
+    assert ("refresh_tokens", "family_id") in summary["columns"]
+    assert summary["carts_merged"] == 1
+    assert "uq_carts_one_active_per_buyer" in summary["indexes"]
+
+    with engine.connect() as conn:
+        carts = conn.execute(text("SELECT id, status FROM carts ORDER BY id")).all()
+        assert carts == [(1, "ABANDONED"), (2, "ACTIVE")]
+        items = conn.execute(text("SELECT cart_id, variant_id, quantity FROM cart_items ORDER BY variant_id")).all()
+        assert items == [(2, 10, 5), (2, 11, 1)]
+        assert conn.scalar(text("SELECT family_id FROM refresh_tokens WHERE id = 5")) == "legacy-5"
+    index_names = {ix["name"] for ix in inspect(engine).get_indexes("carts")}
+    assert "uq_carts_one_active_per_buyer" in index_names
+
+    # a second run finds nothing to do
+    assert not any(upgrade_schema(engine).values())
@@ -0,0 +1,15 @@
+from backend.service.search_service import reindex_all_products, search_product_rows, tokenize
+
+
+def test_tokenize_keeps_non_ascii_words_and_drops_operators():
+    assert tokenize("Кофе & café_au-lait: v2!") == ["кофе", "café", "au", "lait", "v2"]
+
+
+def test_search_finds_non_ascii_names(db, make_variant):
+    product = make_variant().product
+    product.product_name = "Кофе арабика"
+    db.commit()
+    reindex_all_products(db)
+
+    found = search_product_rows(db, term="кофе", category=None, skip=0, limit=10)
+    assert product.id in [p.id for p in found]
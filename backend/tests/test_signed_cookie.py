@@ -0,0 +1,24 @@
+import pytest
+
+from backend.core.signed_cookie import CookieSigner
+
+
+@pytest.fixture
+def signer():
+    return CookieSigner("secret", "test", max_age=60)
+
+
+def test_round_trip(signer):
+    assert signer.loads(signer.dumps({"a": [1, 2]})) == {"a": [1, 2]}
+
+
+@pytest.mark.parametrize("value", ["é.abc", "abc.é", "a.b", "!!!.x", "", None])
+def test_forged_values_are_rejected(signer, value):
+    assert signer.loads(value) is None
+
+
+def test_tampered_body_is_rejected(signer):
+    body, sig = signer.dumps({"a": 1}).split(".")
+    forged = body[:-1] + ("A" if body[-1] != "A" else "B")
+    assert signer.loads(f"{forged}.{sig}") is None
+    assert CookieSigner("secret", "other", max_age=60).loads(f"{body}.{sig}") is None
@@ -0,0 +1,35 @@
+from sqlalchemy import func, insert, select
+
+from backend.models.credential import Credential
+from backend.models.customer import Customer
+
+
+def test_app_starts_on_sqlite(client):
+    assert client.get("/").status_code == 200
+
+
+def test_backfill_credentials_on_sqlite(db):
+    from backend.service.credential_service import backfill_credentials
+
+    # Core insert skips the ORM listeners, like rows that predate credentials
+    db.execute(
+        insert(Customer).values(
+            username="backfill", email="backfill@example.com",
+            phone_number="9800000000", hashed_password="x",
+        )
+    )
+    db.commit()
+
+    assert backfill_credentials(db) >= 1
+    role, owner_id = db.execute(
+        select(Credential.role, Credential.owner_id).where(Credential.email == "backfill@example.com")
+    ).one()
+    assert role == "Customer"
+    assert owner_id == db.scalar(select(Customer.id).where(Customer.email == "backfill@example.com"))
+
+    # re-running updates instead of duplicating
+    backfill_credentials(db)
+    count = db.scalar(
+        select(func.count()).select_from(Credential).where(Credential.email == "backfill@example.com")
+    )
+    assert count == 1
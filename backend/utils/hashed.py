@@ -1,10 +1,143 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(2, os.cpu_count() or 1))))
+# hashes allowed in flight (running + waiting for a worker) before new ones get a 503
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", "10"))
+PASSWORD_RETRY_AFTER = int(os.getenv("PASSWORD_RETRY_AFTER", "2"))
 
-def hashed_password(password:str)->str:
+# hashes made with other rounds still verify and are flagged by needs_update
+pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto",bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+_stats_lock = threading.Lock()
+_stats = {"in_flight": 0, "completed": 0, "rejected": 0, "timed_out": 0, "pool_restarts": 0}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        return _executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died; the next _get_executor builds a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+            _bump("pool_restarts")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def stop_password_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def password_pool_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queued"] = max(stats["in_flight"] - PASSWORD_WORKERS, 0)
+    stats["workers"] = PASSWORD_WORKERS
+    stats["limit"] = PASSWORD_QUEUE_LIMIT
+    return stats
+
+
+def _bump(name: str, by: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += by
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts right now, please retry shortly",
+        headers={"Retry-After": str(PASSWORD_RETRY_AFTER)},
+    )
+
+
+# the three below run in the worker processes
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def _run(fn, *args, retry: bool = True):
+    """
+    Run fn in the password pool and wait for it. Callers are sync routes on
+    the anyio threadpool, so the thread only sleeps here while bcrypt burns
+    a worker process instead. Raises 503 with Retry-After when
+    PASSWORD_QUEUE_LIMIT hashes are already in flight. A worker that died
+    (OOM kill, segfault) breaks the whole pool; it is replaced and the call
+    retried once.
+    """
+    if not _slots.acquire(blocking=False):
+        _bump("rejected")
+        raise _busy()
+    _bump("in_flight")
+
+    def _done(_: Future) -> None:
+        _bump("in_flight", -1)
+        _bump("completed")
+        _slots.release()
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _bump("in_flight", -1)
+        _slots.release()
+        _discard_executor(executor)
+        if retry:
+            return _run(fn, *args, retry=False)
+        raise _busy()
+    except Exception:
+        _bump("in_flight", -1)
+        _slots.release()
+        raise
+    future.add_done_callback(_done)
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT)
+    except FutureTimeout:
+        _bump("timed_out")
+        raise _busy()
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        if retry:
+            return _run(fn, *args, retry=False)
+        raise _busy()
+
+
+def hashed_password(password:str)->str:
+    return _run(_hash, password)
+
 def verify_password(password:str,hashed_password:str)->bool:
-    return pwd_context.verify(password,hashed_password)
+    return _run(_verify, password, hashed_password)
 
+def verify_and_update_password(password:str,hashed_password:str)->tuple[bool,str|None]:
+    """(valid, new_hash); new_hash is set when the stored hash uses outdated cost settings."""
+    return _run(_verify_and_update, password, hashed_password)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import hashlib
+import os
 import secrets
 from datetime import datetime, timedelta
 from jose import jwt
@@ -9,15 +10,14 @@ from jose.exceptions import JWTError
 from fastapi import Depends, HTTPException, status
 
 from pydantic_settings import BaseSettings
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
 
 from backend.core.error_handler import error_handler
 from backend.database import get_db
-from backend.models.admin import Admin
-from backend.models.customer import Customer
 from backend.models.refresh_token import RefreshToken
-from backend.models.seller import Seller
 from backend.utils.auth import oauth2_scheme
+from backend.utils.principal import Principal, current_token_epoch
 
 
 
@@ -33,6 +33,11 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+REFRESH_TOKEN_PURGE_BATCH = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH", "1000"))
+# a token rotated this recently may be presented again (two tabs refreshing
+# at once) and still gets a successor instead of tripping reuse detection
+REFRESH_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "5"))
+
 
 def _now() -> datetime:
     return datetime.utcnow()
@@ -43,14 +48,23 @@ def _hash_token(token: str) -> str:
 
 
 
-def create_access_token(email: str, role: str) -> str:
+def create_access_token(user, role: str) -> str:
+    """
+    The token carries everything a route needs to authorize the caller
+    (id, role, seller flags) plus token_epoch, so a bumped epoch revokes it.
+    """
     payload = {
-        "sub": email,
+        "sub": user.email,
+        "uid": user.id,
         "role": role,
+        "epoch": user.token_epoch or 0,
         "type": "access",
         "iat": int(_now().timestamp()),
         "exp": _now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
     }
+    if role == "Seller":
+        payload["verified"] = bool(user.is_verified)
+        payload["status"] = user.status
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
@@ -63,92 +77,197 @@ def verify_token(token: str) -> dict:
 
         email = payload.get("sub")
         role = payload.get("role")
+        uid = payload.get("uid")
 
-        if not email or not role:
+        # tokens issued before uid was added are refused; the client refreshes
+        if not email or role not in ("Admin", "Seller", "Customer") or not isinstance(uid, int):
             raise error_handler(status.HTTP_401_UNAUTHORIZED, "Invalid token payload")
 
-        return {"email": email, "role": role}
+        return {
+            "email": email,
+            "role": role,
+            "uid": uid,
+            "epoch": payload.get("epoch", 0),
+            "verified": payload.get("verified"),
+            "status": payload.get("status"),
+        }
 
     except JWTError:
         raise error_handler(status.HTTP_401_UNAUTHORIZED, "Invalid or expired token")
 
-def create_refresh_token(db: Session, user_id: int, role: str) -> str:
+def _new_refresh_token(user_id: int, role: str, family_id: str) -> tuple[str, dict]:
     raw = secrets.token_urlsafe(48)
-    token_hash = _hash_token(raw)
-
-    rt = RefreshToken(
-        token_hash=token_hash,
-        role=role,
-        owner_id=user_id,
-        expires_at=_now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
-        revoked=False,
-    )
+    return raw, {
+        "token_hash": _hash_token(raw),
+        "role": role,
+        "owner_id": user_id,
+        "family_id": family_id,
+        "expires_at": _now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        "revoked": False,
+    }
+
 
-    db.add(rt)
+def create_refresh_token(db: Session, user_id: int, role: str) -> str:
+    """Start a new token family, i.e. a fresh login."""
+    raw, row = _new_refresh_token(user_id, role, secrets.token_hex(16))
+    db.execute(insert(RefreshToken).values(**row))
     db.commit()
     return raw
 
 
-def verify_refresh_token(db: Session, token: str) -> RefreshToken:
-    token_hash = _hash_token(token)
-
-    rt = db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first()
-    if not rt:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
+def _revoke_family(db: Session, family_id: str) -> None:
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked == False)
+        .values(revoked=True, revoked_at=_now())
+        .execution_options(synchronize_session=False)
+    )
 
-    if rt.revoked:
-        raise HTTPException(status_code=401, detail="Refresh token revoked")
 
-    if rt.expires_at < _now():
-        rt.revoked = True
-        db.commit()
-        raise HTTPException(status_code=401, detail="Refresh token expired")
+def rotate_refresh_token(db: Session, token: str) -> tuple[Row, str]:
+    """
+    Swap a refresh token for a new one in the same family. The happy path
+    is one UPDATE ... RETURNING that revokes the presented token only if
+    it is live, then the INSERT of its successor; the caller commits.
+    Presenting a token that was already rotated means it leaked, so its
+    whole family is revoked, unless it was rotated less than
+    REFRESH_REUSE_GRACE_SECONDS ago and the family is still live: that is
+    a concurrent refresh from another tab, which gets its own successor.
+    Returns (old token row, new raw token).
+    """
+    token_hash = _hash_token(token)
+    now = _now()
+    sibling = aliased(RefreshToken)
+    old = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked == False,
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked=True, revoked_at=now)
+        .returning(RefreshToken.role, RefreshToken.owner_id, RefreshToken.family_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if old is None:
+        live_sibling = (
+            select(sibling.id)
+            .where(sibling.family_id == RefreshToken.family_id, sibling.revoked == False)
+            .exists()
+        )
+        rt = db.execute(
+            select(
+                RefreshToken.role,
+                RefreshToken.owner_id,
+                RefreshToken.family_id,
+                RefreshToken.revoked,
+                RefreshToken.revoked_at,
+                RefreshToken.expires_at,
+                live_sibling.label("family_live"),
+            ).where(RefreshToken.token_hash == token_hash)
+        ).first()
+        if not rt:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        in_grace = (
+            rt.revoked_at is not None
+            and rt.revoked_at > now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)
+        )
+        if rt.revoked and not (in_grace and rt.family_live):
+            _revoke_family(db, rt.family_id)
+            db.commit()
+            raise HTTPException(status_code=401, detail="Refresh token reuse detected")
+        if not rt.revoked or rt.expires_at <= now:
+            raise HTTPException(status_code=401, detail="Refresh token expired")
+        old = rt
+
+    raw, row = _new_refresh_token(old.owner_id, old.role, old.family_id)
+    db.execute(insert(RefreshToken).values(**row))
+    return old, raw
+
+
+def revoke_refresh_token(db: Session, token: str) -> None:
+    """Logout: revoke the token's whole family in one statement."""
+    family = (
+        select(RefreshToken.family_id)
+        .where(RefreshToken.token_hash == _hash_token(token))
+        .scalar_subquery()
+    )
+    _revoke_family(db, family)
+    db.commit()
 
-    return rt
 
+def purge_refresh_tokens(db: Session, batch_size: int = REFRESH_TOKEN_PURGE_BATCH) -> int:
+    """
+    Delete expired tokens, and revoked ones whose family has no live token
+    left (nothing to detect reuse against), batch_size rows per
+    transaction. Revoked tokens of a live family are kept until they
+    expire. Returns the number of rows deleted.
+    """
+    sibling = aliased(RefreshToken)
+    live_sibling = (
+        select(sibling.id)
+        .where(sibling.family_id == RefreshToken.family_id, sibling.revoked == False)
+        .exists()
+    )
+    purged = 0
+    while True:
+        dead = (
+            select(RefreshToken.id)
+            .where(or_(RefreshToken.expires_at <= _now(), and_(RefreshToken.revoked == True, ~live_sibling)))
+            .order_by(RefreshToken.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        res = db.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.id.in_(dead))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        purged += res.rowcount
+        if res.rowcount < batch_size:
+            return purged
 
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     return verify_token(token)
 
 
-def get_current_customer(
+def get_current_principal(
     user=Depends(get_current_user),
     db: Session = Depends(get_db),
-):
-    if user["role"] != "Customer":
-        raise error_handler(403, "Customer role required")
-
-    customer = db.query(Customer).filter(Customer.email == user["email"]).first()
-    if not customer:
-        raise error_handler(404, "Customer not found")
-
-    return customer
+) -> Principal:
+    current = current_token_epoch(db, user["role"], user["uid"])
+    if current is None:
+        raise error_handler(status.HTTP_401_UNAUTHORIZED, "Account no longer exists")
+    if current != user["epoch"]:
+        raise error_handler(status.HTTP_401_UNAUTHORIZED, "Token has been revoked")
+
+    return Principal(
+        db,
+        id=user["uid"],
+        email=user["email"],
+        role=user["role"],
+        epoch=user["epoch"],
+        is_verified=user["verified"],
+        status=user["status"],
+    )
 
 
-def get_current_seller(
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    if user["role"] != "Seller":
-        raise error_handler(403, "Seller role required")
+def _require_role(principal: Principal, role: str) -> Principal:
+    if principal.role != role:
+        raise error_handler(403, f"{role} role required")
+    return principal
 
-    seller = db.query(Seller).filter(Seller.email == user["email"]).first()
-    if not seller:
-        raise error_handler(404, "Seller not found")
 
-    return seller
+def get_current_customer(principal: Principal = Depends(get_current_principal)) -> Principal:
+    return _require_role(principal, "Customer")
 
 
-def get_current_admin(
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    if user["role"] != "Admin":
-        raise error_handler(403, "Admin role required")
+def get_current_seller(principal: Principal = Depends(get_current_principal)) -> Principal:
+    return _require_role(principal, "Seller")
 
-    admin = db.query(Admin).filter(Admin.email == user["email"]).first()
-    if not admin:
-        raise error_handler(404, "Admin not found")
 
-    return admin
+def get_current_admin(principal: Principal = Depends(get_current_principal)) -> Principal:
+    return _require_role(principal, "Admin")
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+
+from fastapi import status
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from backend.core.cache import build_cache
+from backend.core.error_handler import error_handler
+from backend.models.admin import Admin
+from backend.models.customer import Customer
+from backend.models.seller import Seller
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+
+# (role, user id) -> current token_epoch
+principal_cache = build_cache("auth_principal", maxsize=50_000, ttl=PRINCIPAL_CACHE_TTL)
+
+ROLE_MODELS = {"Admin": Admin, "Seller": Seller, "Customer": Customer}
+
+# session.info key: principals to drop from principal_cache once the session commits
+_PENDING_FORGETS = "principal_forgets"
+
+
+def _epoch_key(role: str, user_id: int) -> str:
+    return f"{role}:{user_id}"
+
+
+def current_token_epoch(db: Session, role: str, user_id: int) -> int | None:
+    """
+    The user's token_epoch, from principal_cache when fresh; one primary
+    key lookup otherwise. None when the account no longer exists.
+    """
+    key = _epoch_key(role, user_id)
+    epoch = principal_cache.get(key)
+    if epoch is not None:
+        return epoch
+    model = ROLE_MODELS[role]
+    epoch = db.scalar(select(model.token_epoch).where(model.id == user_id))
+    if epoch is not None:
+        principal_cache.set(key, epoch)
+    return epoch
+
+
+def revoke_access_tokens(db: Session, role: str, user_id: int) -> None:
+    """
+    Bump the user's token_epoch so every access token issued so far is
+    refused; clients get a fresh one, with fresh claims, from /login/refresh.
+    Call inside the caller's transaction, before it commits. The cached
+    epoch is dropped once that transaction commits (dropping it earlier
+    would let a concurrent request cache the old epoch again).
+
+    With the in-process cache (no CACHE_REDIS_URL) only this worker drops
+    its entry; other workers keep accepting the revoked tokens until their
+    entry expires, i.e. for up to PRINCIPAL_CACHE_TTL (30s by default).
+    """
+    model = ROLE_MODELS[role]
+    db.execute(
+        update(model)
+        .where(model.id == user_id)
+        .values(token_epoch=model.token_epoch + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.info.setdefault(_PENDING_FORGETS, set()).add((role, user_id))
+
+
+def forget_principal(role: str, user_id: int) -> None:
+    principal_cache.delete(_epoch_key(role, user_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed(session: Session) -> None:
+    for role, user_id in session.info.pop(_PENDING_FORGETS, ()):
+        forget_principal(role, user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_forgets(session: Session) -> None:
+    session.info.pop(_PENDING_FORGETS, None)
+
+
+class Principal:
+    """
+    The caller as the access token describes them. id, email, role and the
+    seller flags come straight from the token; any other attribute loads
+    the ORM row on first use, so handlers that only need the id never
+    touch the database.
+    """
+
+    __slots__ = ("id", "email", "role", "epoch", "is_verified", "status", "_db", "_user")
+
+    def __init__(
+        self,
+        db: Session,
+        *,
+        id: int,
+        email: str,
+        role: str,
+        epoch: int,
+        is_verified: bool | None = None,
+        status: str | None = None,
+    ) -> None:
+        self._db = db
+        self._user = None
+        self.id = id
+        self.email = email
+        self.role = role
+        self.epoch = epoch
+        self.is_verified = is_verified
+        self.status = status
+
+    @property
+    def role_name(self) -> str:
+        return self.role
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = self._db.get(ROLE_MODELS[self.role], self.id)
+            if self._user is None:
+                raise error_handler(status.HTTP_404_NOT_FOUND, f"{self.role} not found")
+        return self._user
+
+    def __getattr__(self, name: str):
+        # only reached for attributes the token does not carry
+        return getattr(self.user, name)
+
+    def __repr__(self) -> str:
+        return f"<Principal(role={self.role}, id={self.id})>"
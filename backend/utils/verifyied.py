@@ -17,11 +17,13 @@ from backend.utils.hashed import  verify_password
 from backend.core.permission import check_permission
 from backend.core.error_handler import error_handler
 from backend.utils.jwt import get_current_seller
+from backend.utils.principal import Principal
 
 
 def verify_seller_or_not(
-    seller: Seller = Depends(get_current_seller)
+    seller: Principal = Depends(get_current_seller)
 ):
+    # flags come from the token; changing them revokes it (revoke_access_tokens)
     if seller.status == "REJECTED":
         raise error_handler(status.HTTP_403_FORBIDDEN, "Seller rejected")
 
@@ -9,14 +9,17 @@ export default defineConfig({
     host: true,
     port: 5173,
     strictPort: true,
+    // xfwd adds X-Forwarded-For, so the backend can rate limit per shopper
+    // (with RATE_LIMIT_TRUST_PROXY=1) instead of per dev server
     proxy: {
       "/api": {
         target: API_TARGET,
         changeOrigin: true,
+        xfwd: true,
         rewrite: (p) => p.replace(/^\/api/, ""),
       },
-      "/user": { target: API_TARGET, changeOrigin: true },
-      "/uploads": { target: API_TARGET, changeOrigin: true },
+      "/user": { target: API_TARGET, changeOrigin: true, xfwd: true },
+      "/uploads": { target: API_TARGET, changeOrigin: true, xfwd: true },
     },
   },
 });